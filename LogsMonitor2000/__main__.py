@@ -1,16 +1,33 @@
 import logging
-from argparse import ArgumentParser
+from typing import Optional
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 
 from .parse import HTTPLogParser
 from .analyze import AnalyticsProcessor
-from .action import TerminalNotifier
+from .action import Action, TerminalNotifier, DashboardNotifier, LateEventsWriter
+from .profiler import StageProfiler
 
 
-def main():
-    """ Extract data from logs, analyze them and take appropriate actions """
-    argsParser = ArgumentParser(description="Parse HTTP logs and monitor traffic")
-    argsParser.add_argument("file", help="HTTP log path, e.g. tests/sample_csv.txt")
-    argsParser.add_argument("--verbose", help="Print DEBUG lines", action="store_true")
+def horizonThresholds(value: str) -> dict[int, float]:
+    """ Parse comma-separated horizon:threshold pairs, e.g. "10:50,60:20" """
+    try:
+        pairs = (pair.split(":") for pair in value.split(","))
+        return {int(horizon): float(threshold) for horizon, threshold in pairs}
+    except ValueError:
+        raise ArgumentTypeError(f"Expected horizon:threshold pairs, got: {value}")
+
+
+def keyThresholds(value: str) -> dict[str, float]:
+    """ Parse comma-separated key:threshold pairs, e.g. "/api:1000,*:100" """
+    try:
+        pairs = (pair.rsplit(":", 1) for pair in value.split(","))
+        return {key: float(threshold) for key, threshold in pairs}
+    except ValueError:
+        raise ArgumentTypeError(f"Expected key:threshold pairs, got: {value}")
+
+
+def addAnalyticsArguments(argsParser: ArgumentParser) -> None:
+    """ Options of the stats calculated and alerts triggered, also used by aggregate.py """
     argsParser.add_argument(
         "--stats_interval",
         help="Print general requests statistics every x seconds",
@@ -29,12 +46,274 @@ def main():
         type=int,
         default=10,
     )
+    argsParser.add_argument(
+        "--rate_horizons",
+        help="Alert when average requests per second over each horizon of x seconds "
+        "exceeds its threshold, e.g. 10:50,60:20,300:15,3600:10",
+        type=horizonThresholds,
+        default=None,
+    )
+    argsParser.add_argument(
+        "--baseline_deviations",
+        help="Alert when requests per second are more than x standard deviations above "
+        "their daily seasonal baseline, e.g. 4",
+        type=float,
+        default=-1,
+    )
+    argsParser.add_argument(
+        "--baseline_interval",
+        help="Smooth requests per second compared to the baseline over x seconds",
+        type=int,
+        default=60,
+    )
+    argsParser.add_argument(
+        "--baseline_checkpoint",
+        help="Save the baseline to this file, and restore it from there on start",
+        default=None,
+    )
+    argsParser.add_argument(
+        "--source_rate_thresholds",
+        help="Alert when average requests per second of a source exceeds its threshold, "
+        "* for any other source, e.g. 10.0.0.1:100,*:50",
+        type=keyThresholds,
+        default=None,
+    )
+    argsParser.add_argument(
+        "--section_rate_thresholds",
+        help="Alert when average requests per second of a section exceeds its threshold, "
+        "* for any other section, e.g. /api:1000,*:100",
+        type=keyThresholds,
+        default=None,
+    )
+    argsParser.add_argument(
+        "--keyed_rate_interval",
+        help="Average source and section requests per second over x seconds",
+        type=int,
+        default=10,
+    )
+    argsParser.add_argument(
+        "--error_rate_interval",
+        help="Monitor 5xx/4xx error ratios over window size of x seconds",
+        type=int,
+        default=-1,
+    )
+    argsParser.add_argument(
+        "--server_error_threshold",
+        help="Ratio of 5xx responses within that interval to exceed to trigger an alert",
+        type=float,
+        default=0.05,
+    )
+    argsParser.add_argument(
+        "--client_error_threshold",
+        help="Ratio of 4xx responses within that interval to exceed to trigger an alert",
+        type=float,
+        default=0.25,
+    )
+    argsParser.add_argument(
+        "--error_rate_min_requests",
+        help="Minimum number of requests within that interval for error rate alerts",
+        type=int,
+        default=100,
+    )
+    argsParser.add_argument(
+        "--bandwidth_interval",
+        help="Print bytes served and response size statistics every x seconds",
+        type=int,
+        default=-1,
+    )
+    argsParser.add_argument(
+        "--distinct_sources_interval",
+        help="Print estimated numbers of distinct sources, per section, every x seconds",
+        type=int,
+        default=-1,
+    )
+    argsParser.add_argument(
+        "--buffer_time",
+        help="Seconds to wait for out-of-order events before processing them",
+        type=int,
+        default=2,
+    )
+    argsParser.add_argument(
+        "--lateness_percentile",
+        help="Adapt buffer time to this percentile (e.g. 99.9) of observed event lateness",
+        type=float,
+        default=None,
+    )
+    argsParser.add_argument(
+        "--max_buffer_time",
+        help="Upper bound of adapted buffer time in seconds",
+        type=int,
+        default=60,
+    )
+    argsParser.add_argument(
+        "--max_memory",
+        help="Memory budget in MB for events in window, beyond which events are sampled "
+        "with counts scaled back up accordingly",
+        type=int,
+        default=None,
+    )
+    argsParser.add_argument(
+        "--summarize",
+        help="Keep per-second counts rather than raw events, for long intervals at high traffic",
+        action="store_true",
+    )
+
+
+def analyticsOptions(args: Namespace, lateAction: Optional[Action] = None) -> dict:
+    """ AnalyticsProcessor parameters from parsed options, and the late events action """
+    return dict(
+        mostCommonStatsInterval=args.stats_interval,
+        highTrafficInterval=args.high_traffic_interval,
+        highTrafficThreshold=args.high_traffic_threshold,
+        rateHorizons=args.rate_horizons,
+        baselineInterval=args.baseline_interval,
+        baselineDeviations=args.baseline_deviations,
+        baselineCheckpoint=args.baseline_checkpoint,
+        keyedRateInterval=args.keyed_rate_interval,
+        sourceRateThresholds=args.source_rate_thresholds,
+        sectionRateThresholds=args.section_rate_thresholds,
+        summarize=args.summarize,
+        errorRateInterval=args.error_rate_interval,
+        serverErrorThreshold=args.server_error_threshold,
+        clientErrorThreshold=args.client_error_threshold,
+        errorRateMinRequests=args.error_rate_min_requests,
+        bandwidthStatsInterval=args.bandwidth_interval,
+        distinctSourcesInterval=args.distinct_sources_interval,
+        maxMemory=args.max_memory * 1024 * 1024 if args.max_memory else None,
+        bufferTime=args.buffer_time,
+        latenessPercentile=args.lateness_percentile,
+        minBufferTime=min(args.buffer_time, args.max_buffer_time),
+        maxBufferTime=args.max_buffer_time,
+        lateAction=lateAction,
+    )
+
+
+def main():
+    """ Extract data from logs, analyze them and take appropriate actions """
+    argsParser = ArgumentParser(description="Parse HTTP logs and monitor traffic")
+    argsParser.add_argument(
+        "files",
+        help="HTTP log path, e.g. tests/sample_csv.txt, or - for standard input. "
+        "Several logs, e.g. per-minute ones, are each monitored separately in turn",
+        nargs="+",
+    )
+    argsParser.add_argument(
+        "--format",
+        help="Log format: csv, clf, combined, json, or an nginx-style log_format string "
+        'of $variables, e.g. \'$remote_addr - $remote_user [$time_local] "$request" '
+        "$status $body_bytes_sent'",
+        default="csv",
+    )
+    argsParser.add_argument("--verbose", help="Print DEBUG lines", action="store_true")
+    argsParser.add_argument(
+        "--dashboard",
+        help="Show latest stats and alerts on a screen updated in place, "
+        "rather than a line per stats or alert",
+        action="store_true",
+    )
+    argsParser.add_argument(
+        "--dashboard_fps",
+        help="Most dashboard updates per second",
+        type=float,
+        default=4,
+    )
+    addAnalyticsArguments(argsParser)
 
     argsParser.add_argument(
         "--follow",
         help="Continuously watch file for updates, similar to `tail --follow`",
         action="store_true",
     )
+    argsParser.add_argument(
+        "--late_events_file",
+        help="Append events too late to be processed to this CSV file, instead of dropping",
+        default=None,
+    )
+    argsParser.add_argument(
+        "--workers",
+        help="Number of processes decompressing multi-member gzip logs in parallel",
+        type=int,
+        default=1,
+    )
+
+    argsParser.add_argument(
+        "--shards",
+        help="Number of processes sharing most common stats counts, "
+        "for very high numbers of distinct sources and sections",
+        type=int,
+        default=1,
+    )
+    argsParser.add_argument(
+        "--section_tree_interval",
+        help="Print most requested sections, and sub-sections within them, every x seconds",
+        type=int,
+        default=-1,
+    )
+    argsParser.add_argument(
+        "--section_tree_depth",
+        help="Number of path segments of the deepest sub-sections, e.g. 2 for /api/user",
+        type=int,
+        default=2,
+    )
+    argsParser.add_argument(
+        "--section_tree_top",
+        help="Number of most requested sections, and sub-sections within each, printed",
+        type=int,
+        default=3,
+    )
+    argsParser.add_argument(
+        "--export_state",
+        help="Write per-second stats state to this file, or Unix socket of an aggregator, "
+        "to merge with other monitors' with `python -m LogsMonitor2000.aggregate`",
+        default=None,
+    )
+    argsParser.add_argument(
+        "--export_state_interval",
+        help="Write stats state every x seconds",
+        type=int,
+        default=10,
+    )
+    argsParser.add_argument(
+        "--http_port",
+        help="Serve current stats and alert state as JSON on this local port",
+        type=int,
+        default=None,
+    )
+    argsParser.add_argument(
+        "--rollup_db",
+        help="Write per-second and per-minute request counts to this SQLite database, "
+        "to query with `python -m LogsMonitor2000.rollup`",
+        default=None,
+    )
+    argsParser.add_argument(
+        "--analyzer_process",
+        help="Analyze events in a separate process from parsing, through shared memory",
+        action="store_true",
+    )
+    argsParser.add_argument(
+        "--replay",
+        help="Replay log at x times its original pace, or 0 as fast as possible, "
+        "reporting throughput, alert lag and queue depths",
+        type=float,
+        default=None,
+    )
+    argsParser.add_argument(
+        "--profile",
+        help="Append CPU time reports per pipeline stage, e.g. parsing or each "
+        "calculator, to this file, sampled at low overhead",
+        default=None,
+    )
+    argsParser.add_argument(
+        "--profile_interval",
+        help="Report profiled stages every x seconds",
+        type=float,
+        default=60,
+    )
+    argsParser.add_argument(
+        "--profile_memory",
+        help="Also report memory allocated per pipeline stage, at a higher overhead",
+        action="store_true",
+    )
 
     args = argsParser.parse_args()
 
@@ -43,19 +322,92 @@ def main():
     else:
         logging.basicConfig(level=logging.INFO)
 
+    if args.follow and len(args.files) > 1:
+        argsParser.error("Only one log can be followed")
+    if args.analyzer_process and args.replay is not None:
+        argsParser.error("Replays are analyzed in the parser process")
+    if args.analyzer_process and args.dashboard:
+        argsParser.error("The dashboard is drawn by the parser process")
+
+    if args.dashboard:
+        notifier: Action = DashboardNotifier(args.dashboard_fps)
+    else:
+        notifier = TerminalNotifier()
+    # Shared by the logs monitored in turn
+    lateAction = None
+    if args.late_events_file:
+        lateAction = LateEventsWriter(args.late_events_file)
+    profiler = None
+    if args.profile:
+        try:
+            profiler = StageProfiler(
+                args.profile, interval=args.profile_interval, memory=args.profile_memory
+            )
+        except ValueError as e:
+            argsParser.error(str(e))
+    try:
+        for path in args.files:
+            monitor(path, args, notifier, lateAction, profiler)
+    finally:
+        if args.dashboard:
+            notifier.close()  # type: ignore
+        if lateAction is not None:
+            lateAction.close()
+        if profiler is not None:
+            profiler.close()
+
+
+def monitor(
+    path: str,
+    args: Namespace,
+    notifier: Action,
+    lateAction: Optional[LateEventsWriter] = None,
+    profiler: Optional[StageProfiler] = None,
+) -> None:
+    """ Monitor one log, with its own stats and alerts state """
     # Construct the HTTP-specific logs parser, to be analyzed by a stats processor, and
     # displayed in a terminal notification handler
-    HTTPLogParser(
-        AnalyticsProcessor(
-            TerminalNotifier(),
-            mostCommonStatsInterval=args.stats_interval,
-            highTrafficInterval=args.high_traffic_interval,
-            highTrafficThreshold=args.high_traffic_threshold,
-        ),
-        path=args.file,
-        isFollowMode=args.follow,
-    ).parse()
+    options = analyticsOptions(args, lateAction)
+    options.update(
+        mostCommonShards=args.shards,
+        rollupPath=args.rollup_db,
+        httpPort=args.http_port,
+        sectionTreeInterval=args.section_tree_interval,
+        sectionTreeDepth=args.section_tree_depth,
+        sectionTreeTop=args.section_tree_top,
+    )
+    if args.export_state:
+        from .analyze import openStateSink
+
+        options.update(
+            stateSink=openStateSink(args.export_state),
+            stateExportInterval=args.export_state_interval,
+        )
+    if args.analyzer_process:
+        from .analyze import RingBufferProcessor
+
+        processor = RingBufferProcessor(notifier, **options)
+    elif args.replay is None:
+        processor = AnalyticsProcessor(notifier, **options)
+    else:
+        from .analyze import ReplayProcessor
+
+        processor = ReplayProcessor(notifier, speed=args.replay, **options)
+    try:
+        parser = HTTPLogParser(
+            processor,
+            path=path,
+            isFollowMode=args.follow,
+            workers=args.workers,
+            logFormat=args.format,
+            fields=processor.requiredFields(),
+        )
+        if profiler is not None:
+            profiler.profilePipeline(parser, processor, notifier)
+        parser.parse()
+    finally:
+        processor.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,10 +1,19 @@
-from .event import Event
+import csv
+import sys
+import time
+import threading
+from typing import Deque, Optional, TextIO
+from collections import deque
+from .event import Event, WebLogEvent
 from datetime import datetime
 
 
 class Action:
     """ Interface for taking action based on events """
 
+    # WebLogEvent fields used by the action, on top of those used by the calculators
+    requiredFields: frozenset = frozenset()
+
     def notify(self, message: Event) -> None:
         raise NotImplementedError()
 
@@ -46,3 +55,152 @@ class TerminalNotifier(Action):
         print(
             f"{color}{datetime.fromtimestamp(e.time)}{self.Colors.ENDC} - {e.message}"
         )
+
+
+class DashboardNotifier(Action):
+    """
+    Show the latest stats and alerts on a fixed-layout screen, redrawn in place with
+    ANSI cursor control rather than printing a line per event, e.g. for short stats
+    intervals across many calculators.
+
+    Notifications only update the latest state. A renderer thread redraws the screen
+    at most a number of frames per second, so notifications in between are coalesced,
+    and only redraws each line from its first changed character.
+    """
+
+    # Number of latest alerts shown
+    _ALERTS = 10
+
+    _CLEAR = "\033[2J"
+    _HIDE_CURSOR = "\033[?25l"
+    _SHOW_CURSOR = "\033[?25h"
+    _CLEAR_LINE_END = "\033[K"
+
+    def __init__(self, fps: float = 4, stream: TextIO = sys.stdout):
+        self._interval = 1 / fps
+        self._stream = stream
+
+        # Latest stats event of each kind, by message up to its first ":" in order of
+        # first occurrence, and latest alerts, guarded from the renderer thread
+        self._lock = threading.Lock()
+        self._stats: dict[str, Event] = {}
+        self._alerts: Deque[Event] = deque(maxlen=self._ALERTS)
+        self._timeLatest: int = -1
+
+        # Lines on screen, as (color, text)
+        self._frame: list[tuple[str, str]] = []
+        self.framesCount: int = 0
+
+        # Started on first notification, i.e. in the process notified
+        self._renderer: Optional[threading.Thread] = None
+        self._isDirty = threading.Event()
+        self._isClosed = False
+
+    def notify(self, e: Event) -> None:
+        """Update latest stats or alerts, to be rendered with the next frame"""
+        with self._lock:
+            if e.priority > Event.Priority.MEDIUM:
+                self._alerts.append(e)
+            else:
+                self._stats[e.message.split(":", 1)[0]] = e
+            self._timeLatest = max(self._timeLatest, e.time)
+        if self._renderer is None:
+            self._renderer = threading.Thread(target=self._render, daemon=True)
+            self._renderer.start()
+        self._isDirty.set()
+
+    def _render(self) -> None:
+        "Renderer thread: draw a frame when state changed, at most once per interval"
+        while True:
+            self._isDirty.wait()
+            if self._isClosed:
+                return
+            self._isDirty.clear()
+            self.draw()
+            time.sleep(self._interval)
+
+    def _layout(self) -> list[tuple[str, str]]:
+        "Lines of the screen for the latest state"
+        colors = TerminalNotifier.Colors
+        lines = [(colors.BOLD, "Logs Monitor 2000")]
+        with self._lock:
+            if self._timeLatest != -1:
+                lines.append(("", f"As of {datetime.fromtimestamp(self._timeLatest)}"))
+            lines += [("", ""), (colors.BOLD, "Stats")]
+            lines += [("", e.message) for e in self._stats.values()]
+            lines += [("", ""), (colors.BOLD, "Alerts")]
+            lines += [
+                (colors.RED, f"{datetime.fromtimestamp(e.time)} - {e.message}")
+                for e in reversed(self._alerts)
+            ]
+        return lines
+
+    def draw(self) -> None:
+        """Redraw lines changed since the previous frame, from their first change"""
+        # Imported on use, as shutil imports compression modules
+        import shutil
+
+        width = shutil.get_terminal_size().columns
+        lines = [(color, text[:width]) for color, text in self._layout()]
+        output = [] if self._frame else [self._CLEAR, self._HIDE_CURSOR]
+        for row, (color, text) in enumerate(lines):
+            previous = self._frame[row] if row < len(self._frame) else None
+            if previous == (color, text):
+                continue
+            column = 0
+            if previous is not None and previous[0] == color:
+                while (
+                    column < min(len(text), len(previous[1]))
+                    and text[column] == previous[1][column]
+                ):
+                    column += 1
+            output.append(
+                f"\033[{row + 1};{column + 1}H{color}{text[column:]}"
+                f"{TerminalNotifier.Colors.ENDC}{self._CLEAR_LINE_END}"
+            )
+        for row in range(len(lines), len(self._frame)):
+            output.append(f"\033[{row + 1};1H{self._CLEAR_LINE_END}")
+        self._frame = lines
+        if output:
+            self._stream.write("".join(output))
+            self._stream.flush()
+            self.framesCount += 1
+
+    def close(self) -> None:
+        """Draw the final state, and leave the cursor below it"""
+        self._isClosed = True
+        self._isDirty.set()
+        if self._renderer is not None:
+            self._renderer.join()
+        self.draw()
+        self._stream.write(f"\033[{len(self._frame) + 1};1H{self._SHOW_CURSOR}")
+        self._stream.flush()
+
+
+class LateEventsWriter(Action):
+    """ Append log events that arrived too late to be processed to a CSV file, e.g. to replay """
+
+    # Written back in full, so that they can be parsed again
+    requiredFields = frozenset({"source", "request", "status", "size"})
+
+    def __init__(self, path: str):
+        # Line-buffered so late events aren't lost if the monitor is interrupted
+        self._fd = open(path, mode="a", newline="", buffering=1)
+        self._writer = csv.writer(self._fd, quoting=csv.QUOTE_NONNUMERIC)
+
+    def notify(self, e: WebLogEvent) -> None:  # type: ignore
+        """Write late event in the same format as the HTTP logs"""
+        self._writer.writerow(
+            [
+                e.source,
+                e.rfc931 or "-",
+                e.authuser or "-",
+                e.time,
+                e.request or "",
+                e.status,
+                e.size,
+            ]
+        )
+
+    def close(self) -> None:
+        self._fd.close()
@@ -0,0 +1,106 @@
+import os
+import json
+import heapq
+import logging
+import threading
+import socketserver
+from typing import Iterable, Iterator
+from argparse import ArgumentParser
+
+from .event import WebLogSummary
+from .analyze import AnalyticsProcessor
+from .action import TerminalNotifier
+from .__main__ import addAnalyticsArguments, analyticsOptions
+
+
+def iterStates(lines: Iterable[str]) -> Iterator[WebLogSummary]:
+    """ Per-second summaries from JSON state lines, skipping malformed ones """
+    for line in lines:
+        try:
+            yield WebLogSummary.fromState(json.loads(line))
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Malformed state: {line.strip()}")
+
+
+def aggregateFiles(processor: AnalyticsProcessor, paths: list[str]) -> None:
+    """
+    Merge state exported by several monitors to files. Each is in time order, so they're
+    merged in time order, with the summaries of the same second grouped and merged.
+    """
+    files = [open(path) for path in paths]
+    try:
+        for summary in heapq.merge(*(iterStates(fd) for fd in files)):
+            processor.consume(summary)  # type: ignore
+    finally:
+        for fd in files:
+            fd.close()
+    processor.consume(None)
+
+
+def serveSocket(processor: AnalyticsProcessor, path: str) -> None:
+    """
+    Merge state streamed by monitors connecting to a Unix socket, until interrupted.
+    Summaries from different monitors are reordered within the processor's buffer time.
+    """
+    lock = threading.Lock()
+
+    class StateHandler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            logging.info("Monitor connected")
+            lines = (line.decode() for line in self.rfile)
+            for summary in iterStates(lines):
+                with lock:
+                    processor.consume(summary)  # type: ignore
+            logging.info("Monitor disconnected")
+
+    with socketserver.ThreadingUnixStreamServer(path, StateHandler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+    with lock:
+        processor.consume(None)
+
+
+def main():
+    """ Aggregate stats state exported by several monitors, and alert on global traffic """
+    argsParser = ArgumentParser(
+        description="Merge stats state of several monitors, e.g. one per web node, "
+        "exported with --export_state, and monitor overall traffic"
+    )
+    argsParser.add_argument(
+        "files", help="State files to merge, once", nargs="*", default=[]
+    )
+    argsParser.add_argument(
+        "--socket", help="Unix socket path to receive state from monitors", default=None
+    )
+    argsParser.add_argument("--verbose", help="Print DEBUG lines", action="store_true")
+    addAnalyticsArguments(argsParser)
+
+    args = argsParser.parse_args()
+    if bool(args.files) == bool(args.socket):
+        argsParser.error("Expected either state files or --socket")
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    # State is made of per-second summaries, processed as such. Late ones are dropped,
+    # as they can't be written back as log lines
+    options = analyticsOptions(args)
+    options.update(summarize=True)
+    processor = AnalyticsProcessor(TerminalNotifier(), **options)
+    try:
+        if args.socket:
+            serveSocket(processor, args.socket)
+        else:
+            aggregateFiles(processor, args.files)
+    finally:
+        processor.close()
+
+
+if __name__ == "__main__":
+    main()
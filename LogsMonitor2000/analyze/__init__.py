@@ -1,2 +1,17 @@
 # All that needs to be auto-exposed to the above
-from .processor import Processor, AnalyticsProcessor
\ No newline at end of file
+from .processor import Processor, AnalyticsProcessor
+
+# Optional features, imported on first use to keep startup quick
+_LAZY = {
+    "ReplayProcessor": ".replayProcessor",
+    "openStateSink": ".stateExportCalculator",
+    "RingBufferProcessor": ".ringBufferProcessor",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    return getattr(importlib.import_module(_LAZY[name], __name__), name)
@@ -0,0 +1,80 @@
+import logging
+from typing import Counter
+from ..event import Event, WebLogEvent, WebLogSummary
+from ..action import Action
+from ..sketch import QuantileSketch
+from .calculator import StreamCalculator
+from collections import Counter
+
+
+class BandwidthCalculator(StreamCalculator):
+    """
+    Keeps track of bytes served per second, top sections by bytes served and
+    response size percentiles in a given time-interval
+    """
+
+    requiredFields = frozenset({"section", "size"})
+    summarySketches = frozenset({"sizes"})
+
+    def __init__(self, action: Action, events, windowSizeInSeconds=10, topSections=3):
+        super().__init__(action, events, windowSizeInSeconds)
+
+        # Collect stats every x seconds
+        self._timeLastCollectedStats: int = -1
+
+        # Number of sections to display, by bytes served
+        self._topSections: int = topSections
+
+        # Bytes served in sliding window, in total and per section
+        self._totalBytes: int = 0
+        self._sectionBytes: Counter[str] = Counter()
+
+        # Response sizes in sliding window, for percentiles
+        self._sizes = QuantileSketch()
+
+    def _add(self, events: list[WebLogEvent], sign: int) -> None:
+        "Add (or remove, with negative sign) bytes served by events"
+        if type(events[0]) is WebLogSummary:
+            summary: WebLogSummary = events[0]  # type: ignore
+            self._totalBytes += sign * summary.bytes
+            for section, size in summary.sectionBytes.items():
+                self._sectionBytes[section] += sign * size
+            self._sizes.merge(summary.sizes, sign)
+            return
+        if type(events[0]) is not WebLogEvent:
+            raise ValueError(f"Expected WebLogEvent for: {events}")
+
+        for e in events:
+            self._totalBytes += sign * e.size * e.weight
+            self._sectionBytes[e.section] += sign * e.size * e.weight
+            self._sizes.add(e.size, sign * e.weight)
+
+    def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        self._add(events, 1)
+
+    def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        self._add(events, -1)
+
+    def triggerAlert(self, latestEventTime: int) -> None:
+        """ Trigger alerts with bandwidth and response size stats every interval """
+        if self._timeLastCollectedStats == -1:
+            self._timeLastCollectedStats = latestEventTime
+        if (latestEventTime - self._timeLastCollectedStats) < self.windowSize:
+            # Latest event time hasn't yet crossed the full interval
+            return
+
+        topSections = ", ".join(
+            f"{section} ({size} bytes)"
+            for section, size in self._sectionBytes.most_common(self._topSections)
+        )
+        statsEvent = Event(
+            priority=Event.Priority.MEDIUM,
+            message=f"Bandwidth: {self._totalBytes / max(1, self.windowSize):.2f} bytes/s"
+            + f", top sections: {topSections}"
+            + f", response size p50: {self._sizes.quantile(0.5):.0f} bytes"
+            + f", p99: {self._sizes.quantile(0.99):.0f} bytes",
+            time=latestEventTime,
+        )
+        self._action.notify(statsEvent)
+        self._timeLastCollectedStats = latestEventTime
+        logging.debug(f"Fired bandwidth stats alert {statsEvent}")
@@ -0,0 +1,273 @@
+import os
+import json
+import math
+import time
+import logging
+from typing import Deque, Optional
+from ..event import Event
+from ..action import Action
+from datetime import datetime
+from .calculator import StreamCalculator, countEvents
+
+# Daily seasonality, in buckets of 15 minutes sharing a seasonal offset
+_SEASON = 24 * 3600
+_SEASON_BUCKET = 15 * 60
+
+# Per-second smoothing of the level, i.e. memory of about 10 minutes, and of each
+# seasonal offset, updated every second of its bucket, i.e. memory of about 3 days
+_LEVEL_SMOOTHING = 1 / 600
+_SEASONAL_SMOOTHING = 1 / (3 * _SEASON_BUCKET)
+
+# Per-second smoothing of the deviations variance, i.e. memory of about an hour
+_VARIANCE_SMOOTHING = 1 / 3600
+
+# Seconds observed before alerting, for the variance to settle
+_WARMUP = 3600
+
+# Seconds without requests observed at most between two seconds with requests, e.g.
+# when a log is replayed without ticks. Seconds the monitor was down for are missing
+# rather than without requests, and not observed
+_MAX_GAP = _SEASON
+
+# Seconds of event time between checkpoints
+_CHECKPOINT_INTERVAL = 300
+
+
+class SeasonalBaseline:
+    """
+    Additive Holt-Winters model of requests per second, with a level and a daily
+    seasonal offset per bucket of the day, without trend. Each second updates the
+    level, the offset of its bucket, and an EWMA over the alert interval of the
+    residuals (requests minus forecast) along with their variance, all in O(1).
+
+    The standard deviation is floored at that of Poisson noise around the forecast,
+    so a very steady baseline doesn't alert on every blip. Until the seasonal offsets
+    are learned, i.e. in the first days, it behaves as an EWMA of the traffic.
+    """
+
+    def __init__(self, intervalInSeconds=60):
+        # Weight of the latest second in the smoothed residual
+        self._smoothing: float = 2 / (intervalInSeconds + 1)
+
+        self.level: float = 0
+        self.seasonal: list[float] = [0] * (_SEASON // _SEASON_BUCKET)
+        self.residual: float = 0
+        self.variance: float = 0
+
+        # Number of seconds observed
+        self.seconds: int = 0
+
+    def _bucket(self, time: int) -> int:
+        return time % _SEASON // _SEASON_BUCKET
+
+    def forecast(self, time: int) -> float:
+        "Expected requests per second at time"
+        return max(0, self.level + self.seasonal[self._bucket(time)])
+
+    def update(self, time: int, requests: float) -> None:
+        "Observe the number of requests of a second"
+        bucket = self._bucket(time)
+        if self.seconds == 0:
+            self.level = requests
+        residual = requests - self.forecast(time)
+
+        self.residual += self._smoothing * (residual - self.residual)
+        self.variance += _VARIANCE_SMOOTHING * (self.residual ** 2 - self.variance)
+
+        seasonal = self.seasonal[bucket]
+        self.level += _LEVEL_SMOOTHING * (requests - seasonal - self.level)
+        self.seasonal[bucket] += _SEASONAL_SMOOTHING * (
+            requests - self.level - seasonal
+        )
+        self.seconds += 1
+
+    def deviations(self, time: int) -> float:
+        "Number of standard deviations the smoothed requests are above forecast"
+        poissonVariance = (
+            max(1, self.forecast(time)) * self._smoothing / (2 - self._smoothing)
+        )
+        return self.residual / math.sqrt(max(self.variance, poissonVariance))
+
+    def toState(self) -> dict:
+        " JSON serializable state, to checkpoint "
+        return {
+            "smoothing": self._smoothing,
+            "level": self.level,
+            "seasonal": self.seasonal,
+            "residual": self.residual,
+            "variance": self.variance,
+            "seconds": self.seconds,
+        }
+
+    @classmethod
+    def fromState(cls, state: dict) -> "SeasonalBaseline":
+        " Model from its state "
+        baseline = cls()
+        baseline._smoothing = state["smoothing"]
+        baseline.level = state["level"]
+        baseline.seasonal = state["seasonal"]
+        baseline.residual = state["residual"]
+        baseline.variance = state["variance"]
+        baseline.seconds = state["seconds"]
+        return baseline
+
+
+class BaselineCalculator(StreamCalculator):
+    """
+    Trigger alert if the number of requests per second, smoothed over the last x
+    seconds, is more than a number of standard deviations above its seasonal baseline,
+    or returns back to normal. Unlike a fixed threshold it follows the daily traffic
+    curve of each site, so the same configuration fits sites of any traffic.
+
+    The baseline model is a few hundred numbers, checkpointed to a file if set so it
+    needn't be learned again after a restart. The checkpoint's wall-clock time tells
+    the seconds the monitor was down for, whose requests are unknown and left out of
+    the model, from those it then saw without requests, observed as such.
+    """
+
+    def __init__(
+        self,
+        action: Action,
+        events: Deque[list[Event]],
+        windowSizeInSeconds=60,
+        deviationsThreshold: float = 4,
+        checkpointPath: Optional[str] = None,
+    ):
+        # Seconds are observed once by the model rather than kept in the shared window
+        super().__init__(action, events, windowSizeInSeconds=1)
+        self._threshold = deviationsThreshold
+        self._checkpointPath = checkpointPath
+
+        self._baseline = SeasonalBaseline(windowSizeInSeconds)
+        if checkpointPath is not None and os.path.exists(checkpointPath):
+            with open(checkpointPath) as fd:
+                state = json.load(fd)
+            self._baseline = SeasonalBaseline.fromState(state["baseline"])
+            self._timeLastObserved: int = state["time"]
+            self._requests: int = state["requests"]
+            # Seconds down for since checkpointed, any gap until the next request if
+            # not known
+            wallTime = state.get("wallTime")
+            downtime = (
+                _MAX_GAP if wallTime is None else max(0, int(time.time() - wallTime))
+            )
+            self._timeResumed: int = self._timeLastObserved + min(downtime, _MAX_GAP)
+            logging.info(
+                f"Baseline restored from {checkpointPath}, down for {downtime}s"
+            )
+        else:
+            # Requests of the latest second, observed once the next second starts
+            self._timeLastObserved = -1
+            self._requests = 0
+            # Time from which seconds without requests are observed, before which
+            # they're missing
+            self._timeResumed = -1
+        self._timeLastCheckpointed: int = self._timeLastObserved
+
+        # Until the first second is counted, if restored from a checkpoint
+        self._isRestored: bool = self._timeLastObserved != -1
+
+        # Store if in high-traffic alert mode
+        self._isHighAlert = False
+
+    def _advance(self, now: int) -> None:
+        "Observe latest second's requests, and none for seconds since unless missing"
+        if self._isRestored and now < self._timeLastObserved:
+            # Log older than the checkpoint, e.g. when backfilling, restart from there
+            self._timeLastObserved = -1
+            self._timeResumed = -1
+            self._requests = 0
+        self._isRestored = False
+        if self._timeLastObserved == -1:
+            self._timeLastObserved = now
+            self._timeLastCheckpointed = now
+            return
+        if now <= self._timeLastObserved:
+            return
+        self._baseline.update(self._timeLastObserved, self._requests)
+        start = max(self._timeLastObserved + 1, self._timeResumed, now - _MAX_GAP)
+        for t in range(start, now):
+            self._baseline.update(t, 0)
+        self._requests = 0
+        self._timeLastObserved = now
+
+    def count(self, events: list[Event]) -> None:
+        """
+        Count requests of their second. Any of seconds already observed, e.g. flushed
+        late after a tick, are counted in the latest second instead.
+        """
+        self._advance(events[0].time)
+        self._requests += countEvents(events)
+
+    def discount(self, events: list[Event]) -> None:
+        "Nothing to do, seconds are only observed once"
+
+    def triggerAlert(self, now: int) -> None:
+        """
+        If traffic deviates above threshold, alert once until recovery.
+        If back below threshold, alert once that it's recovered.
+        """
+        self._advance(now)
+        if now - self._timeLastCheckpointed >= _CHECKPOINT_INTERVAL:
+            self.checkpoint()
+        if self._baseline.seconds < _WARMUP:
+            return
+
+        # Deviation of the seconds observed so far, i.e. up to the previous one
+        time = now - 1
+        deviations = self._baseline.deviations(time)
+        if deviations > self._threshold and not self._isHighAlert:
+            hits = self._baseline.forecast(time) + self._baseline.residual
+            alertHighTraffic = Event(
+                time=now,
+                priority=Event.Priority.HIGH,
+                message="Traffic above baseline generated an alert - "
+                f"hits {hits:.2f}, {deviations:.1f} standard deviations above "
+                f"{self._baseline.forecast(time):.2f}, "
+                f"triggered at {datetime.fromtimestamp(now)}",
+            )
+            self._action.notify(alertHighTraffic)
+            self._isHighAlert = True
+            logging.debug(f"Traffic above baseline, fired {alertHighTraffic}")
+
+        if deviations <= self._threshold and self._isHighAlert:
+            alertBackToNormal = Event(
+                time=now,
+                priority=Event.Priority.HIGH,
+                message="Traffic is now back to baseline as of "
+                f"{datetime.fromtimestamp(now)}",
+            )
+            self._action.notify(alertBackToNormal)
+            self._isHighAlert = False
+            logging.debug(f"Traffic back to baseline, fired {alertBackToNormal}")
+
+    def snapshot(self, now: int) -> dict:
+        time = now - 1
+        return {
+            "baseline": {
+                "forecast": self._baseline.forecast(time),
+                "deviations": self._baseline.deviations(time),
+                "threshold": self._threshold,
+                "isAlert": self._isHighAlert,
+            }
+        }
+
+    def checkpoint(self) -> None:
+        "Save baseline state to the checkpoint file if set, replacing it atomically"
+        if self._checkpointPath is None or self._timeLastObserved == -1:
+            return
+        state = {
+            "time": self._timeLastObserved,
+            "wallTime": time.time(),
+            "requests": self._requests,
+            "baseline": self._baseline.toState(),
+        }
+        with open(self._checkpointPath + ".tmp", mode="w") as fd:
+            json.dump(state, fd)
+        os.replace(self._checkpointPath + ".tmp", self._checkpointPath)
+        self._timeLastCheckpointed = self._timeLastObserved
+        logging.debug(f"Baseline checkpointed at {self._timeLastObserved}")
+
+    def close(self) -> None:
+        "Checkpoint the baseline, e.g. at the end of the log"
+        self.checkpoint()
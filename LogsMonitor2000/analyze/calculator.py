@@ -1,12 +1,25 @@
 import logging
-from typing import Deque
-from ..event import Event
+from typing import Deque, Sequence
+from ..event import Event, WebLogSummary
 from ..action import Action
 
 
+def countEvents(events: Sequence[Event]) -> int:
+    "Number of requests in a group of events, either raw (maybe sampled) or summarised"
+    if type(events[0]) is WebLogSummary:
+        return events[0].count  # type: ignore
+    return sum(e.weight for e in events)  # type: ignore
+
+
 class StreamCalculator:
     "Interface for implementing different kinds of statistics calculation on a window of events"
 
+    # WebLogEvent fields used by the calculator, any others needn't be parsed
+    requiredFields: frozenset = frozenset()
+
+    # Sketches of per-second summaries used by the calculator, others aren't built
+    summarySketches: frozenset = frozenset()
+
     def __init__(
         self, action: Action, events: Deque[list[Event]], windowSizeInSeconds=10
     ):
@@ -62,3 +75,10 @@ class StreamCalculator:
     def triggerAlert(self, eventTime: int) -> None:
         "If conditions are met, trigger alert"
         raise NotImplementedError()
+
+    def snapshot(self, now: int) -> dict:
+        "Current stats and alert state to serve live, e.g. over HTTP, none by default"
+        return {}
+
+    def close(self) -> None:
+        "Release any resources held, e.g. worker processes"
@@ -0,0 +1,130 @@
+import logging
+from typing import Deque
+from ..event import Event, WebLogEvent, WebLogSummary
+from ..action import Action
+from ..sketch import HyperLogLog
+from .calculator import StreamCalculator
+
+# Distinct sources sketches per section, e.g. of one second or an interval
+_Sketches = dict[str, HyperLogLog]
+
+
+def _merged(into: _Sketches, sketches: _Sketches) -> _Sketches:
+    "Merge sketches per section into the others, copied so both can still be used"
+    merged = {section: sketch.copy() for section, sketch in into.items()}
+    for section, sketch in sketches.items():
+        if section in merged:
+            merged[section].merge(sketch)
+        else:
+            merged[section] = sketch.copy()
+    return merged
+
+
+class DistinctSourcesCalculator(StreamCalculator):
+    """
+    Periodically reports the number of distinct sources (e.g. client IPs) over the
+    sliding window, overall and for the sections with the most of them.
+
+    Distinct sources of each section are estimated with a HyperLogLog sketch per second
+    (~1KB each, 3.25% standard error). Sketches can't be removed from a merge, so the
+    window is aggregated with two stacks: seconds entering the window are merged into
+    a running "back" aggregate, and when the oldest second leaves the window, the back
+    seconds are first moved to a "front" stack of suffix aggregates, i.e. each holding
+    the merge of that second and all newer ones in front. The window is then the merge
+    of the front top and the back aggregate, for an amortized constant number of
+    merges per second rather than re-merging the whole window.
+    """
+
+    requiredFields = frozenset({"section", "source"})
+    summarySketches = frozenset({"sectionSources"})
+
+    def __init__(
+        self,
+        action: Action,
+        events: Deque[list[Event]],
+        windowSizeInSeconds=60,
+        topSections=3,
+    ):
+        super().__init__(action, events, windowSizeInSeconds)
+        self._topSections: int = topSections
+
+        # Collect stats every x seconds
+        self._timeLastCollectedStats: int = -1
+
+        # Sketches per second newest in window, and their merge
+        self._back: list[_Sketches] = []
+        self._backMerged: _Sketches = {}
+
+        # Suffix merges of oldest seconds in window, oldest (i.e. merge of all) last
+        self._front: list[_Sketches] = []
+
+    def _sketches(self, events: list[WebLogEvent]) -> _Sketches:
+        "Distinct sources sketches per section of a second's events"
+        if type(events[0]) is WebLogSummary:
+            return events[0].sectionSources  # type: ignore
+        if type(events[0]) is not WebLogEvent:
+            raise ValueError(f"Expected WebLogEvent for: {events}")
+
+        sketches: _Sketches = {}
+        for e in events:
+            if e.section not in sketches:
+                sketches[e.section] = HyperLogLog()
+            sketches[e.section].add(e.source)
+        return sketches
+
+    def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Push second's sketches to the back of the window"
+        sketches = self._sketches(events)
+        self._back.append(sketches)
+        for section, sketch in sketches.items():
+            if section in self._backMerged:
+                self._backMerged[section].merge(sketch)
+            else:
+                self._backMerged[section] = sketch.copy()
+
+    def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Pop oldest second's sketches from the front of the window"
+        if not self._front:
+            # Move back seconds to the front, newest first, merging them along the way
+            suffix: _Sketches = {}
+            for sketches in reversed(self._back):
+                suffix = _merged(suffix, sketches)
+                self._front.append(suffix)
+            self._back = []
+            self._backMerged = {}
+        self._front.pop()
+
+    def distinctSources(self) -> _Sketches:
+        "Distinct sources sketches per section over the window"
+        return _merged(self._front[-1] if self._front else {}, self._backMerged)
+
+    def triggerAlert(self, latestEventTime: int) -> None:
+        """ Trigger alerts with distinct sources counts every interval """
+        if self._timeLastCollectedStats == -1:
+            self._timeLastCollectedStats = latestEventTime
+        if (latestEventTime - self._timeLastCollectedStats) < self.windowSize:
+            # Latest event time hasn't yet crossed the full interval
+            return
+
+        sketches = self.distinctSources()
+        if not sketches:
+            self._timeLastCollectedStats = latestEventTime
+            return
+        total = HyperLogLog()
+        for sketch in sketches.values():
+            total.merge(sketch)
+        counts = sorted(
+            ((s.count(), section) for section, s in sketches.items()), reverse=True
+        )
+        topSections = ", ".join(
+            f"{section} ({count:.0f})" for count, section in counts[: self._topSections]
+        )
+        statsEvent = Event(
+            priority=Event.Priority.MEDIUM,
+            message=f"Distinct sources: {total.count():.0f}"
+            + f", top sections: {topSections}",
+            time=latestEventTime,
+        )
+        self._action.notify(statsEvent)
+        self._timeLastCollectedStats = latestEventTime
+        logging.debug(f"Fired distinct sources stats alert {statsEvent}")
@@ -0,0 +1,121 @@
+import logging
+from typing import Deque
+from ..event import Event, WebLogEvent, WebLogSummary
+from ..action import Action
+from datetime import datetime
+from .calculator import StreamCalculator, countEvents
+
+
+class ErrorRateCalculator(StreamCalculator):
+    """
+    Trigger alert if the ratio of 5xx (server) or 4xx (client) error responses crosses
+    the given threshold or returns back to normal, once enough requests are in the window.
+    """
+
+    requiredFields = frozenset({"status"})
+
+    # Counter index of each status class by its first digit, anything else is index 0
+    _STATUS_CLASSES = {str(c): c for c in range(1, 6)}
+
+    def __init__(
+        self,
+        action: Action,
+        events: Deque[list[Event]],
+        windowSizeInSeconds=60,
+        serverErrorThreshold=0.05,
+        clientErrorThreshold=0.25,
+        minRequests=100,
+    ):
+        super().__init__(action, events, windowSizeInSeconds)
+
+        # Error ratio thresholds by status class, a non-positive threshold disables it
+        self._thresholds = {5: serverErrorThreshold, 4: clientErrorThreshold}
+        self._thresholds = {c: t for c, t in self._thresholds.items() if t > 0}
+
+        # No ratio alerts are changed below this number of requests in the window
+        self._minRequests: int = minRequests
+
+        # Number of responses per status class in sliding window, i.e. [?, 1xx .. 5xx]
+        self._classCounts: list[int] = [0] * 6
+        self._totalCount: int = 0
+
+        # Store status classes in high error rate alert mode
+        self._isHighAlert: dict[int, bool] = {c: False for c in self._thresholds}
+
+    def _add(self, events: list[WebLogEvent], sign: int) -> None:
+        "Add (or remove, with negative sign) events to status class counters"
+        classes = self._STATUS_CLASSES
+        counts = self._classCounts
+        if type(events[0]) is WebLogSummary:
+            summary: WebLogSummary = events[0]  # type: ignore
+            for status, n in summary.statuses.items():
+                counts[classes.get(status[:1], 0)] += sign * n
+            self._totalCount += sign * summary.count
+            return
+        if type(events[0]) is not WebLogEvent:
+            raise ValueError(f"Expected WebLogEvent for: {events}")
+
+        for e in events:
+            counts[classes.get(e.status[:1], 0)] += sign * e.weight
+        self._totalCount += sign * countEvents(events)
+
+    def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Count response status classes"
+        self._add(events, 1)
+
+    def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Discount response status classes"
+        self._add(events, -1)
+
+    def ratio(self, statusClass: int) -> float:
+        "Ratio of responses of the given status class in sliding window"
+        return self._classCounts[statusClass] / max(1, self._totalCount)
+
+    def snapshot(self, now: int) -> dict:
+        return {
+            "errorRates": {
+                f"{statusClass}xx": {
+                    "ratio": self.ratio(statusClass),
+                    "threshold": threshold,
+                    "isAlert": self._isHighAlert[statusClass],
+                }
+                for statusClass, threshold in self._thresholds.items()
+            }
+        }
+
+    def triggerAlert(self, now: int) -> None:
+        """
+        If error ratio above threshold, alert once until recovery.
+        If error ratio back below threshold, alert once that it's recovered, even with
+        too few requests for a meaningful ratio, e.g. once traffic stopped.
+        """
+        for statusClass, threshold in self._thresholds.items():
+            ratio = self.ratio(statusClass)
+            logging.debug(f"{statusClass}xx error ratio: {ratio}")
+
+            if ratio <= threshold and self._isHighAlert[statusClass]:
+                alertBackToNormal = Event(
+                    time=now,
+                    priority=Event.Priority.HIGH,
+                    message=f"{statusClass}xx error rate is now back to normal "
+                    f"({ratio:.2%}) as of {datetime.fromtimestamp(now)}",
+                )
+                self._action.notify(alertBackToNormal)
+                self._isHighAlert[statusClass] = False
+                logging.debug(f"Error rate back to normal, fired {alertBackToNormal}")
+
+            if self._totalCount < self._minRequests:
+                # Too few requests for a meaningful ratio to raise an alert
+                continue
+
+            if ratio > threshold and not self._isHighAlert[statusClass]:
+                alertHighErrorRate = Event(
+                    time=now,
+                    priority=Event.Priority.HIGH,
+                    message=f"High {statusClass}xx error rate generated an alert - "
+                    f"{ratio:.2%} of {self._totalCount} requests, "
+                    f"triggered at {datetime.fromtimestamp(now)}",
+                )
+                self._action.notify(alertHighErrorRate)
+                self._isHighAlert[statusClass] = True
+                logging.debug(f"High error rate, fired {alertHighErrorRate}")
@@ -3,7 +3,7 @@ from typing import Deque
 from ..event import Event
 from ..action import Action
 from datetime import datetime
-from .calculator import StreamCalculator
+from .calculator import StreamCalculator, countEvents
 
 
 class HighTrafficCalculator(StreamCalculator):
@@ -30,16 +30,25 @@ class HighTrafficCalculator(StreamCalculator):
 
     def count(self, events: list[Event]) -> None:
         "Count to use in high traffic average"
-        self._totalCount += len(events)
+        self._totalCount += countEvents(events)
         self._average = self._totalCount / max(1, self.windowSize)
         logging.debug(f"High traffic average: {self._average}")
 
     def discount(self, oldOvents: list[Event]) -> None:
         "Discount and check if avg back to normal"
-        self._totalCount -= len(oldOvents)
+        self._totalCount -= countEvents(oldOvents)
         self._average = self._totalCount / max(1, self.windowSize)
         logging.debug(f"High traffic average: {self._average}")
 
+    def snapshot(self, now: int) -> dict:
+        return {
+            "highTraffic": {
+                "rate": self._average,
+                "threshold": self._threshold,
+                "isAlert": self._isHighAlert,
+            }
+        }
+
     def triggerAlert(self, now: int) -> None:
         """
         If average above threshold, alert once until recovery.
@@ -0,0 +1,158 @@
+import logging
+from typing import Counter, Deque
+from collections import Counter
+from ..event import Event, WebLogEvent, WebLogSummary
+from ..action import Action
+from datetime import datetime
+from .calculator import StreamCalculator
+
+
+class KeyedRateCalculator(StreamCalculator):
+    """
+    Trigger alert if the average number of requests per second of any one source or
+    section (e.g. a single IP, or /api) over the last x seconds crosses its threshold,
+    or returns back to normal, across large numbers of distinct keys.
+
+    Counts are kept in a timing wheel of per-second counts per key, with running window
+    totals per key updated as seconds enter and leave the wheel. Only keys counted in the
+    current second, or in alert and discounted, are checked against their threshold,
+    so the cost per second follows the number of active keys rather than of all keys.
+    """
+
+    # Threshold key applying to all keys without their own threshold
+    DEFAULT_KEY = "*"
+
+    def __init__(
+        self,
+        action: Action,
+        events: Deque[list[Event]],
+        field: str,
+        thresholds: dict[str, float],
+        windowSizeInSeconds=10,
+    ):
+        # Counts are kept in the wheel rather than the shared window
+        super().__init__(action, events, windowSizeInSeconds=1)
+        if field not in ("section", "source"):
+            raise ValueError(
+                f"Keyed rate alerts are per section or source, not: {field}"
+            )
+        self.requiredFields = frozenset({field})
+        self._field = field
+        self._wheelSize: int = windowSizeInSeconds
+
+        # Average requests per second threshold per key, with DEFAULT_KEY for the others
+        self._thresholds = thresholds
+        self._defaultThreshold = thresholds.get(self.DEFAULT_KEY)
+
+        # Counts per key of each second in the window, at index time % wheel size
+        self._wheel: list[Counter[str]] = [
+            Counter() for _ in range(windowSizeInSeconds)
+        ]
+        self._timeLastAdvanced: int = -1
+
+        # Number of requests per key in window, only keys with requests in window
+        self._totals: dict[str, int] = {}
+
+        # Keys whose rate changed since last checked against thresholds, in order
+        # of first change for deterministic alerts (i.e. a dict used as ordered set)
+        self._touched: dict[str, None] = {}
+
+        # Keys in high-traffic alert mode
+        self._isHighAlert: set[str] = set()
+
+    def _advance(self, now: int) -> None:
+        "Move wheel forward to now, discounting seconds falling out of the window"
+        if now <= self._timeLastAdvanced:
+            return
+        if self._timeLastAdvanced == -1:
+            self._timeLastAdvanced = now
+            return
+        size = self._wheelSize
+        for t in range(max(self._timeLastAdvanced + 1, now - size + 1), now + 1):
+            slot = self._wheel[t % size]
+            for key, n in slot.items():
+                total = self._totals[key] - n
+                if total:
+                    self._totals[key] = total
+                else:
+                    del self._totals[key]
+                if key in self._isHighAlert:
+                    self._touched[key] = None
+            slot.clear()
+        self._timeLastAdvanced = now
+
+    def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Count events per key in the wheel slot of their second"
+        now = events[0].time
+        self._advance(now)
+        if now <= self._timeLastAdvanced - self._wheelSize:
+            # Already out of the window, e.g. after time advanced while idle
+            return
+
+        counts: Counter[str]
+        if type(events[0]) is WebLogSummary:
+            summary: WebLogSummary = events[0]  # type: ignore
+            counts = summary.sections if self._field == "section" else summary.sources
+        else:
+            counts = Counter()
+            for e in events:
+                counts[getattr(e, self._field)] += e.weight
+
+        slot = self._wheel[now % self._wheelSize]
+        slot.update(counts)
+        totals = self._totals
+        for key, n in counts.items():
+            totals[key] = totals.get(key, 0) + n
+        self._touched.update(dict.fromkeys(counts))
+
+    def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Nothing to do, counts expire as the wheel moves forward"
+
+    def rate(self, key: str) -> float:
+        "Average requests per second of key in window"
+        return self._totals.get(key, 0) / self._wheelSize
+
+    def snapshot(self, now: int) -> dict:
+        "Keys in alert, with their rates"
+        return {
+            f"{self._field}Alerts": {
+                key: self.rate(key) for key in sorted(self._isHighAlert)
+            }
+        }
+
+    def triggerAlert(self, now: int) -> None:
+        """
+        For each key with a changed rate, if above its threshold alert once until
+        recovery. If back below threshold, alert once that it's recovered.
+        """
+        self._advance(now)
+        for key in self._touched:
+            threshold = self._thresholds.get(key, self._defaultThreshold)
+            if threshold is None:
+                continue
+            rate = self.rate(key)
+
+            if rate > threshold and key not in self._isHighAlert:
+                alertHighTraffic = Event(
+                    time=now,
+                    priority=Event.Priority.HIGH,
+                    message=f"High traffic for {self._field} {key} generated an alert - "
+                    f"hits {rate:.2f}, triggered at {datetime.fromtimestamp(now)}",
+                )
+                self._action.notify(alertHighTraffic)
+                self._isHighAlert.add(key)
+                logging.debug(f"High keyed traffic, fired {alertHighTraffic}")
+
+            if rate <= threshold and key in self._isHighAlert:
+                alertBackToNormal = Event(
+                    time=now,
+                    priority=Event.Priority.HIGH,
+                    message=f"Traffic for {self._field} {key} is now back to normal "
+                    f"as of {datetime.fromtimestamp(now)}",
+                )
+                self._action.notify(alertBackToNormal)
+                self._isHighAlert.discard(key)
+                logging.debug(
+                    f"Keyed traffic back to normal, fired {alertBackToNormal}"
+                )
+        self._touched.clear()
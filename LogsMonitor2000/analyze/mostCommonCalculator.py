@@ -1,14 +1,28 @@
 import logging
-from typing import Counter
-from ..event import Event, WebLogEvent
+from typing import Counter, Optional
+from ..event import Event, WebLogEvent, WebLogSummary
 from ..action import Action
 from .calculator import StreamCalculator
 from collections import Counter
 
+# Number of most common sections and sources in live snapshots
+_SNAPSHOT_TOP = 10
+
+
+def _discount(counts: Counter[str], key: str, n: int) -> None:
+    "Remove n requests of a key, and the key itself once it has none left in window"
+    left = counts[key] - n
+    if left > 0:
+        counts[key] = left
+    else:
+        del counts[key]
+
 
 class MostCommonCalculator(StreamCalculator):
     "Keeps track of most common source, most common section in a given time-interval"
 
+    requiredFields = frozenset({"section", "source"})
+
     def __init__(self, action: Action, events, windowSizeInSeconds=10):
         super().__init__(action, events, windowSizeInSeconds)
 
@@ -20,24 +34,60 @@ class MostCommonCalculator(StreamCalculator):
         self._countSources: Counter[str] = Counter()
 
     def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        if type(events[0]) is WebLogSummary:
+            summary: WebLogSummary = events[0]  # type: ignore
+            for section, n in summary.sections.items():
+                _discount(self._countSections, section, n)
+            for source, n in summary.sources.items():
+                _discount(self._countSources, source, n)
+            return
         if type(events[0]) is not WebLogEvent:
             raise ValueError(f"Expected WebLogEvent for: {events}")
 
         for e in events:
             logging.debug(f"Removing old event from most common stats: {e.time}")
-            self._countSections[e.section] -= 1
-            self._countSources[e.source] -= 1
+            _discount(self._countSections, e.section, e.weight)
+            _discount(self._countSources, e.source, e.weight)
             # No need to update calculation for this calculator at 'discount'
             # Alerts for this are only meaningful when we add a new one in case it puts us at a new interval
 
     def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        if type(events[0]) is WebLogSummary:
+            summary: WebLogSummary = events[0]  # type: ignore
+            self._countSections.update(summary.sections)
+            self._countSources.update(summary.sources)
+            return
         if type(events[0]) is not WebLogEvent:
             raise ValueError(f"Expected WebLogEvent for: {events}")
 
         for e in events:
             logging.debug(f"Counting log {e.section} from {e.source} at {e.time}")
-            self._countSections[e.section] += 1
-            self._countSources[e.source] += 1
+            self._countSections[e.section] += e.weight
+            self._countSources[e.source] += e.weight
+
+    def mostCommon(self) -> Optional[tuple[tuple[str, int], tuple[str, int]]]:
+        "Most common section and source with their counts, None if no requests in window"
+        mostCommonSections = self._countSections.most_common(1)
+        if not mostCommonSections or mostCommonSections[0][1] <= 0:
+            return None
+        return mostCommonSections[0], self._countSources.most_common(1)[0]
+
+    def snapshot(self, now: int) -> dict:
+        "Most common sections and sources in window"
+        return {
+            "top": {
+                "sections": [
+                    kv
+                    for kv in self._countSections.most_common(_SNAPSHOT_TOP)
+                    if kv[1] > 0
+                ],
+                "sources": [
+                    kv
+                    for kv in self._countSources.most_common(_SNAPSHOT_TOP)
+                    if kv[1] > 0
+                ],
+            }
+        }
 
     def triggerAlert(self, latestEventTime: int) -> None:
         """ Refresh calculation, trigger alerts with most common sections/sources when applicable """
@@ -47,8 +97,12 @@ class MostCommonCalculator(StreamCalculator):
             # Latest event time hasn't yet crossed the full interval
             return
 
-        mostCommonSection = self._countSections.most_common(1)[0]
-        mostCommonSource = self._countSources.most_common(1)[0]
+        mostCommon = self.mostCommon()
+        if mostCommon is None:
+            # No requests in window, e.g. processing time advanced while idle
+            self._timeLastCollectedStats = latestEventTime
+            return
+        mostCommonSection, mostCommonSource = mostCommon
 
         statsEvent = Event(
             priority=Event.Priority.MEDIUM,
@@ -60,4 +114,4 @@ class MostCommonCalculator(StreamCalculator):
         )
         self._action.notify(statsEvent)
         self._timeLastCollectedStats = latestEventTime
-        logging.debug(f"Fired stats alert {statsEvent}")
\ No newline at end of file
+        logging.debug(f"Fired stats alert {statsEvent}")
@@ -0,0 +1,171 @@
+import math
+import logging
+from typing import Deque
+from ..event import Event
+from ..action import Action
+from datetime import datetime
+from .calculator import StreamCalculator, countEvents
+
+
+class RateRing:
+    "Fixed-size ring of event counts, one slot per time bucket of the given resolution"
+
+    def __init__(self, resolution: int, size: int):
+        # Bucket duration in seconds, e.g. 60 for per-minute counts
+        self.resolution = resolution
+
+        # Intervals not aligned to buckets overlap one more bucket, partially
+        self._counts: list[int] = [0] * (size + 1)
+
+        # Latest bucket (i.e. time // resolution) written to the ring
+        self._lastBucket: int = -1
+
+    @property
+    def span(self) -> int:
+        "Duration in seconds covered by the ring"
+        return self.resolution * (len(self._counts) - 1)
+
+    def advance(self, now: int) -> None:
+        "Move ring forward to now, resetting buckets of any time elapsed since"
+        bucket = now // self.resolution
+        if bucket <= self._lastBucket:
+            return
+        size = len(self._counts)
+        for b in range(max(self._lastBucket + 1, bucket - size + 1), bucket + 1):
+            self._counts[b % size] = 0
+        self._lastBucket = bucket
+
+    def add(self, time: int, count: int) -> None:
+        self.advance(time)
+        self._counts[(time // self.resolution) % len(self._counts)] += count
+
+    def sum(self, start: int, end: int) -> float:
+        """
+        Number of events in [start, end] seconds, both within the ring span.
+        Oldest bucket is only partially overlapped by the interval, so its count is
+        prorated assuming uniform traffic within it.
+        """
+        size = len(self._counts)
+        first, last = start // self.resolution, end // self.resolution
+        total: float = sum(self._counts[b % size] for b in range(first + 1, last + 1))
+        overlap = (first + 1) * self.resolution - start
+        if first == last:
+            overlap = end - start + 1
+        return total + self._counts[first % size] * overlap / self.resolution
+
+
+class MultiRateCalculator(StreamCalculator):
+    """
+    Trigger alerts when the average number of requests per second over any of several
+    horizons (e.g. 10s, 1m, 5m, 1h) crosses its threshold, or returns back to normal.
+
+    All horizons are served from one pass over the events, using constant memory each:
+    * Hierarchical per-second, per-minute and per-hour ring buffers of counts, giving
+      windowed rates accurate to the second up to 1 minute, then to the minute up to 1 hour.
+    * An exponentially decayed rate per horizon, using the horizon as time constant.
+    """
+
+    # Rings from finest to coarsest resolution, largest horizon is a full day
+    _RINGS = ((1, 60), (60, 60), (3600, 24))
+
+    def __init__(
+        self,
+        action: Action,
+        events: Deque[list[Event]],
+        horizonThresholds: dict[int, float],
+    ):
+        # Counts are kept in rings rather than the shared window, only hold the latest second
+        super().__init__(action, events, windowSizeInSeconds=1)
+
+        self._rings = [RateRing(resolution, size) for resolution, size in self._RINGS]
+
+        # Average requests per second threshold for each horizon in seconds
+        self._thresholds = dict(sorted(horizonThresholds.items()))
+        for horizon in self._thresholds:
+            if not 0 < horizon <= self._rings[-1].span:
+                raise ValueError(
+                    f"Rate horizon must be within 1 to {self._rings[-1].span}s: {horizon}"
+                )
+
+        # Exponentially decayed rate per horizon, as of _timeLastCounted
+        self._decayedRates: dict[int, float] = {h: 0.0 for h in self._thresholds}
+        self._timeLastCounted: int = -1
+
+        # Weight of one second's count, so steady traffic converges to its exact rate
+        self._weights = {h: 1 - math.exp(-1 / h) for h in self._thresholds}
+
+        # Horizons currently in high-traffic alert mode
+        self._isHighAlert: dict[int, bool] = {h: False for h in self._thresholds}
+
+    def count(self, events: list[Event]) -> None:
+        "Count events in every ring and decayed rate"
+        now = events[0].time
+        count = countEvents(events)
+        for ring in self._rings:
+            ring.add(now, count)
+
+        for horizon in self._decayedRates:
+            self._decayedRates[horizon] = (
+                self.decayedRate(horizon, now) + count * self._weights[horizon]
+            )
+        self._timeLastCounted = now
+
+    def discount(self, events: list[Event]) -> None:
+        "Nothing to do, counts expire as the rings move forward"
+
+    def rate(self, horizon: int, now: int) -> float:
+        "Average requests per second over the last horizon seconds up to now"
+        ring = next(r for r in self._rings if horizon <= r.span)
+        ring.advance(now)
+        return ring.sum(now - horizon + 1, now) / horizon
+
+    def decayedRate(self, horizon: int, now: int) -> float:
+        "Exponentially decayed requests per second with horizon time constant, as of now"
+        if self._timeLastCounted == -1:
+            return 0.0
+        elapsed = now - self._timeLastCounted
+        return self._decayedRates[horizon] * math.exp(-elapsed / horizon)
+
+    def snapshot(self, now: int) -> dict:
+        return {
+            "rateHorizons": {
+                horizon: {
+                    "rate": self.rate(horizon, now),
+                    "threshold": threshold,
+                    "isAlert": self._isHighAlert[horizon],
+                }
+                for horizon, threshold in self._thresholds.items()
+            }
+        }
+
+    def triggerAlert(self, now: int) -> None:
+        """
+        For each horizon, if rate above its threshold alert once until recovery.
+        If rate back below threshold, alert once that it's recovered.
+        """
+        for horizon, threshold in self._thresholds.items():
+            rate = self.rate(horizon, now)
+            logging.debug(f"Traffic rate over {horizon}s: {rate}")
+
+            if rate > threshold and not self._isHighAlert[horizon]:
+                alertHighTraffic = Event(
+                    time=now,
+                    priority=Event.Priority.HIGH,
+                    message=f"High traffic over {horizon}s generated an alert - "
+                    f"hits {rate:.2f} (decayed {self.decayedRate(horizon, now):.2f}), "
+                    f"triggered at {datetime.fromtimestamp(now)}",
+                )
+                self._action.notify(alertHighTraffic)
+                self._isHighAlert[horizon] = True
+                logging.debug(f"High traffic, fired {alertHighTraffic}")
+
+            if rate <= threshold and self._isHighAlert[horizon]:
+                alertBackToNormal = Event(
+                    time=now,
+                    priority=Event.Priority.HIGH,
+                    message=f"Traffic over {horizon}s is now back to normal "
+                    f"as of {datetime.fromtimestamp(now)}",
+                )
+                self._action.notify(alertBackToNormal)
+                self._isHighAlert[horizon] = False
+                logging.debug(f"High traffic back to normal, fired {alertBackToNormal}")
@@ -1,14 +1,30 @@
+import time
+import zlib
 import heapq
 import logging
-from typing import Optional, Deque
+from typing import IO, Optional, Deque
 from collections import deque
 
-from ..event import Event, WebLogEvent
+from ..event import Event, WebLogEvent, WebLogSummary
 from ..action import Action
-from .calculator import StreamCalculator
+from .calculator import StreamCalculator, countEvents
 from .mostCommonCalculator import MostCommonCalculator
 from .highTrafficCalculator import HighTrafficCalculator
 
+# Other calculators are imported when enabled, to keep startup quick for short runs
+
+# Number of recent events whose lateness is tracked to adapt buffer time
+_LATENESS_SAMPLES = 10000
+
+# Approximate memory taken by an event in the window, including its strings
+_EVENT_BYTES = 500
+
+# Weight of the latest second in the smoothed requests per second, when sampling
+_RATE_SMOOTHING = 0.1
+
+# Sampling rate is never decreased further, so alerts keep some accuracy
+_MIN_SAMPLING_RATE = 1 / 1024
+
 
 class Processor:
     """ Collect and analyze log events, then trigger higher-level alerts """
@@ -17,6 +33,9 @@ class Processor:
         # Action to notify
         self._action = action
 
+        # Ratio of events consumed, the others are dropped when below 1
+        self.samplingRate: float = 1.0
+
     def consume(self, event: Optional[Event]) -> None:
         """
         Consume log event and generate other events (alerts) if applicable.
@@ -24,6 +43,28 @@ class Processor:
         """
         raise NotImplementedError()
 
+    def tick(self) -> None:
+        """
+        Advance processing time while no events arrive, e.g. when traffic stops,
+        so any time-based alerts can still fire. Noop by default.
+        """
+
+    def close(self) -> None:
+        "Release any resources held, e.g. worker processes. Noop by default."
+
+
+class _SampledAlerts(Action):
+    """ Annotate alerts with the sampling rate in effect, if any """
+
+    def __init__(self, action: Action, processor: Processor):
+        self._action = action
+        self._processor = processor
+
+    def notify(self, e: Event) -> None:
+        if self._processor.samplingRate < 1:
+            e.message += f" (sampled at {self._processor.samplingRate:.2%})"
+        self._action.notify(e)
+
 
 class AnalyticsProcessor(Processor):
     """
@@ -40,9 +81,51 @@ class AnalyticsProcessor(Processor):
         mostCommonStatsInterval=10,
         highTrafficInterval=120,
         highTrafficThreshold=10,
+        rateHorizons: Optional[dict[int, float]] = None,
+        summarize: bool = False,
+        errorRateInterval=-1,
+        serverErrorThreshold=0.05,
+        clientErrorThreshold=0.25,
+        errorRateMinRequests=100,
+        bandwidthStatsInterval=-1,
+        bufferTime=2,
+        latenessPercentile: Optional[float] = None,
+        minBufferTime=0,
+        maxBufferTime=60,
+        lateAction: Optional[Action] = None,
+        mostCommonShards=1,
+        stateSink: Optional[IO[str]] = None,
+        stateExportInterval=10,
+        keyedRateInterval=10,
+        sourceRateThresholds: Optional[dict[str, float]] = None,
+        sectionRateThresholds: Optional[dict[str, float]] = None,
+        distinctSourcesInterval=-1,
+        maxMemory: Optional[int] = None,
+        rollupPath: Optional[str] = None,
+        baselineInterval=60,
+        baselineDeviations: float = -1,
+        baselineCheckpoint: Optional[str] = None,
+        httpPort: Optional[int] = None,
+        sectionTreeInterval=-1,
+        sectionTreeDepth=2,
+        sectionTreeTop=3,
     ):
         super().__init__(action)
 
+        # Sample events to keep the window within this many bytes, if set
+        self._maxWindowEvents: Optional[int] = None
+        if maxMemory is not None:
+            self._maxWindowEvents = maxMemory // _EVENT_BYTES
+            action = _SampledAlerts(action, self)
+
+        # Smoothed number of requests per second, before sampling
+        self._rateEstimate: float = 0
+        # Sequence number of the latest event while sampling, hashed to sample it
+        self._sampledSequence: int = 0
+
+        # Reduce each second's events to counts per key, only keeping these in the window
+        self._summarize = summarize
+
         # Collect sliding window events to count/discount in calculations as time progresses
         # We often pop-left and append-right hence deque
         # We expect lots of events per second, therefore batch them together
@@ -50,7 +133,17 @@ class AnalyticsProcessor(Processor):
 
         # Initialize calculators, each with its own time-window size
         self._statsCalculators: list[StreamCalculator] = []
-        if mostCommonStatsInterval > 0:
+        if mostCommonStatsInterval > 0 and mostCommonShards > 1:
+            if summarize:
+                raise ValueError("Sharded most common stats require raw events")
+            from .shardedMostCommonCalculator import ShardedMostCommonCalculator
+
+            self._statsCalculators.append(
+                ShardedMostCommonCalculator(
+                    action, self._events, mostCommonStatsInterval, mostCommonShards
+                )
+            )
+        elif mostCommonStatsInterval > 0:
             self._statsCalculators.append(
                 MostCommonCalculator(action, self._events, mostCommonStatsInterval)
             )
@@ -67,15 +160,161 @@ class AnalyticsProcessor(Processor):
         else:
             logging.info("High Traffic Alerts calculator deactivated")
 
+        # Requests per second deviations from a seasonal baseline, with no fixed threshold
+        if baselineDeviations > 0:
+            from .baselineCalculator import BaselineCalculator
+
+            self._statsCalculators.append(
+                BaselineCalculator(
+                    action,
+                    self._events,
+                    baselineInterval,
+                    baselineDeviations,
+                    baselineCheckpoint,
+                )
+            )
+
+        # Requests per second thresholds for each horizon, all served by one calculator
+        if rateHorizons:
+            from .multiRateCalculator import MultiRateCalculator
+
+            self._statsCalculators.append(
+                MultiRateCalculator(action, self._events, rateHorizons)
+            )
+
+        if errorRateInterval > 0:
+            from .errorRateCalculator import ErrorRateCalculator
+
+            self._statsCalculators.append(
+                ErrorRateCalculator(
+                    action,
+                    self._events,
+                    errorRateInterval,
+                    serverErrorThreshold,
+                    clientErrorThreshold,
+                    errorRateMinRequests,
+                )
+            )
+
+        if bandwidthStatsInterval > 0:
+            from .bandwidthCalculator import BandwidthCalculator
+
+            self._statsCalculators.append(
+                BandwidthCalculator(action, self._events, bandwidthStatsInterval)
+            )
+
+        if sectionTreeInterval > 0:
+            if summarize:
+                raise ValueError("Section tree stats require raw events")
+            from .sectionTreeCalculator import SectionTreeCalculator
+
+            self._statsCalculators.append(
+                SectionTreeCalculator(
+                    action,
+                    self._events,
+                    sectionTreeInterval,
+                    sectionTreeDepth,
+                    sectionTreeTop,
+                )
+            )
+
+        if distinctSourcesInterval > 0:
+            from .distinctSourcesCalculator import DistinctSourcesCalculator
+
+            self._statsCalculators.append(
+                DistinctSourcesCalculator(action, self._events, distinctSourcesInterval)
+            )
+
+        # Requests per second thresholds per source and per section
+        for field, thresholds in (
+            ("source", sourceRateThresholds),
+            ("section", sectionRateThresholds),
+        ):
+            if thresholds:
+                from .keyedRateCalculator import KeyedRateCalculator
+
+                self._statsCalculators.append(
+                    KeyedRateCalculator(
+                        action, self._events, field, thresholds, keyedRateInterval
+                    )
+                )
+
+        # Export mergeable state for aggregation with other monitors
+        if stateSink is not None:
+            from .stateExportCalculator import StateExportCalculator
+
+            self._statsCalculators.append(
+                StateExportCalculator(
+                    action, self._events, stateSink, stateExportInterval
+                )
+            )
+
+        # Persist per-second and per-minute counts
+        if rollupPath is not None:
+            from .rollupCalculator import RollupCalculator
+
+            self._statsCalculators.append(
+                RollupCalculator(action, self._events, rollupPath)
+            )
+
+        # Serve snapshots of the current state over HTTP
+        self._snapshotServer = None
+        if httpPort is not None:
+            from .snapshotServer import SnapshotServer
+
+            self._snapshotServer = SnapshotServer(httpPort)
+
+        # Sketches built in summaries, only those some calculator uses
+        self._summarySketches: frozenset = frozenset().union(
+            *(c.summarySketches for c in self._statsCalculators)
+        )
+
         # Cache largest sliding window size as we'll use it often
         self._largestWindow = max([calc.windowSize for calc in self._statsCalculators])
 
-        # Assume events can come out of order for up to 2 seconds
-        self._BUFFER_TIME = 2
+        # Assume events can come out of order for up to 2 seconds by default
+        self._bufferTime: int = bufferTime
 
         # Collect events in a heapq due to buffer out-of-order arrivals before processing them
         self._buffer: list[Event] = []
 
+        # Latest event time seen, to measure how late the others arrive
+        self._maxEventTime: int = -1
+
+        # Wall-clock (monotonic) time the latest event time was first seen, so that
+        # event time can be advanced by the time elapsed since while idle
+        self._timeMaxEventArrived: float = 0
+
+        # Latest time calculators were evaluated at, either on events or ticks
+        self._timeLastEvaluated: int = -1
+
+        # If set, adapt buffer time to this percentile of observed lateness within bounds
+        self._latenessPercentile = latenessPercentile
+        self._minBufferTime: int = minBufferTime
+        self._maxBufferTime: int = maxBufferTime
+
+        # Lateness of recent events, in seconds behind the latest event time at arrival,
+        # and number of them per lateness (capped at just above max buffer time)
+        self._lateness: Deque[int] = deque()
+        self._latenessCounts: list[int] = [0] * (maxBufferTime + 2)
+
+        # Side output for events too late to be processed, dropped if None
+        self._lateAction = lateAction
+
+    def close(self) -> None:
+        "Release calculators resources"
+        for calc in self._statsCalculators:
+            calc.close()
+        if self._snapshotServer is not None:
+            self._snapshotServer.close()
+
+    def requiredFields(self) -> frozenset:
+        "WebLogEvent fields used by any of the calculators, or the late events action"
+        fields = frozenset().union(*(c.requiredFields for c in self._statsCalculators))
+        if self._lateAction is not None:
+            fields |= self._lateAction.requiredFields
+        return fields
+
     def consume(self, latestEvent: Optional[WebLogEvent]) -> None:  # type: ignore
         """Consume sourced traffic entry, calculate stats and volume changes in traffic"""
         if latestEvent is None:
@@ -84,28 +323,117 @@ class AnalyticsProcessor(Processor):
             self._bufferFlush(None)
             return
 
+        if self.samplingRate < 1:
+            if not self._isSampled():
+                return
+            latestEvent.weight = round(1 / self.samplingRate)
+
+        if latestEvent.time > self._maxEventTime:
+            self._maxEventTime = latestEvent.time
+            self._timeMaxEventArrived = time.monotonic()
+            if self._latenessPercentile is not None:
+                self._adaptBufferTime()
+        if self._latenessPercentile is not None:
+            self._observeLateness(self._maxEventTime - latestEvent.time)
+
         if self._events and self._events[-1][0].time > latestEvent.time:
-            logging.warning(
-                f"Event {latestEvent.time} dropped due to >{self._BUFFER_TIME}s late"
-            )
+            if self._lateAction is not None:
+                self._lateAction.notify(latestEvent)
+            else:
+                logging.warning(
+                    f"Event {latestEvent.time} dropped due to >{self._bufferTime}s late"
+                )
             return
 
         # Add to buffer, ordered by time
         heapq.heappush(self._buffer, latestEvent)
 
-        # Flush any "old-enough" items from buffer for processing
-        self._bufferFlush(latestEvent)
+        # Flush any "old-enough" items from buffer for processing, i.e. before watermark
+        self._bufferFlush(latestEvent.time - self._bufferTime)
+
+    def tick(self) -> None:
+        """
+        Advance event time by the wall-clock time elapsed since the latest event arrived,
+        flushing the buffer, discounting events out of the windows and re-evaluating
+        alerts accordingly, at most once per second of event time.
+        """
+        if self._maxEventTime == -1:
+            # Nothing to advance from yet
+            return
+
+        now = self._maxEventTime + int(time.monotonic() - self._timeMaxEventArrived)
+        self._bufferFlush(now - self._bufferTime)
+        if now <= self._timeLastEvaluated:
+            return
+        self._timeLastEvaluated = now
+        logging.debug(f"Processing time advanced to {now}")
+
+        self._removeOldEvents(now)
+        for calc in self._statsCalculators:
+            calc.triggerAlert(now)
+        if self._snapshotServer is not None:
+            self._publishSnapshot(now)
+
+    def _observeLateness(self, lateness: int) -> None:
+        "Keep track of the lateness distribution over a number of recent events"
+        lateness = min(lateness, self._maxBufferTime + 1)
+        self._lateness.append(lateness)
+        self._latenessCounts[lateness] += 1
+        if len(self._lateness) > _LATENESS_SAMPLES:
+            self._latenessCounts[self._lateness.popleft()] -= 1
+
+    def _adaptBufferTime(self) -> None:
+        "Set buffer time to the configured percentile of recent events lateness"
+        rank = len(self._lateness) * self._latenessPercentile / 100  # type: ignore
+        seen = 0
+        lateness = 0
+        for lateness, count in enumerate(self._latenessCounts):
+            seen += count
+            if seen >= rank:
+                break
+        bufferTime = max(self._minBufferTime, min(lateness, self._maxBufferTime))
+        if bufferTime != self._bufferTime:
+            logging.debug(f"Buffer time adapted to {bufferTime}s")
+            self._bufferTime = bufferTime
+
+    def _isSampled(self) -> bool:
+        """
+        Deterministic sampling on a hash of the event's sequence number rather than at
+        random, so the same log gives the same alerts. Unlike a hash of its fields,
+        which may be the same for all requests of a source in a second when only some
+        are parsed, each event is sampled on its own. Sampled events at a rate are also
+        sampled at any higher rate, as rates are powers of 1/2.
+        """
+        self._sampledSequence += 1
+        key = self._sampledSequence.to_bytes(8, "little")
+        return zlib.crc32(key) < self.samplingRate * 2 ** 32
+
+    def _adaptSamplingRate(self, requests: int) -> None:
+        """
+        Halve sampling rate while the window projected from the smoothed or latest
+        requests per second exceeds the memory budget, double it back as load falls.
+        """
+        self._rateEstimate += _RATE_SMOOTHING * (requests - self._rateEstimate)
+        projected = max(requests, self._rateEstimate) * (self._largestWindow + 1)
+        rate = 1.0
+        while projected * rate > self._maxWindowEvents and rate > _MIN_SAMPLING_RATE:  # type: ignore
+            rate /= 2
+        if rate != self.samplingRate:
+            logging.info(
+                f"Sampling {rate:.2%} of events, ~{projected:.0f} requests in window"
+            )
+            self.samplingRate = rate
 
-    def _bufferFlush(self, latestEvent: Optional[WebLogEvent]) -> None:
+    def _bufferFlush(self, watermark: Optional[int]) -> None:
 
         # To store events grouped and sorted by time
         eventGroups: list[list[Event]] = []
 
         # Flush the events that occured beyond the buffer time duration
         while self._buffer and (
-            # None event value is considered a full buffer flush, i.e. at EOF.
-            latestEvent is None
-            or latestEvent.time - self._buffer[0].time > self._BUFFER_TIME
+            # None watermark is considered a full buffer flush, i.e. at EOF.
+            watermark is None
+            or self._buffer[0].time < watermark
         ):
 
             e = heapq.heappop(self._buffer)
@@ -119,7 +447,12 @@ class AnalyticsProcessor(Processor):
                 eventGroups.append([e])
 
         for eventGroup in eventGroups:
+            if self._summarize:
+                sketches = self._summarySketches
+                eventGroup = [WebLogSummary.fromEvents(eventGroup, sketches)]  # type: ignore
             self._events.append(eventGroup)
+            if self._maxWindowEvents is not None:
+                self._adaptSamplingRate(countEvents(eventGroup))
 
             # Given latest event time, remove all entries that fall out from start of the _largestWindow interval
             # updating calculations along the way
@@ -132,6 +465,22 @@ class AnalyticsProcessor(Processor):
             # Generate alerts if applicable
             for calc in self._statsCalculators:
                 calc.triggerAlert(eventGroup[0].time)
+            self._timeLastEvaluated = max(self._timeLastEvaluated, eventGroup[0].time)
+
+        if eventGroups and self._snapshotServer is not None:
+            self._publishSnapshot(eventGroups[-1][0].time)
+
+    def _publishSnapshot(self, now: int) -> None:
+        "Publish the current state, once per flush or tick rather than per second"
+        snapshot = {
+            "time": now,
+            "bufferDepth": len(self._buffer),
+            "windowSeconds": len(self._events),
+            "samplingRate": self.samplingRate,
+        }
+        for calc in self._statsCalculators:
+            snapshot.update(calc.snapshot(now))
+        self._snapshotServer.publish(snapshot)  # type: ignore
 
     def _removeOldEvents(self, newestEventTime: int) -> None:
         "Remove one or more events that have fallen out of any calculators' sliding window"
@@ -0,0 +1,113 @@
+import time
+import logging
+from typing import Deque, Optional
+from collections import deque
+
+from ..event import Event, WebLogEvent
+from ..action import Action
+from ..sketch import QuantileSketch
+from .processor import AnalyticsProcessor
+
+# Wall-clock seconds between replay progress reports
+_REPORT_INTERVAL = 10
+
+
+class _AlertLagRecorder(Action):
+    """ Measure the lag of each alert notified by the replay, before passing it on """
+
+    def __init__(self, action: Action, replay: "ReplayProcessor"):
+        self._action = action
+        self._replay = replay
+
+    def notify(self, e: Event) -> None:
+        self._replay._recordLag(e)
+        self._action.notify(e)
+
+
+class ReplayProcessor(AnalyticsProcessor):
+    """
+    Replays an existing log through the analytics at a multiple of its original pace,
+    or as fast as possible, to find out how much traffic the pipeline keeps up with.
+
+    Events are processed exactly as they would be live, only their consumption is
+    delayed to follow the log's own timestamps, so alerts are deterministic. Reports
+    achieved events per second, alert lag (from the wall-clock time the replay reached
+    an event time, to the time an alert about it is notified) and queue depths.
+    """
+
+    def __init__(self, action: Action, speed: float = 0, **kwargs):
+        super().__init__(_AlertLagRecorder(action, self), **kwargs)
+
+        # Speed multiplier of the log's original pace, 0 or less as fast as possible
+        self._speed = speed
+
+        # Wall-clock and event time of the first event, to pace the others from
+        self._timeStarted: float = -1
+        self._firstEventTime: int = -1
+
+        # Wall-clock time each recent latest event time was reached, to measure lags
+        self._timesReached: Deque[tuple[int, float]] = deque()
+
+        self.eventsCount: int = 0
+        self.lags = QuantileSketch()
+        self.maxLag: float = 0
+        self.maxBufferDepth: int = 0
+        self.maxWindowDepth: int = 0
+        self._timeLastReported: float = -1
+
+    def consume(self, latestEvent: Optional[WebLogEvent]) -> None:  # type: ignore
+        """ Consume event once the replay clock reaches its time, then report progress """
+        if latestEvent is None:
+            super().consume(None)
+            self.report()
+            return
+
+        if self._timeStarted == -1:
+            self._timeStarted = self._timeLastReported = time.monotonic()
+            self._firstEventTime = latestEvent.time
+
+        if latestEvent.time > self._maxEventTime:
+            if self._speed > 0:
+                delay = self._timeStarted - time.monotonic()
+                delay += (latestEvent.time - self._firstEventTime) / self._speed
+                if delay > 0:
+                    time.sleep(delay)
+            self._timesReached.append((latestEvent.time, time.monotonic()))
+
+        super().consume(latestEvent)
+        self.eventsCount += 1
+
+        self.maxBufferDepth = max(self.maxBufferDepth, len(self._buffer))
+        self.maxWindowDepth = max(self.maxWindowDepth, len(self._events))
+        if time.monotonic() - self._timeLastReported >= _REPORT_INTERVAL:
+            self.report()
+
+    def _recordLag(self, alert: Event) -> None:
+        "Time elapsed since the replay reached the alert's event time"
+        reached = self._timesReached
+        # Alerts are notified in time order, earlier times are no longer needed
+        while len(reached) > 1 and reached[1][0] <= alert.time:
+            reached.popleft()
+        if not reached or reached[0][0] > alert.time:
+            return
+        lag = time.monotonic() - reached[0][1]
+        self.lags.add(lag * 1000)
+        self.maxLag = max(self.maxLag, lag)
+
+    def eventsPerSecond(self) -> float:
+        "Average number of events consumed per wall-clock second since the start"
+        if self._timeStarted == -1:
+            return 0.0
+        return self.eventsCount / max(time.monotonic() - self._timeStarted, 1e-9)
+
+    def report(self) -> None:
+        "Log replay throughput, alert lag and queue depths so far"
+        logging.info(
+            f"Replayed {self.eventsCount} events at {self.eventsPerSecond():.0f} events/s"
+            + f", alert lag p50: {self.lags.quantile(0.5):.1f}ms"
+            + f", p99: {self.lags.quantile(0.99):.1f}ms"
+            + f", max: {self.maxLag * 1000:.1f}ms"
+            + f", max buffer depth: {self.maxBufferDepth} events"
+            + f", max window depth: {self.maxWindowDepth} seconds"
+        )
+        self._timeLastReported = time.monotonic()
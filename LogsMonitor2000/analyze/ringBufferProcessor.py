@@ -0,0 +1,271 @@
+import os
+import time
+import struct
+import logging
+import multiprocessing
+from typing import Optional, cast
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+
+from ..event import WebLogEvent
+from ..action import Action
+from .processor import Processor, AnalyticsProcessor
+
+# Event record: time, size, then ids of section, source and status, and record kind
+_RECORD = struct.Struct("<qqIIIB3x")
+
+# Record kinds: an event, a buffer flush (None event), a tick, or the end of the log
+_EVENT, _FLUSH, _TICK, _END = range(4)
+
+# Write and read indices, each on its own cache line, before the records
+_HEADER = 128
+_WRITE_INDEX = 0
+_READ_INDEX = 8
+
+# Number of records in the ring buffer
+_CAPACITY = 1 << 16
+
+# Records written before they're made visible to the analyzer, unless a new second
+# starts, or the buffer is flushed or ticked
+_PUBLISH_EVERY = 256
+
+# Seconds to wait for the other process when the ring buffer is empty or full
+_WAIT = 0.0005
+
+# WebLogEvent fields carried by records
+_FIELDS = frozenset({"section", "source", "status", "size"})
+
+
+def _views(shm: shared_memory.SharedMemory) -> tuple[memoryview, memoryview]:
+    "Indices and records of the ring buffer in shared memory"
+    buf = cast(memoryview, shm.buf)
+    return buf[:_HEADER].cast("Q"), buf[_HEADER:]
+
+
+def _consumeRecords(
+    processor: Processor, records: memoryview, strings: list[Optional[str]]
+) -> bool:
+    "Consume events of records, return whether the end record was reached"
+    consume = processor.consume
+    priority = WebLogEvent.Priority.MEDIUM
+    for t, size, section, source, status, kind in _RECORD.iter_unpack(records):
+        if kind == _EVENT:
+            # Positional fields: time, message, priority, rfc931, authuser, source,
+            # request, status, size, section, faster to build by the million
+            consume(
+                WebLogEvent(
+                    t,
+                    "",
+                    priority,
+                    None,
+                    None,
+                    strings[source],  # type: ignore
+                    None,
+                    strings[status],  # type: ignore
+                    size,
+                    strings[section],  # type: ignore
+                )
+            )
+        elif kind == _FLUSH:
+            consume(None)
+        elif kind == _TICK:
+            processor.tick()
+        else:
+            return True
+    return False
+
+
+def _runAnalyzer(
+    name: str, capacity: int, conn: Connection, action: Action, options: dict
+) -> None:
+    """
+    Analyzer process: consume events from the ring buffer records, looking up their
+    strings by id in the table received from the parser, until the end record, or the
+    parser process stops without writing it.
+    """
+    parent = os.getppid()
+    try:
+        processor = AnalyticsProcessor(action, **options)
+    except Exception as e:
+        conn.send(e)
+        return
+    conn.send(processor.requiredFields())
+    logging.debug(f"Analyzer process started for shared memory {name}")
+
+    shm = shared_memory.SharedMemory(name=name)
+    indices, records = _views(shm)
+
+    # Strings by id, 0 standing for fields not parsed
+    strings: list[Optional[str]] = [None]
+    read = 0
+    try:
+        while True:
+            written = indices[_WRITE_INDEX]
+            # Strings of new ids are sent before records using them are published, so
+            # they're also received while none are, or the parser may block sending
+            # more than the pipe holds, before it publishes
+            try:
+                while conn.poll():
+                    strings.extend(conn.recv())
+            except EOFError:
+                isParserStopped = True
+            else:
+                # Orphans are adopted by another process
+                isParserStopped = written == read and os.getppid() != parent
+            if isParserStopped:
+                logging.error("Parser process stopped, analyzer process exiting")
+                return
+            if written == read:
+                time.sleep(_WAIT)
+                continue
+
+            start = read % capacity
+            end = start + written - read
+            chunks = [records[start * _RECORD.size : min(end, capacity) * _RECORD.size]]
+            if end > capacity:
+                chunks.append(records[: (end - capacity) * _RECORD.size])
+            for chunk in chunks:
+                with chunk:
+                    isEnded = _consumeRecords(processor, chunk, strings)
+                if isEnded:
+                    return
+            read = written
+            indices[_READ_INDEX] = read
+    finally:
+        processor.close()
+        indices.release()
+        records.release()
+        shm.close()
+
+
+class RingBufferProcessor(Processor):
+    """
+    Analyzes events in a separate process, so parsing and analysis run in parallel
+    rather than competing for the GIL.
+
+    Events are encoded as fixed-width records into a shared memory ring buffer, which
+    the analyzer process decodes in place, with no pickling per event. Sections,
+    sources and statuses are encoded as ids, each new string only being sent once to
+    the analyzer, over a pipe. Only these fields, time and size are carried, so
+    calculators requiring others, e.g. request, aren't supported.
+
+    Written records are published, i.e. the write index updated, in batches, and the
+    analyzer publishes its read index once it has processed them, so the buffer is
+    single-producer single-consumer with no locks.
+    """
+
+    def __init__(self, action: Action, capacity=_CAPACITY, **kwargs):
+        super().__init__(action)
+        self._capacity: int = capacity
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=_HEADER + capacity * _RECORD.size
+        )
+        self._indices, self._records = _views(self._shm)
+
+        # Ids of strings sent to the analyzer, and strings yet to send
+        self._ids: dict[Optional[str], int] = {None: 0}
+        self._newStrings: list[str] = []
+
+        # Records written, and published to the analyzer
+        self._written: int = 0
+        self._published: int = 0
+        self._timePublished: int = -1
+
+        conn, analyzerConn = multiprocessing.Pipe()
+        self._analyzer = multiprocessing.Process(
+            target=_runAnalyzer,
+            args=(self._shm.name, capacity, analyzerConn, action, kwargs),
+        )
+        self._analyzer.start()
+        analyzerConn.close()
+        self._conn = conn
+
+        fields = conn.recv()
+        if isinstance(fields, Exception):
+            self._analyzer.join()
+            self._releaseMemory()
+            raise fields
+        if not fields <= _FIELDS:
+            self.close()
+            raise ValueError(
+                f"Analyzer process doesn't support fields: {fields - _FIELDS}"
+            )
+        self._fields: frozenset = fields
+
+    def requiredFields(self) -> frozenset:
+        "WebLogEvent fields used by the analyzer's calculators"
+        return self._fields
+
+    def _id(self, string: Optional[str]) -> int:
+        "Id of string, new strings being sent to the analyzer on publishing"
+        id = self._ids.get(string)
+        if id is None:
+            id = self._ids[string] = len(self._ids)
+            self._newStrings.append(string)  # type: ignore
+        return id
+
+    def _writeRecord(self, kind: int, e: Optional[WebLogEvent] = None) -> None:
+        "Write record at the write index, waiting for the analyzer if the buffer is full"
+        while self._written - self._indices[_READ_INDEX] >= self._capacity:
+            if not self._analyzer.is_alive():
+                raise RuntimeError("Analyzer process stopped")
+            self._publish()
+            time.sleep(_WAIT)
+        offset = self._written % self._capacity * _RECORD.size
+        if e is None:
+            _RECORD.pack_into(self._records, offset, 0, 0, 0, 0, 0, kind)
+        else:
+            _RECORD.pack_into(
+                self._records,
+                offset,
+                e.time,
+                e.size,
+                self._id(e.section),
+                self._id(e.source),
+                self._id(e.status),
+                kind,
+            )
+        self._written += 1
+
+    def _publish(self) -> None:
+        "Make records written so far visible to the analyzer, sending new strings first"
+        if self._newStrings:
+            self._conn.send(self._newStrings)
+            self._newStrings = []
+        self._indices[_WRITE_INDEX] = self._written
+        self._published = self._written
+
+    def consume(self, event: Optional[WebLogEvent]) -> None:  # type: ignore
+        """ Write event record, or flush record for None """
+        if event is None:
+            self._writeRecord(_FLUSH)
+            self._publish()
+            return
+
+        if event.time > self._timePublished:
+            # Publish seconds as they start, for alerts not to wait for a full batch
+            self._publish()
+            self._timePublished = event.time
+        self._writeRecord(_EVENT, event)
+        if self._written - self._published >= _PUBLISH_EVERY:
+            self._publish()
+
+    def tick(self) -> None:
+        """ Write tick record, for the analyzer to advance time """
+        self._writeRecord(_TICK)
+        self._publish()
+
+    def close(self) -> None:
+        """ Write end record, and wait for the analyzer to process all records """
+        if self._analyzer.is_alive():
+            self._writeRecord(_END)
+            self._publish()
+        self._analyzer.join()
+        self._conn.close()
+        self._releaseMemory()
+
+    def _releaseMemory(self) -> None:
+        self._indices.release()
+        self._records.release()
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,200 @@
+import queue
+import sqlite3
+import logging
+import threading
+from typing import Counter, Deque, Iterator
+from operator import attrgetter
+from collections import Counter
+from ..event import Event, WebLogEvent, WebLogSummary
+from ..action import Action
+from .calculator import StreamCalculator
+
+# Kinds of counts rolled up, "total" with an empty key
+KINDS = ("total", "section", "source", "status")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (resolution, kind, time, key)
+) WITHOUT ROWID
+"""
+
+# Counts are added to any already stored, e.g. of the same second in a previous run
+_UPSERT = """
+INSERT INTO rollups VALUES (1, ?, ?, ?, ?)
+ON CONFLICT (resolution, kind, time, key) DO UPDATE SET count = count + excluded.count
+"""
+
+# Per-minute counts are summed from the per-second ones by SQLite, for the minutes
+# from the first one written to, so the writer only binds per-second rows
+_ROLLUP_MINUTES = """
+INSERT INTO rollups
+SELECT 60, kind, time - time % 60, key, SUM(count) FROM rollups
+WHERE resolution = 1 AND time >= ? - ? % 60 AND time <= ?
+GROUP BY kind, time - time % 60, key
+ON CONFLICT (resolution, kind, time, key) DO UPDATE SET count = excluded.count
+"""
+
+# Seconds of wall-clock time between writes, each of all seconds queued since
+_WRITE_INTERVAL = 1.0
+
+# Most seconds queued for the writer, beyond which it's woken up early to write them
+# and processing waits for it, e.g. when catching up on a log
+_MAX_QUEUED_SECONDS = 3600
+
+# Per-second row: kind, time, key and count
+_Row = tuple[str, int, str, int]
+
+# Key of rows of requests missing it, e.g. whose status is unknown
+_MISSING_KEY = "-"
+
+
+def connectRollups(path: str, isHandedOver=False) -> sqlite3.Connection:
+    """
+    Open rollups database, creating it if needed, in WAL mode so it's readable while
+    written. Handed over connections may be used by another thread than this one.
+    """
+    db = sqlite3.connect(path, check_same_thread=not isHandedOver)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(_SCHEMA)
+    return db
+
+
+def _rows(events: list[WebLogEvent]) -> Iterator[_Row]:
+    "Per-second rows of a second's events, either raw or summarised, without None keys"
+    time = events[0].time
+    if type(events[0]) is WebLogSummary:
+        summary: WebLogSummary = events[0]  # type: ignore
+        yield "total", time, "", summary.count
+        counts = (summary.sections, summary.sources, summary.statuses)
+    elif type(events[0]) is not WebLogEvent:
+        raise ValueError(f"Expected WebLogEvent for: {events}")
+    else:
+        total = sum(map(attrgetter("weight"), events))
+        yield "total", time, "", total
+        if total == len(events):
+            # Not sampled, counted at C speed
+            counts = tuple(
+                Counter(map(attrgetter(field), events))
+                for field in ("section", "source", "status")
+            )
+        else:
+            counts = (Counter(), Counter(), Counter())
+            for e in events:
+                counts[0][e.section] += e.weight
+                counts[1][e.source] += e.weight
+                counts[2][e.status] += e.weight
+
+    for kind, kindCounts in zip(KINDS[1:], counts):
+        for key, n in kindCounts.items():
+            yield kind, time, _MISSING_KEY if key is None else key, n
+
+
+class RollupCalculator(StreamCalculator):
+    """
+    Persists per-second and per-minute rollups of requests, in total and per section,
+    source and status, to a SQLite database, e.g. to look back at past traffic with
+    `python -m LogsMonitor2000.rollup`.
+
+    Each second's events are counted into rows, handed over to a background writer
+    thread, which every second writes the rows queued since in a single transaction,
+    so processing doesn't wait on the disk, nor pays for a transaction per second of
+    events when catching up on a log. Only counts are queued, not the events, so they
+    can be freed as soon as they leave the window.
+
+    The database is opened on start, for errors to show then. Should the writer stop
+    anyway, later seconds are dropped rather than waiting for it forever.
+    """
+
+    requiredFields = frozenset({"section", "source", "status"})
+
+    def __init__(self, action: Action, events: Deque[list[Event]], path: str):
+        # Counts are written as seconds enter the window, never discounted
+        super().__init__(action, events, windowSizeInSeconds=1)
+        try:
+            self._db = connectRollups(path, isHandedOver=True)
+        except sqlite3.Error as e:
+            raise ValueError(f"Can't open rollups database {path}: {e}")
+
+        # Seconds' rows to write
+        self._queue: queue.Queue[list[_Row]] = queue.Queue(maxsize=_MAX_QUEUED_SECONDS)
+        self._isClosed = False
+        self._isWriterStopped = False
+
+        # Set when the queue is full or closed, for the writer not to wait any longer
+        self._isDue = threading.Event()
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Queue second's rows to write, waiting for the writer while it's behind"
+        if not self._writer.is_alive():
+            if not self._isWriterStopped:
+                logging.error("Rollups writer stopped, no longer writing rollups")
+                self._isWriterStopped = True
+            return
+        rows = list(_rows(events))
+        try:
+            self._queue.put_nowait(rows)
+            return
+        except queue.Full:
+            self._isDue.set()
+        # E.g. catching up on a log, for as long as the writer runs
+        while self._writer.is_alive():
+            try:
+                self._queue.put(rows, timeout=_WRITE_INTERVAL)
+                return
+            except queue.Full:
+                self._isDue.set()
+
+    def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Nothing to do, rollups are only written once"
+
+    def triggerAlert(self, now: int) -> None:
+        "Nothing to alert on"
+
+    def _write(self) -> None:
+        "Writer thread: write queued seconds every interval, until closed"
+        isClosed = False
+        try:
+            while not isClosed:
+                self._isDue.wait(_WRITE_INTERVAL)
+                self._isDue.clear()
+                isClosed = self._isClosed
+                batch = []
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._writeBatch(self._db, batch)
+        except Exception:
+            logging.exception("Rollups writer failed")
+        finally:
+            self._db.close()
+
+    def _writeBatch(self, db: sqlite3.Connection, batch: list[list[_Row]]) -> None:
+        "Write per-second rows of seconds, then roll them up per minute"
+        # Each second's rows start with its total
+        start = min(rows[0][1] for rows in batch)
+        end = max(rows[0][1] for rows in batch)
+        try:
+            with db:
+                db.executemany(_UPSERT, (row for rows in batch for row in rows))
+                db.execute(_ROLLUP_MINUTES, (start, start, end))
+        except sqlite3.Error as e:
+            logging.error(f"Failed to write rollups of {len(batch)} seconds: {e}")
+            return
+        logging.debug(f"Wrote rollups of {len(batch)} seconds")
+
+    def close(self) -> None:
+        "Write any queued seconds and stop the writer"
+        self._isClosed = True
+        self._isDue.set()
+        self._writer.join()
@@ -0,0 +1,188 @@
+import re
+import bisect
+import logging
+from typing import Deque, Optional
+from ..event import Event, WebLogEvent, WebLogSummary
+from ..action import Action
+from .calculator import StreamCalculator
+
+# Path out of the request, e.g. "/api/user" out of "GET /api/user HTTP/1.0"
+_REQUEST_PATH = re.compile(r"[^ ]* [^ /]*/([^ ]*)")
+
+
+class _Node:
+    """
+    Trie node of a path segment, with the number of requests of its subtree, and its
+    children both by segment and in decreasing count order, along with their negated
+    counts in the same order to bisect, and its own index in its parent's order.
+    """
+
+    __slots__ = ("segment", "count", "children", "order", "negatedCounts", "index")
+
+    def __init__(self, segment: str, index: int):
+        self.segment = segment
+        self.count: int = 0
+        self.children: dict[str, _Node] = {}
+        self.order: list[_Node] = []
+        self.negatedCounts: list[int] = []
+        self.index = index
+
+
+class SectionTrie:
+    """
+    Counts requests per path prefix, e.g. /api, /api/user and /api/user/profile, up to
+    a depth. Counting a path updates every prefix along it in a single pass. Each node
+    keeps its children sorted by count, moving a child by as many places as its count
+    overtakes, so the top children of any node are read off the front of its list.
+    """
+
+    def __init__(self, depth=2):
+        self.depth: int = depth
+        self.root = _Node("", 0)
+
+    def segments(self, request: Optional[str]) -> Optional[list[str]]:
+        "Path segments of the request up to the depth, the first one being its section"
+        match = _REQUEST_PATH.match(request or "")
+        if match is None:
+            return None
+        segments = match.group(1).split("/", self.depth)[: self.depth]
+        # The first segment may be empty, e.g. for /, but not the deeper ones
+        return segments[:1] + [s for s in segments[1:] if s]
+
+    def add(self, segments: list[str], n: int) -> None:
+        "Add n requests (or remove, with negative n) to every prefix of path segments"
+        node = self.root
+        node.count += n
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is None:
+                if n <= 0:
+                    raise KeyError(f"No requests to remove from {segments}")
+                child = node.children[segment] = _Node(segment, len(node.order))
+                node.order.append(child)
+                node.negatedCounts.append(0)
+            child.count += n
+            self._reorder(node, child, n)
+            if child.count == 0:
+                # Last in order, as all others have requests
+                del node.children[segment]
+                node.order.pop()
+                node.negatedCounts.pop()
+                return
+            node = child
+
+    def _reorder(self, parent: _Node, child: _Node, n: int) -> None:
+        "Move child to its place in its parent's order after its count changed by n"
+        order, counts = parent.order, parent.negatedCounts
+        i = child.index
+        counts[i] = -child.count
+        if n > 0:
+            # After the children with as many requests
+            j = bisect.bisect_right(counts, counts[i], 0, i)
+            if j == i:
+                return
+        else:
+            # Before the children with as many requests
+            j = bisect.bisect_left(counts, counts[i], i + 1, len(counts)) - 1
+            if j == i:
+                return
+        order.insert(j, order.pop(i))
+        counts.insert(j, counts.pop(i))
+        for k in range(min(i, j), max(i, j) + 1):
+            order[k].index = k
+
+    def find(self, section: str) -> Optional[_Node]:
+        "Node of a path prefix, e.g. /api/user, None if no requests under it"
+        node: Optional[_Node] = self.root
+        for segment in section[1:].split("/"):
+            node = node.children.get(segment)  # type: ignore
+            if node is None:
+                return None
+        return node
+
+    def top(self, section="", k=3) -> list[tuple[str, int]]:
+        "k children of a path prefix with the most requests, of the root if empty"
+        node = self.find(section) if section else self.root
+        if node is None:
+            return []
+        return [(f"{section}/{c.segment}", c.count) for c in node.order[:k]]
+
+
+class SectionTreeCalculator(StreamCalculator):
+    """
+    Periodically reports the most requested sections over the sliding window, and
+    within each, the most requested sub-sections, e.g. /api/user under /api, down to
+    a configured depth. At depth 1 sections are the same as the other calculators'.
+    """
+
+    requiredFields = frozenset({"request"})
+
+    def __init__(
+        self,
+        action: Action,
+        events: Deque[list[Event]],
+        windowSizeInSeconds=10,
+        depth=2,
+        top=3,
+    ):
+        super().__init__(action, events, windowSizeInSeconds)
+        self._trie = SectionTrie(depth)
+        self._top: int = top
+
+        # Collect stats every x seconds
+        self._timeLastCollectedStats: int = -1
+
+    def _add(self, events: list[WebLogEvent], sign: int) -> None:
+        if type(events[0]) is WebLogSummary:
+            raise ValueError("Section tree stats require raw events")
+        if type(events[0]) is not WebLogEvent:
+            raise ValueError(f"Expected WebLogEvent for: {events}")
+
+        for e in events:
+            segments = self._trie.segments(e.request)
+            if segments is not None:
+                self._trie.add(segments, sign * e.weight)
+
+    def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        self._add(events, 1)
+
+    def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        self._add(events, -1)
+
+    def top(self, section="", k=3) -> list[tuple[str, int]]:
+        "k sub-sections of a section with the most requests in window"
+        return self._trie.top(section, k)
+
+    def _describe(self, section: str, depth: int) -> str:
+        "Top sub-sections of a section, each with its own down to the trie's depth"
+        described = []
+        for subSection, n in self._trie.top(section, self._top):
+            if depth + 1 < self._trie.depth:
+                children = self._describe(subSection, depth + 1)
+                if children:
+                    described.append(f"{subSection} ({n}: {children})")
+                    continue
+            described.append(f"{subSection} ({n})")
+        return ", ".join(described)
+
+    def snapshot(self, now: int) -> dict:
+        return {"sectionTree": self._trie.top("", self._top)}
+
+    def triggerAlert(self, latestEventTime: int) -> None:
+        """ Trigger alerts with the top sections and sub-sections every interval """
+        if self._timeLastCollectedStats == -1:
+            self._timeLastCollectedStats = latestEventTime
+        if (latestEventTime - self._timeLastCollectedStats) < self.windowSize:
+            # Latest event time hasn't yet crossed the full interval
+            return
+
+        self._timeLastCollectedStats = latestEventTime
+        if self._trie.root.count <= 0:
+            return
+        statsEvent = Event(
+            priority=Event.Priority.MEDIUM,
+            message=f"Top sections: {self._describe('', 0)}",
+            time=latestEventTime,
+        )
+        self._action.notify(statsEvent)
+        logging.debug(f"Fired section tree stats alert {statsEvent}")
@@ -0,0 +1,205 @@
+import zlib
+import heapq
+import pickle
+import logging
+import multiprocessing
+from collections import Counter, deque
+from typing import Counter as CounterType, Deque, Optional
+from multiprocessing.connection import Connection
+from ..event import WebLogEvent, WebLogSummary
+from ..action import Action
+from .mostCommonCalculator import MostCommonCalculator, _SNAPSHOT_TOP
+
+# Messages to shards, besides a pickled (sections, sources) group of own keys counted
+_DISCOUNT = b"d"
+_TOP = b"t"
+_STOP = b"s"
+
+# Most common keys of a shard: key, count and order first seen in, most common first
+_Top = list[tuple[str, int, tuple[int, int]]]
+
+# Keys of a group owned by a shard: key, count and rank of its first occurrence
+_Owned = list[tuple[str, int, int]]
+
+
+class _Shard:
+    """
+    Counts of the sections and sources hashed to a shard, over the window of groups
+    counted and not yet discounted. Each key remembers the order it was first seen in
+    since it was last in window, as (group, rank of its first occurrence within the
+    group), to break ties the same way as a single Counter, whatever shard it's on.
+    """
+
+    def __init__(self):
+        self._counts: tuple[CounterType[str], CounterType[str]] = (Counter(), Counter())
+        self._firstSeen: tuple[dict, dict] = ({}, {})
+
+        # Counts of own keys per group in window, oldest first, to discount them
+        self._window: Deque[tuple[dict[str, int], dict[str, int]]] = deque()
+        self._groups = 0
+
+        # Number of requests to own sections in window
+        self._requestsCount = 0
+
+    def count(self, sections: _Owned, sources: _Owned) -> None:
+        "Count a group's keys owned by the shard"
+        group = []
+        for kind, keys in enumerate((sections, sources)):
+            counts, firstSeen = self._counts[kind], self._firstSeen[kind]
+            owned = {}
+            for key, n, rank in keys:
+                owned[key] = n
+                if key not in firstSeen:
+                    firstSeen[key] = (self._groups, rank)
+            counts.update(owned)
+            group.append(owned)
+        self._window.append((group[0], group[1]))
+        self._groups += 1
+        # Each request has exactly one section, on exactly one shard
+        self._requestsCount += sum(group[0].values())
+
+    def discount(self) -> None:
+        "Discount the oldest group counted"
+        group = self._window.popleft()
+        for counts, firstSeen, owned in zip(self._counts, self._firstSeen, group):
+            counts.subtract(owned)
+            for key in owned:
+                if counts[key] <= 0:
+                    # Seen anew if counted again, as by a single Counter
+                    del counts[key]
+                    del firstSeen[key]
+        self._requestsCount -= sum(group[0].values())
+
+    def top(self, k: int) -> tuple[_Top, _Top, int]:
+        "Most common sections and sources of the shard, and its number of requests"
+        tops = []
+        for counts, firstSeen in zip(self._counts, self._firstSeen):
+            top = heapq.nsmallest(
+                k,
+                (key for key, n in counts.items() if n > 0),
+                key=lambda key: (-counts[key], firstSeen[key]),
+            )
+            tops.append([(key, counts[key], firstSeen[key]) for key in top])
+        return tops[0], tops[1], self._requestsCount
+
+
+def _runShard(conn: Connection) -> None:
+    "Shard worker process: apply the messages received, replying to top requests"
+    shard = _Shard()
+    while True:
+        message = conn.recv_bytes()
+        if message == _DISCOUNT:
+            shard.discount()
+        elif message == _TOP:
+            conn.send(shard.top(_SNAPSHOT_TOP))
+        elif message == _STOP:
+            break
+        else:
+            shard.count(*pickle.loads(message))
+    conn.close()
+
+
+class ShardedMostCommonCalculator(MostCommonCalculator):
+    """
+    Most common source and section calculator, with counting spread across worker
+    processes for very high numbers of distinct sources or sections.
+
+    Each second's group of events is counted per section and source at C speed, then
+    its distinct keys are partitioned by hash, and each shard is only sent its own, so
+    shards split the window's keys and the work of updating their counts, and discount
+    groups out of the window themselves. When stats are due, the shards' top keys are
+    merged into the overall top ones, along with their number of requests. Ties are
+    broken by first-seen order, same as a single Counter.
+    """
+
+    def __init__(self, action: Action, events, windowSizeInSeconds=10, shards=2):
+        super().__init__(action, events, windowSizeInSeconds)
+
+        self._connections: list[Connection] = []
+        self._workers: list[multiprocessing.Process] = []
+        for _ in range(shards):
+            conn, workerConn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_runShard, args=(workerConn,), daemon=True
+            )
+            worker.start()
+            workerConn.close()
+            self._connections.append(conn)
+            self._workers.append(worker)
+
+        # Number of requests in window, as merged from the shards at the last stats
+        self.requestsCount: int = 0
+
+    def _broadcast(self, message: bytes) -> None:
+        for conn in self._connections:
+            conn.send_bytes(message)
+
+    def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        if type(events[0]) is WebLogSummary:
+            raise ValueError("Sharded most common stats require raw events")
+        if type(events[0]) is not WebLogEvent:
+            raise ValueError(f"Expected WebLogEvent for: {events}")
+
+        if all(e.weight == 1 for e in events):
+            groupCounts = (
+                Counter([e.section for e in events]),
+                Counter([e.source for e in events]),
+            )
+        else:
+            groupCounts = (Counter(), Counter())
+            for e in events:
+                groupCounts[0][e.section] += e.weight
+                groupCounts[1][e.source] += e.weight
+
+        shards = len(self._connections)
+        owned: list[tuple[_Owned, _Owned]] = [([], []) for _ in range(shards)]
+        for kind, counts in enumerate(groupCounts):
+            for rank, (key, n) in enumerate(counts.items()):
+                owned[zlib.crc32(key.encode()) % shards][kind].append((key, n, rank))
+        for conn, group in zip(self._connections, owned):
+            conn.send_bytes(pickle.dumps(group, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        # Groups are discounted in the order they were counted
+        self._broadcast(_DISCOUNT)
+
+    def _mergedTop(self, k: int) -> tuple[list[tuple[str, int]], list[tuple[str, int]]]:
+        "Overall k most common sections and sources, merged from the shards' own"
+        self._broadcast(_TOP)
+        tops = [conn.recv() for conn in self._connections]
+        self.requestsCount = sum(top[2] for top in tops)
+
+        merged = []
+        for kind in (0, 1):
+            shardTops = sorted(
+                (entry for top in tops for entry in top[kind]),
+                key=lambda entry: (-entry[1], entry[2]),
+            )
+            merged.append([(key, n) for key, n, _ in shardTops[:k]])
+        logging.debug(f"Merged most common from {len(tops)} shards: {merged}")
+        return merged[0], merged[1]
+
+    def mostCommon(self) -> Optional[tuple[tuple[str, int], tuple[str, int]]]:
+        "Merge the shards' most common section and source"
+        sections, sources = self._mergedTop(1)
+        if not sections:
+            return None
+        return sections[0], sources[0]
+
+    def snapshot(self, now: int) -> dict:
+        "Most common sections and sources in window, and their number of requests"
+        sections, sources = self._mergedTop(_SNAPSHOT_TOP)
+        return {
+            "top": {"sections": sections, "sources": sources},
+            "requests": self.requestsCount,
+        }
+
+    def close(self) -> None:
+        "Stop shard worker processes"
+        for conn in self._connections:
+            conn.send_bytes(_STOP)
+            conn.close()
+        for worker in self._workers:
+            worker.join()
+        self._connections = []
+        self._workers = []
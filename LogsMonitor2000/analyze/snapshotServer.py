@@ -0,0 +1,56 @@
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class SnapshotServer:
+    """
+    Serves the latest published snapshot of the processor's state as JSON over HTTP,
+    from a background thread, e.g. `curl localhost:8080`.
+
+    Snapshots are encoded once when published, and replaced as a whole, so requests
+    only ever read the latest encoded snapshot: they take no lock, and however often
+    they're made, the processing thread pays the same for one snapshot per second.
+    """
+
+    def __init__(self, port: int, host="127.0.0.1"):
+        # Latest encoded snapshot, replaced rather than updated
+        self._snapshot: bytes = b""
+
+        server = self
+
+        class SnapshotHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                snapshot = server._snapshot
+                if self.path not in ("/", "/stats"):
+                    self.send_error(404)
+                    return
+                if not snapshot:
+                    self.send_error(503, "No events processed yet")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(snapshot)))
+                self.end_headers()
+                self.wfile.write(snapshot)
+
+            def log_message(self, format: str, *args) -> None:
+                logging.debug(f"Snapshot request: {format % args}")
+
+        self._server = ThreadingHTTPServer((host, port), SnapshotHandler)
+        self._server.daemon_threads = True
+        self.port: int = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info(f"Serving live stats on http://{host}:{self.port}/")
+
+    def publish(self, snapshot: dict) -> None:
+        "Replace the snapshot served"
+        self._snapshot = json.dumps(snapshot).encode()
+
+    def close(self) -> None:
+        "Stop serving"
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,79 @@
+import os
+import json
+import stat
+import socket
+import logging
+from typing import IO, Deque
+from ..event import SUMMARY_SKETCHES, Event, WebLogEvent, WebLogSummary
+from ..action import Action
+from .calculator import StreamCalculator
+
+
+def openStateSink(target: str) -> IO[str]:
+    "Connect to an aggregator's Unix socket at target if there's one, else append to file"
+    if os.path.exists(target) and stat.S_ISSOCK(os.stat(target).st_mode):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target)
+        return sock.makefile(mode="w")
+    return open(target, mode="a")
+
+
+class StateExportCalculator(StreamCalculator):
+    """
+    Periodically writes the per-second summaries of the events processed since its
+    previous export, one JSON state per line, to a file or socket. Summaries of the same
+    second from several monitors can be merged associatively, so an aggregator can
+    compute global stats and alerts from them, see aggregate.py.
+    """
+
+    requiredFields = frozenset({"section", "source", "status", "size"})
+    # Whichever calculators the aggregator merging them runs
+    summarySketches = SUMMARY_SKETCHES
+
+    def __init__(
+        self,
+        action: Action,
+        events: Deque[list[Event]],
+        sink: IO[str],
+        exportIntervalInSeconds=10,
+    ):
+        # Summaries are kept until exported rather than in the shared window
+        super().__init__(action, events, windowSizeInSeconds=1)
+        self._sink = sink
+        self._exportInterval: int = exportIntervalInSeconds
+
+        # Summaries processed since last export
+        self._pending: list[WebLogSummary] = []
+        self._timeLastExported: int = -1
+
+    def count(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Summarise events to export"
+        if type(events[0]) is WebLogSummary:
+            self._pending.append(events[0])  # type: ignore
+        else:
+            self._pending.append(WebLogSummary.fromEvents(events))
+
+    def discount(self, events: list[WebLogEvent]) -> None:  # type: ignore
+        "Nothing to do, summaries are only exported once"
+
+    def triggerAlert(self, now: int) -> None:
+        "Export pending summaries every interval"
+        if self._timeLastExported == -1:
+            self._timeLastExported = now
+        if now - self._timeLastExported < self._exportInterval:
+            return
+        self._export()
+        self._timeLastExported = now
+
+    def _export(self) -> None:
+        if not self._pending:
+            return
+        self._sink.write("".join(json.dumps(s.toState()) + "\n" for s in self._pending))
+        self._sink.flush()
+        logging.debug(f"Exported state of {len(self._pending)} seconds")
+        self._pending = []
+
+    def close(self) -> None:
+        "Export any pending summaries, e.g. at the end of the log"
+        self._export()
+        self._sink.close()
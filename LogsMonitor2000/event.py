@@ -1,6 +1,12 @@
 import enum
+from typing import Counter, Optional
+from collections import Counter
 from datetime import datetime
 from dataclasses import dataclass
+from .sketch import HyperLogLog, QuantileSketch
+
+# Sketches summaries can hold, each only built if a calculator needs it
+SUMMARY_SKETCHES = frozenset({"sizes", "sectionSources"})
 
 
 @dataclass
@@ -31,10 +37,132 @@ class Event:
 class WebLogEvent(Event):
     """ Represents an individual Web traffic event """
 
-    rfc931: str
-    authuser: str
+    rfc931: Optional[str]
+    authuser: Optional[str]
     source: str
-    request: str
+    request: Optional[str]
     status: str
-    size: str
+    size: int
     section: str
+
+    # Number of requests the event stands for, more than 1 when sampled
+    weight: int = 1
+
+
+@dataclass
+class WebLogSummary(Event):
+    """
+    Represents all Web traffic events of a given second, reduced to counts per key,
+    a sketch of response sizes and sketches of distinct sources per section. Kept in
+    place of the raw events so memory grows with distinct keys, not traffic.
+    """
+
+    count: int
+    sections: Counter[str]
+    sources: Counter[str]
+    statuses: Counter[str]
+    bytes: int
+    sectionBytes: Counter[str]
+    sizes: QuantileSketch
+    sectionSources: dict[str, HyperLogLog]
+
+    @classmethod
+    def fromEvents(
+        cls, events: list[WebLogEvent], sketches: frozenset = SUMMARY_SKETCHES
+    ) -> "WebLogSummary":
+        """
+        Summarise a group of events sharing the same time, or merge their summaries.
+        Only the given sketches are built from events, others are left empty.
+        """
+        if type(events[0]) is WebLogSummary:
+            merged = cls.fromState({"time": events[0].time})
+            for summary in events:
+                merged.merge(summary)  # type: ignore
+            return merged
+
+        sectionBytes: Counter[str] = Counter()
+        sizes = QuantileSketch()
+        sectionSources: dict[str, HyperLogLog] = {}
+        sections: Counter[str] = Counter()
+        sources: Counter[str] = Counter()
+        statuses: Counter[str] = Counter()
+        for e in events:
+            sections[e.section] += e.weight
+            sources[e.source] += e.weight
+            statuses[e.status] += e.weight
+            sectionBytes[e.section] += e.size * e.weight
+        if "sizes" in sketches:
+            for e in events:
+                sizes.add(e.size, e.weight)
+        if "sectionSources" in sketches:
+            for e in events:
+                if e.source is None:
+                    # Not parsed, as not required by any calculator
+                    continue
+                if e.section not in sectionSources:
+                    sectionSources[e.section] = HyperLogLog()
+                sectionSources[e.section].add(e.source)
+        return cls(
+            time=events[0].time,
+            message="",
+            priority=Event.Priority.MEDIUM,
+            count=sum(sections.values()),
+            sections=sections,
+            sources=sources,
+            statuses=statuses,
+            bytes=sum(sectionBytes.values()),
+            sectionBytes=sectionBytes,
+            sizes=sizes,
+            sectionSources=sectionSources,
+        )
+
+    def merge(self, other: "WebLogSummary") -> None:
+        " Add counts of another summary, e.g. of the same second from another host "
+        self.count += other.count
+        self.sections.update(other.sections)
+        self.sources.update(other.sources)
+        self.statuses.update(other.statuses)
+        self.bytes += other.bytes
+        self.sectionBytes.update(other.sectionBytes)
+        self.sizes.merge(other.sizes)
+        for section, sources in other.sectionSources.items():
+            if section in self.sectionSources:
+                self.sectionSources[section].merge(sources)
+            else:
+                self.sectionSources[section] = sources.copy()
+
+    def toState(self) -> dict:
+        " JSON serializable state, to merge with summaries of other monitors "
+        return {
+            "time": self.time,
+            "count": self.count,
+            "sections": self.sections,
+            "sources": self.sources,
+            "statuses": self.statuses,
+            "bytes": self.bytes,
+            "sectionBytes": self.sectionBytes,
+            "sizes": self.sizes.toState(),
+            "sectionSources": {s: h.toState() for s, h in self.sectionSources.items()},
+        }
+
+    @classmethod
+    def fromState(cls, state: dict) -> "WebLogSummary":
+        " Summary from its state, missing counts are empty "
+        return cls(
+            time=state["time"],
+            message="",
+            priority=Event.Priority.MEDIUM,
+            count=state.get("count", 0),
+            sections=Counter(state.get("sections", {})),
+            sources=Counter(state.get("sources", {})),
+            statuses=Counter(state.get("statuses", {})),
+            bytes=state.get("bytes", 0),
+            sectionBytes=Counter(state.get("sectionBytes", {})),
+            sizes=QuantileSketch.fromState(state["sizes"])
+            if "sizes" in state
+            else QuantileSketch(),
+            sectionSources={
+                s: HyperLogLog.fromState(h)
+                for s, h in state.get("sectionSources", {}).items()
+            },
+        )
@@ -0,0 +1,331 @@
+import re
+import csv
+import calendar
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Union
+
+# Fields extracted from a log line: time, source, section, status, size, request.
+# Fields no calculator needs are left as None (size as 0) and never parsed.
+EventFields = tuple[
+    int, Optional[str], Optional[str], Optional[str], int, Optional[str]
+]
+
+# Fields a processor may require, time is always extracted
+FIELDS = frozenset({"source", "section", "status", "size", "request"})
+
+
+class Rejected(NamedTuple):
+    """ Reason a log line was rejected as malformed, along with the offending row """
+
+    reason: str
+    row: object
+
+
+Extractor = Callable[[Iterable[str]], Iterator[Union[EventFields, Rejected]]]
+
+# Section out of the request's path, e.g. "/api" out of "GET /api/user HTTP/1.0"
+_REQUEST_SECTION = re.compile(r"[^ ]* [^ /]*/([^ /]*)")
+
+# Latest timestamp a datetime can represent, i.e. 9999-12-31 23:59:59 UTC
+_MAX_TIMESTAMP = 253402300799
+
+# Nginx-style log format specs of common presets
+PRESETS = {
+    "clf": '$remote_addr $remote_ident $remote_user [$time_local] "$request" '
+    "$status $body_bytes_sent",
+    "combined": '$remote_addr $remote_ident $remote_user [$time_local] "$request" '
+    '$status $body_bytes_sent "$http_referer" "$http_user_agent"',
+}
+
+# Format variables providing each field
+_VARIABLES = {
+    "remote_addr": "source",
+    "request": "request",
+    "status": "status",
+    "body_bytes_sent": "size",
+    "bytes_sent": "size",
+}
+
+# JSON lines keys providing each field, as in a typical nginx 'escape=json' log_format
+_JSON_KEYS = {
+    "time": "time",
+    "source": "remote_addr",
+    "request": "request",
+    "status": "status",
+    "size": "body_bytes_sent",
+}
+
+_MONTHS = {
+    month: i
+    for i, month in enumerate(
+        ("Jan", "Feb", "Mar", "Apr", "May", "Jun")
+        + ("Jul", "Aug", "Sep", "Oct", "Nov", "Dec"),
+        start=1,
+    )
+}
+
+
+def compileFormat(spec: str, fields: Iterable[str] = FIELDS) -> Extractor:
+    """
+    Compile a log format once into an extractor specialized for the required fields.
+    The spec is "csv", "json", a preset name like "combined", or an nginx-style
+    log_format string of $variables, e.g. '$remote_addr [$time_local] "$request"'.
+    """
+    required = frozenset(fields)
+    if not required <= FIELDS:
+        raise ValueError(f"Unknown fields: {', '.join(required - FIELDS)}")
+    if spec == "csv":
+        return _csvExtractor(required)
+    if spec == "json":
+        return _jsonExtractor(required)
+    return _specExtractor(PRESETS.get(spec, spec), required)
+
+
+def _parseSize(size: str) -> Optional[int]:
+    " Response size in bytes, '-' if there's no response body, None if malformed "
+    if size.isdecimal():
+        return int(size)
+    if size == "-":
+        return 0
+    return None
+
+
+def _csvExtractor(required: frozenset) -> Extractor:
+    " Quoted CSV of remotehost, rfc931, authuser, date, request, status, bytes "
+    needSource = "source" in required
+    needSection = "section" in required
+    needStatus = "status" in required
+    needSize = "size" in required
+    needRequest = "request" in required
+
+    def extract(lines: Iterable[str]) -> Iterator[Union[EventFields, Rejected]]:
+        for row in csv.reader(lines):
+            if len(row) != 7:
+                if row:
+                    yield Rejected("CSV", row)
+                continue
+            if row[0] == "remotehost":
+                # Header
+                continue
+
+            section = None
+            if needSection:
+                match = _REQUEST_SECTION.match(row[4])
+                if match is None:
+                    yield Rejected("section", row)
+                    continue
+                section = "/" + match.group(1)
+
+            # Cheap range check of timestamp, rather than constructing a datetime
+            date = row[3]
+            if not date.isdecimal() or int(date) > _MAX_TIMESTAMP:
+                yield Rejected("date", row)
+                continue
+
+            size = _parseSize(row[6]) if needSize else 0
+            if size is None:
+                yield Rejected("size", row)
+                continue
+
+            yield (
+                int(date),
+                row[0] if needSource else None,
+                section,
+                row[5] if needStatus else None,
+                size,
+                row[4] if needRequest else None,
+            )
+
+    return extract
+
+
+def _jsonExtractor(required: frozenset) -> Extractor:
+    " One JSON object per line, with keys as in _JSON_KEYS "
+    # Only imported for JSON logs, to keep startup quick
+    import json
+
+    loads = json.loads
+    needSource = "source" in required
+    needSection = "section" in required
+    needStatus = "status" in required
+    needSize = "size" in required
+    needRequest = "request" in required
+    parseTime = _timeParser()
+
+    def extract(lines: Iterable[str]) -> Iterator[Union[EventFields, Rejected]]:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entry = loads(line)
+                eventTime = parseTime(entry[_JSON_KEYS["time"]])
+                request = entry.get(_JSON_KEYS["request"], "")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                yield Rejected("JSON", line)
+                continue
+            if not isinstance(request, str):
+                yield Rejected("JSON", line)
+                continue
+            if eventTime is None:
+                yield Rejected("date", line)
+                continue
+
+            section = None
+            if needSection:
+                match = _REQUEST_SECTION.match(request)
+                if match is None:
+                    yield Rejected("section", line)
+                    continue
+                section = "/" + match.group(1)
+
+            size = (
+                _parseSize(str(entry.get(_JSON_KEYS["size"], "-"))) if needSize else 0
+            )
+            if size is None:
+                yield Rejected("size", line)
+                continue
+
+            yield (
+                eventTime,
+                entry.get(_JSON_KEYS["source"]) if needSource else None,
+                section,
+                str(entry.get(_JSON_KEYS["status"])) if needStatus else None,
+                size,
+                request if needRequest else None,
+            )
+
+    return extract
+
+
+def _timeParser() -> Callable[[object], Optional[int]]:
+    """
+    Parser of epoch numbers, ISO 8601 or CLF "10/Oct/2000:13:55:36 -0700" timestamps.
+    Consecutive lines mostly share a timestamp, so the last one parsed is cached.
+    """
+    last: list = [None, None]
+
+    def parse(value: object) -> Optional[int]:
+        if value == last[0]:
+            return last[1]
+        try:
+            if isinstance(value, (int, float)):
+                epoch = int(value)
+            elif isinstance(value, str) and value.isdecimal():
+                epoch = int(value)
+            elif isinstance(value, str) and value.replace(".", "", 1).isdecimal():
+                # Epoch with milliseconds, e.g. nginx $msec
+                epoch = int(float(value))
+            elif isinstance(value, str) and value[2:3] == "/":
+                epoch = calendar.timegm(
+                    (
+                        int(value[7:11]),
+                        _MONTHS[value[3:6]],
+                        int(value[0:2]),
+                        int(value[12:14]),
+                        int(value[15:17]),
+                        int(value[18:20]),
+                    )
+                )
+                offset = value[21:26]
+                if offset:
+                    seconds = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+                    epoch -= seconds if offset[0] == "+" else -seconds
+            elif isinstance(value, str):
+                epoch = int(datetime.fromisoformat(value).timestamp())
+            else:
+                return None
+        except (ValueError, KeyError, IndexError, OverflowError):
+            return None
+        if not 0 <= epoch <= _MAX_TIMESTAMP:
+            return None
+        last[0], last[1] = value, epoch
+        return epoch
+
+    return parse
+
+
+def _specExtractor(spec: str, required: frozenset) -> Extractor:
+    """
+    Compile an nginx-style log format into a single regular expression,
+    only capturing the variables of required fields.
+    """
+    pattern = []
+    captured: set[str] = set()
+    position = 0
+    for match in re.finditer(r"\$([a-z_0-9]+)", spec):
+        literal = spec[position : match.start()]
+        pattern.append(re.escape(literal))
+        position = match.end()
+
+        variable = match.group(1)
+        field = _VARIABLES.get(variable)
+        if variable in ("time_local", "msec", "time_iso8601"):
+            field = "time"
+            value = r"[^\]]+" if literal.endswith("[") else r"\S+"
+        elif variable == "request" and "section" in required:
+            # Capture section out of the request in the same pass
+            field = "request" if "request" in required else None
+            value = r'[^ "]* [^ /"]*/(?P<section>[^ /"]*)[^"]*'
+            captured.add("section")
+        elif literal.endswith('"'):
+            value = r'[^"]*'
+        elif variable == "status":
+            value = r"\d{3}"
+        else:
+            value = r"\S+"
+
+        if field == "time" or field in required:
+            if field in captured:
+                raise ValueError(
+                    f"Log format has several variables for {field}: {spec}"
+                )
+            captured.add(field)  # type: ignore
+            pattern.append(f"(?P<{field}>{value})")
+        else:
+            pattern.append(value)
+    pattern.append(re.escape(spec[position:]))
+
+    if "time" not in captured:
+        raise ValueError(
+            f"Log format has no $time_local, $msec or $time_iso8601: {spec}"
+        )
+    if not required <= captured:
+        raise ValueError(
+            f"Log format has no variable for {', '.join(required - captured)}: {spec}"
+        )
+
+    regex = re.compile("".join(pattern))
+    needSource = "source" in required
+    needSection = "section" in required
+    needStatus = "status" in required
+    needSize = "size" in required
+    needRequest = "request" in required
+    parseTime = _timeParser()
+
+    def extract(lines: Iterable[str]) -> Iterator[Union[EventFields, Rejected]]:
+        for line in lines:
+            match = regex.match(line)
+            if match is None:
+                if line.strip():
+                    yield Rejected("format", line)
+                continue
+            eventTime = parseTime(match.group("time"))
+            if eventTime is None:
+                yield Rejected("date", line)
+                continue
+
+            size = _parseSize(match.group("size")) if needSize else 0
+            if size is None:
+                yield Rejected("size", line)
+                continue
+
+            yield (
+                eventTime,
+                match.group("source") if needSource else None,
+                "/" + match.group("section") if needSection else None,
+                match.group("status") if needStatus else None,
+                size,
+                match.group("request") if needRequest else None,
+            )
+
+    return extract
@@ -1,10 +1,31 @@
 import os
+import sys
 import csv
 import time
 import logging
+from typing import BinaryIO, Counter, Iterable, Optional
+from collections import Counter
 from .event import WebLogEvent
 from .analyze import Processor
-from datetime import datetime
+from .reader import (
+    LogFollower,
+    openLog,
+    compression,
+    iterGzipLines,
+    iterStreamLines,
+)
+from .formats import FIELDS, EventFields, Rejected, compileFormat
+
+# Number of malformed rows logged individually for each reason, others only counted
+_WARNINGS_PER_REASON = 5
+
+# Seconds between aggregated malformed rows reports when following a log
+_REPORT_INTERVAL = 60
+
+
+def _pollInterval() -> float:
+    """ Seconds between polls of a followed log, or idle ticks of a stream """
+    return float(os.getenv("DD_LOG_MONITOR_TIME", 1.0))
 
 
 class Parser:
@@ -19,94 +40,167 @@ class Parser:
 
 
 class HTTPLogParser(Parser):
-    """ Parses HTTP logs and generates WebLogEvent type of events """
-
-    def __init__(self, processor: Processor, path: str, isFollowMode: bool = False):
+    """
+    Parses HTTP logs and generates WebLogEvent type of events.
+    A path of "-" reads logs streamed to the standard input, e.g. from a pipe.
+    """
+
+    def __init__(
+        self,
+        processor: Processor,
+        path: str,
+        isFollowMode: bool = False,
+        workers: int = 1,
+        logFormat: str = "csv",
+        fields: Optional[Iterable[str]] = None,
+    ):
         super().__init__(processor)
         self._path = path
         self._isFollowMode = isFollowMode
 
+        # Extract only the fields required for processing, all of them by default
+        self._extract = compileFormat(logFormat, FIELDS if fields is None else fields)
+
+        # Number of processes decompressing multi-member gzip logs in parallel
+        self._workers = workers
+
+        # Number of malformed rows skipped per reason, e.g. "date"
+        self.rejections: Counter[str] = Counter()
+        self._isRejectionsUnreported = False
+        self._timeLastReported: float = 0
+
     def parse(self) -> None:
         """ Parse raw data from log file and generate log event object """
+        if self._path == "-":
+            logging.info("Monitoring HTTP logs from standard input")
+            # Chunks are read past the buffer, so waiting for data can time out
+            self._parseStream(sys.stdin.buffer)
+            return
+
         logging.info(f"Monitoring HTTP log file {self._path}")
-        position = 0
-        while True:
-            position = self._parseFile(position)
-            if self._isFollowMode:
+        if not self._isFollowMode or self._isCompressed():
+            # Run only once
+            self._parseFile()
+            return
+
+        follower = LogFollower(self._path)
+        try:
+            while True:
+                self._pollFile(follower)
+                # Advance time even if no new lines, for alerts on traffic stopping
+                self.processor.tick()
                 # Sleep for x seconds
-                time.sleep(float(os.getenv("DD_LOG_MONITOR_TIME", 1.0)))
-            else:
-                # Run only once
-                break
+                time.sleep(_pollInterval())
+        finally:
+            follower.close()
 
-    def _parseFile(self, position: int = 0) -> int:
+    def _isCompressed(self) -> bool:
+        """ Compressed logs, e.g. rotated ones, don't grow so aren't followed """
         try:
-            with open(self._path, mode="r") as fd:
-                fd.seek(position)
-                logreader = csv.reader(fd)
-
-                try:
-                    # Skip header iff one exists
-                    header = next(logreader)
-                    if len(header) > 0 and header[0] != "remotehost":
-                        logging.debug("No header")
-                        fd.seek(position)
-                    else:
-                        logging.debug(f"Header: {header}")
-                except StopIteration as e:
-                    # E.g. Occurs if empty file or polling end of file
-                    logging.debug("Nothing further to read")
-                    pass
-
-                # Parse rows in best-effort mode (i.e. skip any bad lines)
-                for row in logreader:
-                    if self._isSanitised(row):
-                        # and generate WebLogEvents to send for processing
-                        self._generateEvent(row)
-                # Flush buffer
-                self.processor.consume(None)
-                return fd.tell()
+            if compression(self._path) is None:
+                return False
+        except FileNotFoundError as e:
+            return False
+        logging.warning(
+            f"Compressed HTTP log file read once, not followed: {self._path}"
+        )
+        return True
+
+    def _parseFile(self) -> None:
+        try:
+            if self._workers > 1 and compression(self._path) == "gzip":
+                self._parseLines(iterGzipLines(self._path, self._workers))
+            else:
+                with openLog(self._path) as fd:
+                    self._parseLines(fd)
         except FileNotFoundError as e:
             logging.error(f"HTTP log file doesn't exist: {self._path}")
+            return
         except csv.Error as ce:
             logging.error(f"HTTP log file not valid CSV: {self._path}")
-        # Return original to position if any issues so we stop or keep polling
-        return position
-
-    def _isSanitised(self, row: list[str]) -> bool:
-        """ Sanitise row columns data types """
-        if len(row) != 7:
-            logging.warning(f"Malformed CSV row: {row}")
-            return False
-
-        # Parseable section out of request, i.e. row[4]
-        section = row[4].split(" ")
-        if len(section) < 2 or len(section[1].split("/")) < 2:
-            logging.warning(f"Malformed 'section' part of row: {row}")
-            return False
+        self._flush()
 
+    def _pollFile(self, follower: LogFollower) -> None:
+        """ Parse complete lines written to the followed log since the previous poll """
         try:
-            datetime.fromtimestamp(int(row[3]))
-        except (ValueError, OverflowError, OSError) as e:
-            logging.warning(f"Malformed 'date' part of row: {row}")
-            return False
+            for lines in follower.readLines():
+                self._parseLines(lines)
+        except FileNotFoundError as e:
+            # Keep polling until it's created
+            logging.error(f"HTTP log file doesn't exist: {self._path}")
+            return
+        except csv.Error as ce:
+            logging.error(f"HTTP log file not valid CSV: {self._path}")
+        self._flush()
 
-        return True
+    def _parseStream(self, stream: BinaryIO) -> None:
+        """ Parse logs streamed in chunks until end of stream, then flush the buffer """
+        try:
+            for lines in iterStreamLines(stream, idleTimeout=_pollInterval()):
+                if lines:
+                    self._parseLines(lines)
+                else:
+                    # No data for a while, advance time for alerts on traffic stopping
+                    self.processor.tick()
+        except csv.Error as ce:
+            logging.error("HTTP logs stream not valid CSV")
+        self._flush()
+
+    def _parseLines(self, lines: Iterable[str]) -> None:
+        """ Extract log lines fields and send them for processing """
+        # Parse rows in best-effort mode (i.e. skip any bad lines)
+        for fields in self._extract(lines):
+            if type(fields) is Rejected:
+                self._reject(*fields)  # type: ignore
+            else:
+                # and generate WebLogEvents to send for processing
+                self._generateEvent(fields)  # type: ignore
+
+    def _flush(self) -> None:
+        """ Report any malformed rows and flush the processor buffer """
+        self._reportRejections()
+        self.processor.consume(None)
+
+    def _reject(self, reason: str, row: object) -> None:
+        """ Count malformed row, only the first few of each reason are logged individually """
+        self.rejections[reason] += 1
+        if self.rejections[reason] <= _WARNINGS_PER_REASON:
+            if reason in ("CSV", "JSON"):
+                logging.warning(f"Malformed {reason} row: {row}")
+            elif reason == "format":
+                logging.warning(f"Row not matching log format: {row}")
+            else:
+                logging.warning(f"Malformed '{reason}' part of row: {row}")
+        else:
+            self._isRejectionsUnreported = True
+
+    def _reportRejections(self) -> None:
+        """ Log aggregated counts of malformed rows, at most once per interval when following """
+        now = time.monotonic()
+        if not self._isRejectionsUnreported or (
+            self._isFollowMode and now - self._timeLastReported < _REPORT_INTERVAL
+        ):
+            return
+        counts = ", ".join(f"{reason}: {n}" for reason, n in self.rejections.items())
+        logging.warning(
+            f"Skipped {sum(self.rejections.values())} malformed rows so far ({counts})"
+        )
+        self._isRejectionsUnreported = False
+        self._timeLastReported = now
 
-    def _generateEvent(self, row: list[str]) -> None:
+    def _generateEvent(self, fields: EventFields) -> None:
         """ Build event object from pre-sanitised data and send for processing """
-
-        section = "/" + row[4].split(" ")[1].split("/")[1]
+        timestamp, source, section, status, size, request = fields
         e = WebLogEvent(
             priority=WebLogEvent.Priority.MEDIUM,
-            source=row[0],
-            rfc931=row[1],
-            authuser=row[2],
-            time=int(row[3]),
-            request=row[4],
-            section=section,
-            status=row[5],
-            size=row[6],
+            source=source,  # type: ignore
+            rfc931=None,
+            authuser=None,
+            time=timestamp,
+            request=request,
+            section=section,  # type: ignore
+            status=status,  # type: ignore
+            size=size,
             message="",
         )
         self.processor.consume(e)
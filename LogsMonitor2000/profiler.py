@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+import signal
+import logging
+from datetime import datetime
+from collections import Counter, defaultdict
+from typing import Callable, cast
+
+# Stage of samples taken outside of any, e.g. between logs monitored in turn
+_OUTSIDE = "other"
+
+# Number of most sampled functions reported per stage
+_TOP_FUNCTIONS = 5
+
+
+def _functionName(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+class StageProfiler:
+    """
+    Profiles the pipeline per stage, e.g. parsing, flushing the buffer, each calculator
+    and notifying, at an overhead low enough to be left running in production.
+
+    Stage methods are wrapped to count their calls and time them, inclusive of the
+    stages they call and exclusive of them (self time). A CPU time interval timer
+    samples the monitoring thread's stack, attributing each sample to the stage running
+    at that time and the function on top of the stack, so even a stage made of a single
+    long call, e.g. parsing a file, is broken down by function. The timer's handler runs
+    in the monitoring thread itself, so samples aren't biased towards where it releases
+    the GIL, e.g. writing alerts, as a sampling thread's would be. With memory on,
+    allocations are traced and reported per stage module, along with their change.
+
+    Reports of the stats since the previous one are appended to a file after each
+    interval, on the first stage call returning or processor tick, so an idle monitor,
+    e.g. following a log, still reports, and on close. The handler only flags them as
+    due, as it may interrupt a stage's stats being updated. Unix only, from the main
+    thread.
+    """
+
+    def __init__(
+        self, path: str, interval: float = 60, samplingInterval=0.01, memory=False
+    ):
+        if not hasattr(signal, "SIGPROF"):
+            raise ValueError("Profiling requires the SIGPROF signal, only on Unix")
+        self._path = path
+        self._interval = interval
+        self._samplingInterval = samplingInterval
+
+        # Stages being run, innermost last, each with time spent in nested stages so far
+        self._stack: list[list] = []
+
+        # Since the previous report: calls, inclusive and self seconds per stage, and
+        # samples per stage and function
+        self._calls: Counter[str] = Counter()
+        self._inclusive: Counter[str] = Counter()
+        self._self: Counter[str] = Counter()
+        self._samples: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self._timeLastReported = time.monotonic()
+        # Set by a sample after the interval, for the next stage call returning
+        self._isReportDue = False
+
+        # Stage of each wrapped object's source file, to attribute allocations
+        self._stageFiles: dict[str, str] = {}
+        self._memory = memory
+        self._lastSnapshot = None
+        if memory:
+            import tracemalloc
+
+            tracemalloc.start()
+            self._lastSnapshot = tracemalloc.take_snapshot()
+
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, samplingInterval, samplingInterval)
+        logging.info(f"Profiling stages to {path} every {interval:g}s")
+
+    def wrap(self, obj: object, methods: list[str], stage: str) -> None:
+        "Attribute the calls of the object's methods, if it has them, to a stage"
+        for name in methods:
+            method = getattr(obj, name, None)
+            # Unless already wrapped, e.g. the notifier of logs monitored in turn
+            if method is not None and name not in vars(obj):
+                # Shadows the class method, so calls from the object's own are wrapped
+                setattr(obj, name, self._timed(method, stage))
+        module = sys.modules.get(type(obj).__module__)
+        source = getattr(module, "__file__", None)
+        if source is not None:
+            self._stageFiles.setdefault(source, stage)
+
+    def _timed(self, method: Callable, stage: str) -> Callable:
+        stack = self._stack
+
+        def timed(*args, **kwargs):
+            entry = [stage, 0.0]
+            stack.append(entry)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                self._calls[stage] += 1
+                self._inclusive[stage] += elapsed
+                self._self[stage] += elapsed - entry[1]
+                if self._isReportDue:
+                    self.report()
+
+        return timed
+
+    def _reporting(self, method: Callable) -> Callable:
+        def reporting(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._reportIfDue()
+
+        return reporting
+
+    def profilePipeline(
+        self, parser: object, processor: object, action: object
+    ) -> None:
+        "Wrap the stages of a monitored log's pipeline"
+        self.wrap(parser, ["_parseFile", "_pollFile", "_parseStream"], "parse")
+        self.wrap(processor, ["_bufferFlush"], "flush")
+        self.wrap(processor, ["_removeOldEvents"], "removeOldEvents")
+        # Ticks advance time while idle, when samples are too few to report on
+        if "tick" not in vars(processor):
+            setattr(processor, "tick", self._reporting(getattr(processor, "tick")))
+        for calc in getattr(processor, "_statsCalculators", []):
+            self.wrap(calc, ["count", "discount", "triggerAlert"], type(calc).__name__)
+        self.wrap(action, ["notify"], "notify")
+
+    def _sample(self, signum: int, frame) -> None:
+        "Attribute a sample to the running stage and function, and flag reports due"
+        stage = self._stack[-1][0] if self._stack else _OUTSIDE
+        self._samples[stage][_functionName(frame)] += 1
+        if time.monotonic() - self._timeLastReported >= self._interval:
+            self._isReportDue = True
+
+    def _reportIfDue(self) -> None:
+        if time.monotonic() - self._timeLastReported >= self._interval:
+            self.report()
+
+    def report(self) -> None:
+        "Append the stats since the previous report to the file, and reset them"
+        now = time.monotonic()
+        elapsed = now - self._timeLastReported
+        self._timeLastReported = now
+        self._isReportDue = False
+        calls, self._calls = self._calls, Counter()
+        inclusive, self._inclusive = self._inclusive, Counter()
+        selfTimes, self._self = self._self, Counter()
+        samples, self._samples = self._samples, defaultdict(Counter)
+
+        totalSamples = sum(sum(functions.values()) for functions in samples.values())
+        lines = [
+            f"Profile at {datetime.now():%Y-%m-%d %H:%M:%S}, "
+            f"{elapsed:.1f}s since previous, {totalSamples} samples",
+            f"{'stage':<28}{'calls':>12}{'total s':>10}{'self s':>10}{'samples':>9}",
+        ]
+        stages = sorted(
+            set(calls) | set(samples), key=lambda s: -sum(samples[s].values())
+        )
+        for stage in stages:
+            stageSamples = sum(samples[stage].values())
+            share = stageSamples / totalSamples if totalSamples else 0
+            lines.append(
+                f"{stage:<28}{calls[stage]:>12}{inclusive[stage]:>10.3f}"
+                f"{selfTimes[stage]:>10.3f}{share:>9.1%}"
+            )
+        for stage in stages:
+            if samples[stage]:
+                top = samples[stage].most_common(_TOP_FUNCTIONS)
+                functions = ", ".join(f"{name} ({n})" for name, n in top)
+                lines.append(f"Top functions of {stage}: {functions}")
+        if self._memory:
+            lines.extend(self._memoryReport())
+
+        with open(self._path, mode="a") as fd:
+            fd.write("\n".join(lines) + "\n\n")
+
+    def _memoryReport(self) -> list[str]:
+        "Allocations held per stage, and their change since the previous report"
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot()
+        # Taken on start, or by the previous report
+        previous = cast(tracemalloc.Snapshot, self._lastSnapshot)
+        sizes: Counter[str] = Counter()
+        changes: Counter[str] = Counter()
+        for stat in snapshot.compare_to(previous, "filename"):
+            stage = self._stageFiles.get(stat.traceback[0].filename, _OUTSIDE)
+            sizes[stage] += stat.size
+            changes[stage] += stat.size_diff
+        self._lastSnapshot = snapshot
+
+        lines = [f"{'allocations':<28}{'KB':>12}{'change':>10}"]
+        for stage, size in sizes.most_common():
+            lines.append(
+                f"{stage:<28}{size / 1024:>12.0f}{changes[stage] / 1024:>+10.0f}"
+            )
+        return lines
+
+    def close(self) -> None:
+        "Stop sampling, and report the stats since the previous report"
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        self.report()
+        if self._memory:
+            import tracemalloc
+
+            tracemalloc.stop()
@@ -0,0 +1,364 @@
+import io
+import os
+import sys
+import select
+import mmap
+import zlib
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import IO, BinaryIO, Callable, Generator, Iterator, Optional, cast
+
+# Decompression and multiprocessing modules are imported lazily, as they're only needed
+# for compressed logs and importing them takes a noticeable share of startup time
+
+# Read compressed and plain logs in large chunks, rather than the default 8KB
+_READ_BUFFER_SIZE = 1024 * 1024
+
+# Leading "magic" bytes identifying each supported compression format
+_GZIP_MAGIC = b"\x1f\x8b"
+_BZIP2_MAGIC = b"BZh"
+_XZ_MAGIC = b"\xfd7zXZ\x00"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Gzip member header: magic, deflate compression method
+_GZIP_MEMBER_HEADER = _GZIP_MAGIC + b"\x08"
+
+# Most bytes a worker decompresses a gzip member to, larger ones are decompressed by
+# the reading process in chunks instead, so memory stays bounded whatever their size
+_MAX_MEMBER_CONTENT = 64 * 1024 * 1024
+
+
+def compression(path: str) -> Optional[str]:
+    """ Detect compression format from the file's leading bytes, None if plain text """
+    with open(path, mode="rb") as fd:
+        magic = fd.read(6)
+    if magic.startswith(_GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(_BZIP2_MAGIC):
+        return "bz2"
+    if magic.startswith(_XZ_MAGIC):
+        return "xz"
+    if magic.startswith(_ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def _zstd():
+    """ zstd module, from the standard library on Python 3.14+ or the PyPI package """
+    try:
+        from compression import zstd  # type: ignore
+    except ImportError:
+        try:
+            import zstandard as zstd  # type: ignore
+        except ImportError:
+            raise ValueError(
+                "zstd log requires Python 3.14+ or the 'zstandard' package"
+            )
+    return zstd
+
+
+def _decompressor(fmt: str, raw: IO[bytes]) -> IO[bytes]:
+    """ Wrap raw binary stream with a streaming decompressor for the given format """
+    if fmt == "gzip":
+        import gzip
+
+        return cast(IO[bytes], gzip.GzipFile(fileobj=raw, mode="rb"))
+    if fmt == "bz2":
+        import bz2
+
+        return cast(IO[bytes], bz2.BZ2File(raw, mode="rb"))
+    if fmt == "xz":
+        import lzma
+
+        return cast(IO[bytes], lzma.LZMAFile(raw, mode="rb"))
+    zstd = _zstd()
+    if hasattr(zstd, "ZstdFile"):
+        return zstd.ZstdFile(raw, mode="rb")
+    return zstd.ZstdDecompressor().stream_reader(raw)
+
+
+@contextmanager
+def openLog(path: str) -> Iterator[IO[str]]:
+    """
+    Open log file for reading as text, transparently decompressing it as a stream
+    if it's gzip, bz2, xz or zstd compressed. Reads are done in large chunks.
+    """
+    fmt = compression(path)
+    raw = open(path, mode="rb", buffering=_READ_BUFFER_SIZE)
+    try:
+        if fmt is None:
+            stream: IO[bytes] = raw
+        else:
+            logging.debug(f"Decompressing {fmt} log {path}")
+            stream = io.BufferedReader(
+                _decompressor(fmt, raw), buffer_size=_READ_BUFFER_SIZE  # type: ignore
+            )
+        with io.TextIOWrapper(stream) as fd:  # type: ignore
+            yield fd
+    finally:
+        raw.close()
+
+
+def _gzipMemberCandidates(path: str) -> list[int]:
+    """
+    Offsets of byte sequences looking like a gzip member header.
+    Some may be false positives from within compressed data, checked on decompression.
+    """
+    candidates = []
+    with open(path, mode="rb") as fd, mmap.mmap(
+        fd.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        offset = data.find(_GZIP_MEMBER_HEADER)
+        while offset != -1:
+            # Reserved flag bits must be zero in a genuine header
+            if offset + 3 < len(data) and data[offset + 3] < 0x20:
+                candidates.append(offset)
+            offset = data.find(_GZIP_MEMBER_HEADER, offset + 1)
+    return candidates
+
+
+def _decompressMember(path: str, start: int, end: int) -> Optional[bytes]:
+    """
+    Decompress bytes [start, end) as exactly one gzip member, or None if it isn't one,
+    or if its content is too large to be passed back whole.
+    Member trailer CRC and size are checked by zlib.
+    """
+    with open(path, mode="rb") as fd:
+        fd.seek(start)
+        data = fd.read(end - start)
+    decompressor = zlib.decompressobj(wbits=31)
+    try:
+        content = decompressor.decompress(data, _MAX_MEMBER_CONTENT)
+    except zlib.error:
+        return None
+    if not decompressor.eof or decompressor.unused_data:
+        return None
+    return content
+
+
+def _iterMemberAt(path: str, start: int) -> Generator[bytes, None, int]:
+    """
+    Decompress one gzip member serially from start, in chunks of bounded size,
+    returning its end offset
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    with open(path, mode="rb") as fd:
+        fd.seek(start)
+        position = start
+        while not decompressor.eof:
+            data = fd.read(_READ_BUFFER_SIZE)
+            if not data:
+                raise EOFError(f"Truncated gzip member at offset {start}: {path}")
+            position += len(data)
+            while data and not decompressor.eof:
+                yield decompressor.decompress(data, _READ_BUFFER_SIZE)
+                data = decompressor.unconsumed_tail
+    return position - len(decompressor.unused_data)
+
+
+def _iterGzipMembers(path: str, workers: int) -> Iterator[bytes]:
+    """
+    Decompress members of a multi-member gzip file in parallel worker processes,
+    yielding their content in file order, in chunks for members too large for workers.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    candidates = _gzipMemberCandidates(path)
+    with open(path, mode="rb") as fd:
+        fd.seek(0, io.SEEK_END)
+        ends = candidates[1:] + [fd.tell()]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep a bounded number of members in flight to bound memory use
+        pending: deque = deque()
+        nextToSubmit = 0
+        position = 0
+        for i, start in enumerate(candidates):
+            while nextToSubmit < len(candidates) and len(pending) < workers * 2:
+                memberStart, memberEnd = candidates[nextToSubmit], ends[nextToSubmit]
+                if memberEnd - memberStart > _MAX_MEMBER_CONTENT:
+                    # Its content would be at least as large
+                    pending.append(None)
+                else:
+                    pending.append(
+                        pool.submit(_decompressMember, path, memberStart, memberEnd)
+                    )
+                nextToSubmit += 1
+            future = pending.popleft()
+            content = None if future is None else future.result()
+
+            if start < position:
+                # False positive header within a member already decompressed
+                continue
+            if content is None:
+                # Too large, or next candidate was a false positive so the real end of
+                # this member is further
+                position = yield from _iterMemberAt(path, start)
+            else:
+                position = ends[i]
+                yield content
+
+
+def _splitLines(text: str) -> list[str]:
+    """
+    Lines split on "\n" only, with their ends, as in a file read with newline="\n".
+    Unlike str.splitlines(), vertical tabs, form feeds, unicode line and paragraph
+    separators or lone carriage returns within a line don't split it.
+    """
+    return io.StringIO(text, newline="\n").readlines()
+
+
+def iterGzipLines(path: str, workers: int) -> Iterator[str]:
+    """ Lines of a multi-member gzip log, decompressed in parallel processes """
+    # Carry any line split across members over to the next one
+    tail = b""
+    for content in _iterGzipMembers(path, workers):
+        lastLineEnd = content.rfind(b"\n") + 1
+        if lastLineEnd == 0:
+            tail += content
+            continue
+        yield from _splitLines((tail + content[:lastLineEnd]).decode())
+        tail = content[lastLineEnd:]
+    if tail:
+        yield tail.decode()
+
+
+class LineReader:
+    """
+    Incrementally reads complete lines from a binary stream, e.g. a growing log file
+    or a pipe, through a single reused read buffer. Any unterminated line at the end of
+    the data written so far is kept until the rest of it is written, rather than parsed
+    as a (likely malformed) partial row and lost.
+    """
+
+    def __init__(self, stream: BinaryIO, chunkSize: int = _READ_BUFFER_SIZE):
+        # Files and pipes read have readinto(), though BinaryIO doesn't declare it
+        self._readinto: Callable[[memoryview], Optional[int]] = getattr(
+            stream, "readinto1", None
+        ) or getattr(stream, "readinto")
+        self._buffer = bytearray(chunkSize)
+        self._view = memoryview(self._buffer)
+
+        # Unterminated line so far, waiting for its end
+        self._tail = bytearray()
+
+    def readBatch(self) -> Optional[list[str]]:
+        " Complete lines from a single read, possibly none, or None at the end of data "
+        size = self._readinto(self._view)
+        if not size:
+            return None
+        lastLineEnd = self._buffer.rfind(b"\n", 0, size) + 1
+        if lastLineEnd == 0:
+            self._tail += self._view[:size]
+            return []
+        self._tail += self._view[:lastLineEnd]
+        lines = _splitLines(self._tail.decode(errors="replace"))
+        self._tail[:] = self._view[lastLineEnd:size]
+        return lines
+
+    def readLines(self) -> Iterator[list[str]]:
+        " Batches of complete lines available now, until the end of data written so far "
+        while True:
+            lines = self.readBatch()
+            if lines is None:
+                return
+            if lines:
+                yield lines
+
+    def readTail(self) -> list[str]:
+        " Any unterminated last line, once the stream has ended "
+        lines = [self._tail.decode(errors="replace")] if self._tail else []
+        self.clear()
+        return lines
+
+    def clear(self) -> None:
+        " Drop any unterminated line, e.g. if the file was truncated "
+        self._tail.clear()
+
+
+class LogFollower:
+    """
+    Follows a growing log file like `tail --follow`, keeping it open between polls.
+    The file is read from the start again if truncated, and reopened if rotated.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._fd: Optional[BinaryIO] = None
+        self._reader: Optional[LineReader] = None
+
+    def _open(self) -> None:
+        self.close()
+        self._fd = open(self._path, mode="rb", buffering=0)  # type: ignore
+        self._reader = LineReader(self._fd)  # type: ignore
+
+    def _isRotated(self) -> bool:
+        " Log path now refers to another file, e.g. after logrotate "
+        try:
+            return os.stat(self._path).st_ino != os.fstat(self._fd.fileno()).st_ino  # type: ignore
+        except FileNotFoundError:
+            return False
+
+    def readLines(self) -> Iterator[list[str]]:
+        " Batches of complete lines written since the previous poll "
+        if self._fd is None:
+            self._open()
+        elif os.fstat(self._fd.fileno()).st_size < self._fd.tell():
+            logging.info(f"HTTP log file truncated: {self._path}")
+            self._fd.seek(0)
+            self._reader.clear()  # type: ignore
+        elif self._isRotated():
+            logging.info(f"HTTP log file rotated: {self._path}")
+            # Finish reading the previous file first
+            yield from self._reader.readLines()  # type: ignore
+            self._open()
+        yield from self._reader.readLines()  # type: ignore
+
+    def close(self) -> None:
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+
+
+def _isReadable(stream: BinaryIO, timeout: float) -> bool:
+    """
+    Wait up to timeout seconds for data, always readable if the stream can't be polled,
+    e.g. on Windows where only sockets can, so that it's read blocking instead
+    """
+    if sys.platform == "win32":
+        return True
+    try:
+        fd = stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return True
+    return bool(select.select([fd], [], [], timeout)[0])
+
+
+def iterStreamLines(
+    stream: BinaryIO,
+    chunkSize: int = _READ_BUFFER_SIZE,
+    idleTimeout: Optional[float] = None,
+) -> Iterator[list[str]]:
+    """
+    Batches of complete lines from an unseekable stream such as a pipe, read in large
+    chunks as soon as data is available. A partial line at the end of a chunk is kept
+    until the rest of it arrives, so memory is bounded by chunk and line sizes.
+    If an idle timeout is given, an empty batch is returned whenever no data arrived
+    for that many seconds, e.g. to advance processing time.
+    No data should wait in the stream's buffer then: either it's unbuffered (raw), or
+    buffered with readinto1(), which reads chunks larger than its buffer directly.
+    """
+    reader = LineReader(stream, chunkSize)
+    while True:
+        if idleTimeout is not None and not _isReadable(stream, idleTimeout):
+            yield []
+            continue
+        lines = reader.readBatch()
+        if lines is None:
+            break
+        if lines:
+            yield lines
+    tail = reader.readTail()
+    if tail:
+        yield tail
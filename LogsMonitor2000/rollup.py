@@ -0,0 +1,110 @@
+import sqlite3
+from typing import Optional
+from datetime import datetime
+from argparse import ArgumentParser, ArgumentTypeError
+
+from .analyze.rollupCalculator import KINDS, connectRollups
+
+
+def timestamp(value: str) -> int:
+    """ Parse Unix time, or local ISO date and time, e.g. 2019-02-07T21:11 """
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        raise ArgumentTypeError(
+            f"Expected Unix time or ISO date and time, got: {value}"
+        )
+
+
+def queryRollups(
+    db: sqlite3.Connection,
+    start: int,
+    end: int,
+    kind="total",
+    resolution=60,
+    top: Optional[int] = None,
+) -> list[tuple[int, str, int]]:
+    """
+    Time, key and count rows of a kind of rollup from start to end (inclusive), in
+    time order then most requested first, keeping only the top keys of each time if set.
+    """
+    rows = db.execute(
+        "SELECT time, key, count FROM rollups"
+        " WHERE resolution = ? AND kind = ? AND time BETWEEN ? AND ?"
+        " ORDER BY time, count DESC, key",
+        (resolution, kind, start, end),
+    ).fetchall()
+    if top is None:
+        return rows
+
+    topRows: list[tuple[int, str, int]] = []
+    rank = 0
+    for row in rows:
+        if topRows and topRows[-1][0] == row[0]:
+            rank += 1
+        else:
+            rank = 1
+        if rank <= top:
+            topRows.append(row)
+    return topRows
+
+
+def main():
+    """ Print request counts stored with --rollup_db over a time range """
+    argsParser = ArgumentParser(
+        description="Query per-second and per-minute request counts stored by a monitor"
+    )
+    argsParser.add_argument("db", help="Rollups database, written with --rollup_db")
+    argsParser.add_argument(
+        "--start",
+        help="Unix time or local ISO date and time",
+        type=timestamp,
+        default=0,
+    )
+    argsParser.add_argument(
+        "--end",
+        help="Unix time or local ISO date and time, inclusive",
+        type=timestamp,
+        default=2 ** 63 - 1,
+    )
+    argsParser.add_argument(
+        "--by", help="Counts per key of this kind", choices=KINDS, default="total"
+    )
+    argsParser.add_argument(
+        "--resolution",
+        help="Counts per second or per minute",
+        choices=("second", "minute"),
+        default="minute",
+    )
+    argsParser.add_argument(
+        "--top", help="Only print the x most requested keys of each time", type=int
+    )
+    args = argsParser.parse_args()
+
+    db = connectRollups(args.db)
+    try:
+        rows = queryRollups(
+            db,
+            args.start,
+            args.end,
+            kind=args.by,
+            resolution=1 if args.resolution == "second" else 60,
+            top=args.top,
+        )
+    finally:
+        db.close()
+    for time, key, count in rows:
+        # Totals have no key
+        print(
+            " ".join(
+                str(v) for v in (datetime.fromtimestamp(time), key, count) if v != ""
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import math
+from typing import Dict
+from hashlib import blake2b
+
+
+class QuantileSketch:
+    """
+    DDSketch-like quantile estimation within a relative error, without storing values.
+    Values are counted in logarithmically sized buckets, so sketches can be merged and,
+    unlike most sketches, values removed again as they leave a sliding window.
+    """
+
+    def __init__(self, relativeAccuracy: float = 0.01):
+        self.relativeAccuracy = relativeAccuracy
+        self._gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+        self._logGamma = math.log(self._gamma)
+
+        # Number of values per bucket index, i.e. values within (gamma^(i-1), gamma^i]
+        self._buckets: Dict[int, int] = {}
+
+        # Values too small for a logarithmic bucket, e.g. empty responses
+        self._zeroCount: int = 0
+
+        # Total number of values in sketch
+        self.count: int = 0
+
+    def _bucket(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._logGamma)
+
+    def add(self, value: float, n: int = 1) -> None:
+        "Count value n times, a negative n removes it"
+        self.count += n
+        if value < 1:
+            self._zeroCount += n
+            return
+        i = self._bucket(value)
+        count = self._buckets.get(i, 0) + n
+        if count:
+            self._buckets[i] = count
+        else:
+            # Keep memory bounded to buckets of values still in the sketch
+            del self._buckets[i]
+
+    def remove(self, value: float, n: int = 1) -> None:
+        self.add(value, -n)
+
+    def merge(self, other: "QuantileSketch", sign: int = 1) -> None:
+        "Add all values of another sketch with same accuracy, or remove them with negative sign"
+        self.count += sign * other.count
+        self._zeroCount += sign * other._zeroCount
+        for i, n in other._buckets.items():
+            count = self._buckets.get(i, 0) + sign * n
+            if count:
+                self._buckets[i] = count
+            else:
+                del self._buckets[i]
+
+    def toState(self) -> dict:
+        "JSON serializable state, to merge with sketches elsewhere"
+        return {
+            "relativeAccuracy": self.relativeAccuracy,
+            "zeroCount": self._zeroCount,
+            "buckets": list(self._buckets.items()),
+        }
+
+    @classmethod
+    def fromState(cls, state: dict) -> "QuantileSketch":
+        sketch = cls(state["relativeAccuracy"])
+        sketch._zeroCount = state["zeroCount"]
+        sketch._buckets = {int(i): n for i, n in state["buckets"]}
+        sketch.count = sketch._zeroCount + sum(sketch._buckets.values())
+        return sketch
+
+    def quantile(self, q: float) -> float:
+        "Estimated value at quantile q, e.g. 0.99, within relative accuracy"
+        if self.count <= 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self._zeroCount
+        if seen > rank:
+            return 0.0
+        for i in sorted(self._buckets):
+            seen += self._buckets[i]
+            if seen > rank:
+                # Middle of the bucket, in terms of relative error
+                return 2 * self._gamma ** i / (self._gamma + 1)
+        # Only reached if more values were removed than added
+        return 0.0
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct values count estimation, in 2^precision bytes of registers.
+    Standard error is 1.04 / sqrt(2^precision), e.g. 3.25% with the default 1KB.
+    Sketches of the same precision merge into the sketch of all their values, but
+    values can't be removed: sliding windows merge sketches of each second instead.
+    """
+
+    def __init__(self, precision: int = 10):
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        # Stable 64-bit hash (unlike hash()), so sketches merge across processes
+        h = int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "big")
+        bits = 64 - self.precision
+        index = h >> bits
+        # Position of the leftmost 1 bit in the remaining bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        "Add all values of another sketch with same precision"
+        # Registers are below 128, so their pairwise max is computed all at once on the
+        # registers packed as big integers: setting each byte's high bit before
+        # subtracting leaves it set where a >= b, without borrowing from other bytes
+        n = len(self._registers)
+        a = int.from_bytes(self._registers, "big")
+        b = int.from_bytes(other._registers, "big")
+        high = int.from_bytes(b"\x80" * n, "big")
+        isGreaterOrEqual = (((a | high) - b) & high) >> 7
+        merged = b ^ ((a ^ b) & (isGreaterOrEqual * 0xFF))
+        self._registers = bytearray(merged.to_bytes(n, "big"))
+
+    def copy(self) -> "HyperLogLog":
+        sketch = HyperLogLog(self.precision)
+        sketch._registers[:] = self._registers
+        return sketch
+
+    def count(self) -> float:
+        "Estimated number of distinct values added"
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small cardinalities are more accurately counted from empty registers
+            return m * math.log(m / zeros)
+        return estimate
+
+    def toState(self) -> str:
+        "JSON serializable state, to merge with sketches elsewhere"
+        return self._registers.hex()
+
+    @classmethod
+    def fromState(cls, state: str) -> "HyperLogLog":
+        registers = bytearray.fromhex(state)
+        sketch = cls(len(registers).bit_length() - 1)
+        sketch._registers = registers
+        return sketch
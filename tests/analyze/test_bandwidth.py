@@ -0,0 +1,48 @@
+import unittest
+from .utils import buildEvent
+from unittest.mock import MagicMock
+from LogsMonitor2000.analyze import AnalyticsProcessor
+
+
+def buildSizedEvent(time: int, section: str, size: int):
+    e = buildEvent(time)
+    e.section = section
+    e.size = size
+    return e
+
+
+class TestBandwidthCalculator(unittest.TestCase):
+    "Test bandwidth stats generated every interval"
+
+    def testStats(self):
+        action = MagicMock()
+        proc = AnalyticsProcessor(
+            action,
+            mostCommonStatsInterval=-1,
+            highTrafficInterval=-1,
+            bandwidthStatsInterval=10,
+        )
+
+        proc.consume(buildSizedEvent(time=0, section="/api", size=100))
+        proc.consume(buildSizedEvent(time=5, section="/img", size=900))
+        proc.consume(buildSizedEvent(time=6, section="/api", size=100))
+        proc.consume(buildSizedEvent(time=10, section="/api", size=1000))
+        proc.consume(None)
+
+        # Event at time 0 is still within the 10s window
+        self.assertEqual(1, action.notify.call_count)
+        self.assertEqual(
+            "Bandwidth: 210.00 bytes/s, top sections: /api (1200 bytes), /img (900 bytes)"
+            ", response size p50: 100 bytes, p99: 907 bytes",
+            action.notify.call_args.args[0].message,
+        )
+
+        # Later on, only the most recent events are counted
+        proc.consume(buildSizedEvent(time=20, section="/img", size=10))
+        proc.consume(None)
+        self.assertEqual(2, action.notify.call_count)
+        self.assertEqual(
+            "Bandwidth: 101.00 bytes/s, top sections: /api (1000 bytes), /img (10 bytes)"
+            ", response size p50: 10 bytes, p99: 10 bytes",
+            action.notify.call_args.args[0].message,
+        )
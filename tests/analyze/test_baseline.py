@@ -0,0 +1,123 @@
+import os
+import json
+import math
+import random
+import tempfile
+import unittest
+from .utils import buildEvent
+from unittest.mock import MagicMock
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.analyze.baselineCalculator import BaselineCalculator
+
+DAY = 24 * 3600
+
+
+def dailyTraffic(days: int, spikeAt=None, spikeLength=300):
+    """
+    Requests per second following a daily curve from 5 to 95, Poisson-like noise,
+    tripled during the spike if any
+    """
+    rng = random.Random(0)
+    for t in range(days * DAY):
+        rate = 50 + 45 * math.sin(2 * math.pi * t / DAY)
+        if spikeAt is not None and spikeAt <= t < spikeAt + spikeLength:
+            rate *= 3
+        yield t, max(0, round(rng.gauss(rate, math.sqrt(rate))))
+
+
+def runBaseline(calc: BaselineCalculator, traffic) -> None:
+    for t, requests in traffic:
+        if requests:
+            e = buildEvent(t)
+            e.weight = requests
+            calc.count([e])
+        calc.triggerAlert(t)
+
+
+class TestBaselineCalculator(unittest.TestCase):
+    "Test alerts on deviations from the seasonal baseline"
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmpDir.name, "baseline.json")
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def testDailyCurve(self):
+        "The daily curve alone doesn't alert, a spike on top of it does, once"
+        action = MagicMock()
+        calc = BaselineCalculator(action, None, deviationsThreshold=4)
+        runBaseline(calc, dailyTraffic(2))
+        self.assertEqual(0, action.notify.call_count)
+
+        runBaseline(
+            calc, ((t + 2 * DAY, n) for t, n in dailyTraffic(1, spikeAt=DAY // 2))
+        )
+        messages = [c[0][0].message for c in action.notify.call_args_list]
+        self.assertEqual(2, len(messages))
+        self.assertTrue(
+            messages[0].startswith("Traffic above baseline generated an alert")
+        )
+        self.assertTrue(messages[1].startswith("Traffic is now back to baseline"))
+        alertTime = action.notify.call_args_list[0][0][0].time
+        self.assertLess(alertTime - (2 * DAY + DAY // 2), 30)
+
+    def testCheckpoint(self):
+        "Baseline restored from its checkpoint alerts without learning again"
+        first = BaselineCalculator(MagicMock(), None, checkpointPath=self.checkpoint)
+        runBaseline(first, dailyTraffic(1))
+        first.close()
+
+        restored = BaselineCalculator(MagicMock(), None, checkpointPath=self.checkpoint)
+        self.assertEqual(first._baseline.toState(), restored._baseline.toState())
+
+        # Next day starts with a spike, alerted only by the restored baseline
+        nextDay = [(t + DAY, n) for t, n in dailyTraffic(1, spikeAt=600)][:1800]
+        for checkpointPath in (self.checkpoint, None):
+            action = MagicMock()
+            calc = BaselineCalculator(action, None, checkpointPath=checkpointPath)
+            runBaseline(calc, nextDay)
+            if checkpointPath is None:
+                self.assertEqual(0, action.notify.call_count)
+                continue
+            messages = [c[0][0].message for c in action.notify.call_args_list]
+            self.assertEqual(2, len(messages))
+            self.assertLess(action.notify.call_args_list[0][0][0].time - DAY - 600, 30)
+
+    def testRestartGap(self):
+        "Seconds down for after a checkpoint are missing, not without requests"
+        first = BaselineCalculator(MagicMock(), None, checkpointPath=self.checkpoint)
+        runBaseline(first, dailyTraffic(1))
+        first.close()
+        with open(self.checkpoint) as fd:
+            state = json.load(fd)
+
+        # Restarted 6 hours after the last second checkpointed, or having seen those
+        # hours without requests
+        gap = 6 * 3600
+        nextTraffic = [(t + state["time"] + gap, n) for t, n in dailyTraffic(1)][:1800]
+        for downtime in (gap, 0):
+            with open(self.checkpoint, mode="w") as fd:
+                json.dump({**state, "wallTime": state["wallTime"] - downtime}, fd)
+            action = MagicMock()
+            calc = BaselineCalculator(action, None, checkpointPath=self.checkpoint)
+            runBaseline(calc, nextTraffic[:1])
+            if downtime:
+                self.assertEqual(first._baseline.seconds + 1, calc._baseline.seconds)
+                self.assertGreater(calc._baseline.level, 0.9 * first._baseline.level)
+                runBaseline(calc, nextTraffic[1:])
+                self.assertEqual(0, action.notify.call_count)
+            else:
+                self.assertEqual(first._baseline.seconds + gap, calc._baseline.seconds)
+                self.assertLess(calc._baseline.level, 0.1 * first._baseline.level)
+
+    def testProcessor(self):
+        "Baseline alerts are off by default"
+        proc = AnalyticsProcessor(MagicMock(), baselineDeviations=4)
+        self.assertEqual(
+            ["MostCommonCalculator", "HighTrafficCalculator", "BaselineCalculator"],
+            [type(c).__name__ for c in proc._statsCalculators],
+        )
+        proc = AnalyticsProcessor(MagicMock())
+        self.assertEqual(2, len(proc._statsCalculators))
@@ -1,7 +1,7 @@
 import unittest
 from .utils import buildEvent
 from collections import deque
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from LogsMonitor2000.analyze import AnalyticsProcessor
 
 
@@ -90,3 +90,82 @@ class TestBuffering(unittest.TestCase):
 
         self.assertEqual(1, len(proc._events))
         self.assertEqual(3, len(proc._buffer))
+
+    def testAdaptiveBufferTime(self):
+        """ Buffer time follows the observed lateness percentile, within bounds """
+
+        action = MagicMock()
+        lateAction = MagicMock()
+        proc = AnalyticsProcessor(
+            action,
+            mostCommonStatsInterval=10,
+            highTrafficInterval=-1,
+            bufferTime=1,
+            latenessPercentile=90,
+            minBufferTime=1,
+            maxBufferTime=5,
+            lateAction=lateAction,
+        )
+
+        # Mostly in order, buffer time stays at its minimum
+        for t in range(0, 20):
+            proc.consume(buildEvent(time=t))
+        self.assertEqual(1, proc._bufferTime)
+
+        # One in 5 events is 4 seconds late
+        late = buildEvent(time=16)
+        proc.consume(late)
+        lateAction.notify.assert_called_once_with(late)
+        for t in range(20, 40):
+            proc.consume(buildEvent(time=t))
+            if t % 4 == 0:
+                proc.consume(buildEvent(time=t - 4))
+        self.assertEqual(4, proc._bufferTime)
+
+        # No more late events are sent to the side output once adapted
+        lateAction.notify.reset_mock()
+        for t in range(40, 60):
+            proc.consume(buildEvent(time=t))
+            if t % 4 == 0:
+                proc.consume(buildEvent(time=t - 4))
+        lateAction.notify.assert_not_called()
+
+        # Bounded by max buffer time
+        proc.consume(buildEvent(time=1000))
+        for _ in range(10):
+            proc.consume(buildEvent(time=900))
+        proc.consume(buildEvent(time=1001))
+        self.assertEqual(5, proc._bufferTime)
+
+    def testTickWhileIdle(self):
+        """ Alerts recover as wall-clock time passes without any events """
+
+        action = MagicMock()
+        proc = AnalyticsProcessor(
+            action,
+            mostCommonStatsInterval=-1,
+            highTrafficInterval=10,
+            highTrafficThreshold=1,
+        )
+        proc.tick()
+        action.notify.assert_not_called()
+
+        with patch("time.monotonic", return_value=1000.0):
+            for t in range(100, 110):
+                for _ in range(3):
+                    proc.consume(buildEvent(time=t))
+        self.assertIn("High traffic", action.notify.call_args[0][0].message)
+        self.assertEqual(9, len(proc._buffer), "Latest events still buffered")
+
+        # Traffic stopped, time moves forward on ticks only
+        with patch("time.monotonic", return_value=1005.0):
+            proc.tick()
+        self.assertEqual([], proc._buffer, "Buffer flushed up to processing time")
+        self.assertEqual(1, action.notify.call_count)
+
+        with patch("time.monotonic", return_value=1020.0):
+            proc.tick()
+            proc.tick()
+        self.assertEqual(2, action.notify.call_count, "Recovery alerted only once")
+        self.assertIn("back to normal", action.notify.call_args[0][0].message)
+        self.assertEqual(129, action.notify.call_args[0][0].time)
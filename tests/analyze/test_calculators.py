@@ -3,7 +3,8 @@ from .utils import buildEvent
 from datetime import datetime
 from collections import deque
 from unittest.mock import MagicMock
-from LogsMonitor2000.event import Event
+from LogsMonitor2000.event import Event, WebLogSummary
+from LogsMonitor2000.parse import HTTPLogParser
 from LogsMonitor2000.analyze import AnalyticsProcessor
 
 
@@ -309,13 +310,14 @@ class TestCalculatorsAlerting(unittest.TestCase):
             "Exactly this many processed and within sliding window",
         )
 
-        # Recent event causes 'common stats' alert
+        # Recent event causes 'common stats' alert. Sources are tied, NSA having been
+        # seen first since e0 left the window
         alert1 = Event(
             priority=Event.Priority.MEDIUM,
             message="Most common section: "
             + f"{e4.section} (3 requests)"
             + ", source: "
-            + f"{e4.source} (2 requests)",
+            + f"{e2.source} (2 requests)",
             time=e4.time,
         )
         action.notify.assert_called_with(alert1)
@@ -407,3 +409,85 @@ class TestCalculatorsAlerting(unittest.TestCase):
             action.notify.call_count,
             "All processed except e5 buffered, all notified up to and excluding e4.",
         )
+
+    def testMostCommonStatsBoundedKeys(self):
+        "Keys out of window are dropped, so counts stay bounded by keys in window"
+        for summarize in (False, True):
+            proc = AnalyticsProcessor(
+                MagicMock(),
+                mostCommonStatsInterval=10,
+                highTrafficInterval=-1,
+                summarize=summarize,
+            )
+            calc = proc._statsCalculators[0]
+            for time in range(100):
+                e = buildEvent(time=time)
+                e.source = f"source{time}"
+                e.section = f"/section{time}"
+                proc.consume(e)
+                self.assertLessEqual(len(calc._countSources), 11, summarize)
+                self.assertLessEqual(len(calc._countSections), 11, summarize)
+            self.assertIn("source90", calc._countSources)
+            self.assertNotIn("source0", calc._countSources)
+
+
+class TestCalculatorsSummarized(unittest.TestCase):
+    "Calculators give the same results on per-second summaries as on raw events"
+
+    def testSameAlerts(self):
+        alerts = []
+        for summarize in (False, True):
+            action = MagicMock()
+            proc = AnalyticsProcessor(
+                action,
+                mostCommonStatsInterval=10,
+                highTrafficInterval=20,
+                highTrafficThreshold=8,
+                rateHorizons={10: 12},
+                errorRateInterval=30,
+                errorRateMinRequests=50,
+                bandwidthStatsInterval=15,
+                summarize=summarize,
+            )
+            HTTPLogParser(proc, "tests/sample_csv.txt").parse()
+            alerts.append(action.notify.call_args_list)
+
+        self.assertGreater(len(alerts[0]), 10)
+        self.assertEqual(alerts[0], alerts[1])
+
+    def testWindowHoldsSummaries(self):
+        proc = AnalyticsProcessor(
+            MagicMock(),
+            mostCommonStatsInterval=10,
+            highTrafficInterval=-1,
+            summarize=True,
+        )
+        e0, e1, e2 = buildEvent(time=0), buildEvent(time=0), buildEvent(time=1)
+        e1.source = "NSA"
+        for e in (e0, e1, e2):
+            proc.consume(e)
+        proc.consume(None)
+
+        self.assertEqual(2, len(proc._events))
+        summary = proc._events[0][0]
+        self.assertIsInstance(summary, WebLogSummary)
+        self.assertEqual(2, summary.count)
+        self.assertEqual({"GCHQ": 1, "NSA": 1}, summary.sources)
+        self.assertEqual({"/api": 2}, summary.sections)
+
+    def testSummarySketches(self):
+        "Sketches are only built into summaries when a calculator uses them"
+        for options, sizes, sectionSources in (
+            ({}, 0, 0),
+            ({"bandwidthStatsInterval": 10}, 2, 0),
+            ({"distinctSourcesInterval": 10}, 0, 1),
+        ):
+            proc = AnalyticsProcessor(MagicMock(), summarize=True, **options)
+            for e in (buildEvent(time=0), buildEvent(time=0), buildEvent(time=1)):
+                proc.consume(e)
+            proc.consume(None)
+
+            summary = proc._events[0][0]
+            self.assertEqual(2, summary.count)
+            self.assertEqual(sizes, summary.sizes.count, options)
+            self.assertEqual(sectionSources, len(summary.sectionSources), options)
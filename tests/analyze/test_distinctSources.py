@@ -0,0 +1,61 @@
+import unittest
+from .utils import buildEvent
+from unittest.mock import MagicMock
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.analyze.distinctSourcesCalculator import DistinctSourcesCalculator
+
+
+def buildSourceEvent(time: int, section: str, source: str):
+    e = buildEvent(time)
+    e.section = section
+    e.source = source
+    return e
+
+
+class TestDistinctSourcesCalculator(unittest.TestCase):
+    "Test distinct sources estimates over the sliding window"
+
+    def testSlidingWindow(self):
+        "Window estimates match exact counts within error, as seconds come and go"
+        calc = DistinctSourcesCalculator(MagicMock(), None, windowSizeInSeconds=10)
+        groups = [
+            [buildSourceEvent(t, f"/s{t % 3}", f"10.0.{t}.{i}") for i in range(100)]
+            for t in range(50)
+        ]
+        for t, group in enumerate(groups):
+            calc.count(group)
+            if t >= 10:
+                calc.discount(groups[t - 10])
+
+            window = groups[max(0, t - 9) : t + 1]
+            for section, sketch in calc.distinctSources().items():
+                exact = len(
+                    {e.source for g in window for e in g if e.section == section}
+                )
+                self.assertAlmostEqual(exact, sketch.count(), delta=exact * 0.1)
+        self.assertEqual(["/s0", "/s1", "/s2"], sorted(calc.distinctSources()))
+
+    def testSummarized(self):
+        "Same stats from raw events and summaries"
+        messages = []
+        for summarize in (False, True):
+            action = MagicMock()
+            proc = AnalyticsProcessor(
+                action,
+                mostCommonStatsInterval=-1,
+                highTrafficInterval=-1,
+                distinctSourcesInterval=5,
+                summarize=summarize,
+            )
+            for t in range(0, 30):
+                for i in range(t):
+                    proc.consume(buildSourceEvent(t, f"/s{i % 2}", f"10.0.0.{i}"))
+            proc.consume(None)
+            messages.append([c[0][0].message for c in action.notify.call_args_list])
+
+        self.assertEqual(messages[0], messages[1])
+        # Last at 26, sources 10.0.0.0 to 25 over seconds 21 to 26, even ones in /s0
+        self.assertEqual(5, len(messages[0]))
+        self.assertEqual(
+            "Distinct sources: 26, top sections: /s1 (13), /s0 (13)", messages[0][-1]
+        )
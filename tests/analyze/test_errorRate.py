@@ -0,0 +1,96 @@
+import unittest
+from .utils import buildEvent
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from LogsMonitor2000.event import Event
+from LogsMonitor2000.analyze import AnalyticsProcessor
+
+
+def buildStatusEvent(time: int, status: str):
+    e = buildEvent(time)
+    e.status = status
+    return e
+
+
+class TestErrorRateCalculator(unittest.TestCase):
+    "Test error ratio alerts over the sliding window"
+
+    def testAlerts(self):
+        action = MagicMock()
+        proc = AnalyticsProcessor(
+            action,
+            mostCommonStatsInterval=-1,
+            highTrafficInterval=-1,
+            errorRateInterval=10,
+            serverErrorThreshold=0.2,
+            clientErrorThreshold=0.5,
+            errorRateMinRequests=4,
+        )
+
+        # All errors, but too few requests to alert yet
+        proc.consume(buildStatusEvent(time=0, status="500"))
+        proc.consume(buildStatusEvent(time=0, status="503"))
+        proc.consume(buildStatusEvent(time=1, status="404"))
+        proc.consume(None)
+        self.assertEqual(0, action.notify.call_count)
+        self.assertAlmostEqual(2 / 3, proc._statsCalculators[0].ratio(5))
+
+        # Minimum volume reached
+        proc.consume(buildStatusEvent(time=2, status="200"))
+        proc.consume(None)
+        self.assertEqual(1, action.notify.call_count)
+        action.notify.assert_called_with(
+            Event(
+                time=2,
+                priority=Event.Priority.HIGH,
+                message="High 5xx error rate generated an alert - "
+                f"50.00% of 4 requests, triggered at {datetime.fromtimestamp(2)}",
+            )
+        )
+
+        # Errors fall out of the window
+        for _ in range(4):
+            proc.consume(buildStatusEvent(time=11, status="200"))
+        proc.consume(None)
+        self.assertEqual(2, action.notify.call_count)
+        action.notify.assert_called_with(
+            Event(
+                time=11,
+                priority=Event.Priority.HIGH,
+                message="5xx error rate is now back to normal "
+                f"(0.00%) as of {datetime.fromtimestamp(11)}",
+            )
+        )
+
+        # Client errors have their own threshold
+        for _ in range(6):
+            proc.consume(buildStatusEvent(time=12, status="403"))
+        proc.consume(None)
+        self.assertEqual(3, action.notify.call_count)
+        self.assertIn("High 4xx error rate", action.notify.call_args.args[0].message)
+
+    def testRecoveryWithoutTraffic(self):
+        "A raised alert clears once traffic stops, despite too few requests"
+        action = MagicMock()
+        proc = AnalyticsProcessor(
+            action,
+            mostCommonStatsInterval=-1,
+            highTrafficInterval=-1,
+            errorRateInterval=10,
+            errorRateMinRequests=4,
+        )
+        with patch("time.monotonic", return_value=1000.0):
+            for _ in range(4):
+                proc.consume(buildStatusEvent(time=0, status="500"))
+            proc.consume(None)
+        self.assertEqual(1, action.notify.call_count)
+
+        # No more events, as time passes the errors fall out of the window
+        with patch("time.monotonic", return_value=1020.0):
+            proc.tick()
+        self.assertEqual(0, proc._statsCalculators[0]._totalCount)
+        self.assertEqual(2, action.notify.call_count)
+        self.assertIn(
+            "5xx error rate is now back to normal (0.00%)",
+            action.notify.call_args.args[0].message,
+        )
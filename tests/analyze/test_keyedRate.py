@@ -0,0 +1,61 @@
+import unittest
+from .utils import buildEvent
+from unittest.mock import MagicMock
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.analyze.keyedRateCalculator import KeyedRateCalculator
+
+
+def buildSourceEvent(time: int, source: str):
+    e = buildEvent(time)
+    e.source = source
+    return e
+
+
+class TestKeyedRateCalculator(unittest.TestCase):
+    "Test per-key rates from the timing wheel"
+
+    def testRates(self):
+        calc = KeyedRateCalculator(MagicMock(), None, "source", {"*": 1}, 10)
+        for t in range(0, 20):
+            calc.count([buildSourceEvent(t, "a")] * 3 + [buildSourceEvent(t, "b")])
+        self.assertEqual(3, calc.rate("a"))
+        self.assertEqual(1, calc.rate("b"))
+        self.assertEqual(0, calc.rate("c"))
+
+        # Traffic from b stops, its seconds drain out of the wheel
+        for t in range(20, 25):
+            calc.count([buildSourceEvent(t, "a")])
+        self.assertEqual(0.5, calc.rate("b"))
+        self.assertEqual(2, calc.rate("a"))
+
+        # Long idle time, everything expires
+        calc.triggerAlert(1000)
+        self.assertEqual({}, calc._totals)
+
+        with self.assertRaises(ValueError):
+            KeyedRateCalculator(MagicMock(), None, "status", {"*": 1})
+
+    def testAlerts(self):
+        action = MagicMock()
+        proc = AnalyticsProcessor(
+            action,
+            mostCommonStatsInterval=-1,
+            highTrafficInterval=-1,
+            keyedRateInterval=2,
+            sourceRateThresholds={"*": 1, "trusted": 5},
+            bufferTime=0,
+        )
+        for t in range(0, 4):
+            for source in ["trusted", "trusted", "bot", "bot", "bot", "user"]:
+                proc.consume(buildSourceEvent(t, source))
+        # Bot stops
+        for t in range(4, 7):
+            proc.consume(buildSourceEvent(t, "user"))
+        proc.consume(None)
+
+        messages = [c[0][0].message for c in action.notify.call_args_list]
+        self.assertEqual(2, len(messages))
+        self.assertTrue(messages[0].startswith("High traffic for source bot"))
+        self.assertIn("hits 1.50", messages[0])
+        self.assertTrue(messages[1].startswith("Traffic for source bot is now back"))
+        self.assertEqual(5, action.notify.call_args[0][0].time)
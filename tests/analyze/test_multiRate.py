@@ -0,0 +1,85 @@
+import unittest
+from .utils import buildEvent
+from datetime import datetime
+from unittest.mock import MagicMock
+from LogsMonitor2000.event import Event
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.analyze.multiRateCalculator import MultiRateCalculator, RateRing
+
+
+class TestRateRing(unittest.TestCase):
+    "Test ring buffer counts as time moves forward"
+
+    def testSum(self):
+        ring = RateRing(resolution=60, size=60)
+        ring.add(0, 60)
+        ring.add(90, 30)
+        self.assertEqual(90, ring.sum(0, 90))
+        # Half of first minute's bucket overlaps
+        self.assertEqual(60, ring.sum(30, 90))
+
+        # An hour later the first minute has expired
+        ring.add(3600 + 59, 1)
+        self.assertEqual(31, ring.sum(60, 3600 + 59))
+
+        # Over a whole ring span of idle time, everything expires
+        ring.advance(3 * 3600)
+        self.assertEqual(0, ring.sum(3600 * 2, 3 * 3600))
+
+
+class TestMultiRateCalculator(unittest.TestCase):
+    "Test alerting over multiple horizons from one calculator"
+
+    def testRates(self):
+        calc = MultiRateCalculator(MagicMock(), None, {10: 1, 600: 1})
+        for t in range(0, 600):
+            calc.count([buildEvent(time=t)] * 2)
+
+        self.assertEqual(2, calc.rate(10, 599))
+        self.assertEqual(2, calc.rate(600, 599))
+        self.assertAlmostEqual(2, calc.decayedRate(10, 599), places=1)
+
+        # Traffic stops, short horizon drains first
+        self.assertEqual(0, calc.rate(10, 609))
+        self.assertAlmostEqual(2 * 590 / 600, calc.rate(600, 609))
+
+        with self.assertRaises(ValueError):
+            MultiRateCalculator(MagicMock(), None, {24 * 3600 + 1: 1})
+
+    def testAlerts(self):
+        action = MagicMock()
+        proc = AnalyticsProcessor(
+            action,
+            mostCommonStatsInterval=-1,
+            highTrafficInterval=-1,
+            rateHorizons={2: 2, 60: 1},
+        )
+
+        # A burst goes over the short horizon threshold only
+        for t in range(0, 4):
+            proc.consume(buildEvent(time=t))
+        for _ in range(5):
+            proc.consume(buildEvent(time=4))
+        proc.consume(None)
+        self.assertEqual(1, action.notify.call_count)
+        action.notify.assert_called_with(
+            Event(
+                time=4,
+                priority=Event.Priority.HIGH,
+                message="High traffic over 2s generated an alert - "
+                f"hits 3.00 (decayed 2.49), triggered at {datetime.fromtimestamp(4)}",
+            )
+        )
+
+        # Burst is over, short horizon is back to normal
+        proc.consume(buildEvent(time=10))
+        proc.consume(None)
+        self.assertEqual(2, action.notify.call_count)
+        action.notify.assert_called_with(
+            Event(
+                time=10,
+                priority=Event.Priority.HIGH,
+                message="Traffic over 2s is now back to normal "
+                f"as of {datetime.fromtimestamp(10)}",
+            )
+        )
@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor, ReplayProcessor
+
+
+class TestReplay(unittest.TestCase):
+    "Test replaying a log at a given pace"
+
+    def testSameAlerts(self):
+        "Replay generates the same alerts as a regular run, and measures it"
+        expected = MagicMock()
+        HTTPLogParser(AnalyticsProcessor(expected), "tests/sample_csv.txt").parse()
+
+        action = MagicMock()
+        replay = ReplayProcessor(action)
+        HTTPLogParser(replay, "tests/sample_csv.txt").parse()
+
+        self.assertEqual(expected.notify.call_args_list, action.notify.call_args_list)
+        self.assertEqual(4830, replay.eventsCount)
+        self.assertEqual(action.notify.call_count, replay.lags.count)
+        self.assertGreater(replay.eventsPerSecond(), 0)
+        self.assertGreater(replay.maxBufferDepth, 0)
+        self.assertLessEqual(replay.maxWindowDepth, 121)
+
+    @patch("time.sleep")
+    def testPace(self, sleep):
+        "Events are consumed following their timestamps, sped up"
+        action = MagicMock()
+        replay = ReplayProcessor(action, speed=100)
+        HTTPLogParser(replay, "tests/sample_csv.txt").parse()
+
+        # Log spans 480 seconds, sleeping is mocked so delays add up
+        self.assertGreater(sleep.call_count, 0)
+        self.assertAlmostEqual(
+            4.8, max(c[0][0] for c in sleep.call_args_list), delta=0.5
+        )
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+import itertools
+import multiprocessing
+from unittest.mock import patch
+from multiprocessing import shared_memory
+from .utils import buildEvent
+from LogsMonitor2000.event import Event
+from LogsMonitor2000.action import Action
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor, RingBufferProcessor
+from LogsMonitor2000.analyze.ringBufferProcessor import _HEADER, _runAnalyzer
+
+
+class MessagesWriter(Action):
+    """ Write alert messages to a file, as the analyzer process can't share a mock """
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def notify(self, e: Event) -> None:
+        with open(self._path, mode="a") as fd:
+            fd.write(f"{e.time} {e.message}\n")
+
+
+class TestRingBufferProcessor(unittest.TestCase):
+    "Test analysis in a separate process through the shared memory ring buffer"
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def messages(self, processor, path):
+        HTTPLogParser(
+            processor, "tests/sample_csv.txt", fields=processor.requiredFields()
+        ).parse()
+        processor.close()
+        with open(path) as fd:
+            return fd.readlines()
+
+    def testSameAlerts(self):
+        "Same alerts as analyzed in process, including when the ring buffer wraps around"
+        options = dict(bandwidthStatsInterval=10, errorRateInterval=30)
+        path = os.path.join(self.tmpDir.name, "expected.txt")
+        expected = self.messages(
+            AnalyticsProcessor(MessagesWriter(path), **options), path
+        )
+        self.assertGreater(len(expected), 50)
+
+        for capacity in (8, 1 << 16):
+            path = os.path.join(self.tmpDir.name, f"{capacity}.txt")
+            processor = RingBufferProcessor(
+                MessagesWriter(path), capacity=capacity, **options
+            )
+            self.assertEqual(
+                frozenset({"section", "source", "status", "size"}),
+                processor.requiredFields(),
+            )
+            self.assertEqual(expected, self.messages(processor, path))
+
+    def testLongStrings(self):
+        "New strings of a batch more than the pipe holds don't block the parser"
+        messages = []
+        for processorClass in (AnalyticsProcessor, RingBufferProcessor):
+            path = os.path.join(self.tmpDir.name, f"{processorClass.__name__}.txt")
+            processor = processorClass(MessagesWriter(path), highTrafficInterval=-1)
+            for i in range(1000):
+                e = buildEvent(time=i // 500)
+                e.section = f"/{i}" + "x" * 1024
+                processor.consume(e)
+            processor.consume(buildEvent(time=20))
+            processor.consume(None)
+            processor.close()
+            with open(path) as fd:
+                messages.append(fd.readlines())
+        self.assertEqual(1, len(messages[0]))
+        self.assertEqual(messages[0], messages[1])
+
+    def testInvalidOptions(self):
+        "Analyzer errors on start are raised by the parser process"
+        with self.assertRaises(ValueError):
+            RingBufferProcessor(
+                MessagesWriter(os.devnull), summarize=True, mostCommonShards=2
+            )
+
+    def testParserStopped(self):
+        "Analyzer waiting for records exits once the parser process has stopped"
+        shm = shared_memory.SharedMemory(create=True, size=_HEADER + 8 * 64)
+        conn, analyzerConn = multiprocessing.Pipe()
+        # Adopted by init after a few polls of the empty buffer
+        parents = itertools.chain([os.getppid()] * 3, itertools.repeat(1))
+        try:
+            with patch(
+                "LogsMonitor2000.analyze.ringBufferProcessor.os.getppid",
+                side_effect=parents,
+            ):
+                _runAnalyzer(shm.name, 8, analyzerConn, MessagesWriter(os.devnull), {})
+            self.assertEqual(frozenset({"section", "source"}), conn.recv())
+        finally:
+            conn.close()
+            analyzerConn.close()
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest.mock import MagicMock, patch
+from .utils import buildEvent
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.analyze.rollupCalculator import RollupCalculator, connectRollups
+from LogsMonitor2000.rollup import queryRollups
+
+
+class TestRollups(unittest.TestCase):
+    "Test per-second and per-minute counts persisted to SQLite"
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpDir.name, "rollups.db")
+
+        parser = MagicMock()
+        HTTPLogParser(parser, "tests/sample_csv.txt").parse()
+        self.events = [c[0][0] for c in parser.consume.call_args_list if c[0][0]]
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def monitor(self, **kwargs):
+        processor = AnalyticsProcessor(MagicMock(), rollupPath=self.path, **kwargs)
+        HTTPLogParser(processor, "tests/sample_csv.txt").parse()
+        processor.close()
+
+    def query(self, *args, **kwargs):
+        db = connectRollups(self.path)
+        try:
+            return queryRollups(db, 0, 2 ** 63 - 1, *args, **kwargs)
+        finally:
+            db.close()
+
+    def testCounts(self):
+        "Per-second and per-minute counts match the log's, raw or summarised"
+        for summarize in (False, True):
+            self.monitor(summarize=summarize)
+
+            perSecond = Counter({t: n for t, _, n in self.query(resolution=1)})
+            self.assertEqual(Counter(e.time for e in self.events), perSecond)
+            perMinute = Counter({t: n for t, _, n in self.query(resolution=60)})
+            self.assertEqual(
+                Counter(e.time - e.time % 60 for e in self.events), perMinute
+            )
+
+            for kind in ("section", "source", "status"):
+                counts = Counter()
+                for t, key, n in self.query(kind, resolution=60):
+                    counts[t, key] += n
+                expected = Counter(
+                    (e.time - e.time % 60, getattr(e, kind)) for e in self.events
+                )
+                self.assertEqual(expected, counts, kind)
+            os.unlink(self.path)
+
+    def testRepeatedRuns(self):
+        "Counts of the same seconds add up across runs"
+        self.monitor()
+        once = self.query("section", resolution=60)
+        self.monitor()
+        self.assertEqual([(t, k, 2 * n) for t, k, n in once], self.query("section"))
+
+    def testTop(self):
+        "Only the most requested keys of each time are kept"
+        self.monitor()
+        rows = self.query("section", top=1)
+        self.assertEqual(len({t for t, _, _ in rows}), len(rows))
+        self.assertEqual((1549573860, "/api", 360), rows[1])
+        self.assertEqual((1549574340, "/report", 1), rows[-1])
+
+    def testMissingKeys(self):
+        "Requests missing a key are counted under '-', along with the others"
+        processor = AnalyticsProcessor(MagicMock(), rollupPath=self.path)
+        e0, e1, e2 = buildEvent(time=60), buildEvent(time=60), buildEvent(time=61)
+        e0.status = 200
+        e1.section = None
+        for e in (e0, e1, e2, None):
+            processor.consume(e)
+        processor.close()
+
+        self.assertEqual([(60, "", 3)], self.query(resolution=60))
+        self.assertEqual(
+            [(60, "/api", 2), (60, "-", 1)], self.query("section", resolution=60)
+        )
+        self.assertEqual(
+            [(60, "-", 2), (60, "200", 1)], self.query("status", resolution=60)
+        )
+
+    def testDatabaseError(self):
+        "Databases that can't be opened are told on start"
+        path = os.path.join(self.tmpDir.name, "missing", "rollups.db")
+        with self.assertRaisesRegex(ValueError, "Can't open rollups database"):
+            AnalyticsProcessor(MagicMock(), rollupPath=path)
+
+    def testWriterStopped(self):
+        "Seconds are dropped once the writer stopped, rather than waiting for it"
+        with patch(
+            "LogsMonitor2000.analyze.rollupCalculator._MAX_QUEUED_SECONDS", 5
+        ), patch.object(
+            RollupCalculator, "_writeBatch", side_effect=RuntimeError("Disk failed")
+        ):
+            processor = AnalyticsProcessor(MagicMock(), rollupPath=self.path)
+            with self.assertLogs(level="ERROR") as logs:
+                for time in range(20):
+                    processor.consume(buildEvent(time=time))
+                processor.close()
+        self.assertEqual(2, len(logs.records))
+        self.assertIn("Rollups writer failed", logs.output[0])
+        self.assertIn("no longer writing rollups", logs.output[1])
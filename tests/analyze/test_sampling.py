@@ -0,0 +1,77 @@
+import unittest
+from .utils import buildEvent
+from unittest.mock import MagicMock
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor
+
+
+class TestSampling(unittest.TestCase):
+    "Test events sampling when over the memory budget"
+
+    def testSamplingRate(self):
+        "Rate halves as soon as traffic spikes over budget, and recovers with load"
+        proc = AnalyticsProcessor(
+            MagicMock(),
+            mostCommonStatsInterval=-1,
+            highTrafficInterval=9,
+            bufferTime=0,
+            maxMemory=500 * 100,
+        )
+        # Budget of 100 events over 10 seconds
+        for t in range(0, 10):
+            proc.consume(buildEvent(time=t))
+        self.assertEqual(1, proc.samplingRate)
+
+        for t in range(10, 20):
+            for _ in range(40):
+                proc.consume(buildEvent(time=t))
+        self.assertEqual(1 / 4, proc.samplingRate)
+
+        for t in range(20, 100):
+            proc.consume(buildEvent(time=t))
+        self.assertEqual(1, proc.samplingRate)
+
+    def testSameSourceAndSecond(self):
+        "Requests of a source in the same second, with the same fields, are sampled each"
+        proc = AnalyticsProcessor(
+            MagicMock(),
+            mostCommonStatsInterval=9,
+            highTrafficInterval=-1,
+            bufferTime=0,
+            maxMemory=500 * 100,
+        )
+        for t in range(10):
+            for source in "abc":
+                for _ in range(300):
+                    e = buildEvent(time=t)
+                    e.source = source
+                    proc.consume(e)
+        proc.consume(None)
+        self.assertLessEqual(proc.samplingRate, 1 / 16)
+
+        counts = proc._statsCalculators[0]._countSources
+        self.assertEqual({"a", "b", "c"}, set(counts))
+        for source in "abc":
+            self.assertAlmostEqual(3000, counts[source], delta=300)
+
+    def testSampledAlerts(self):
+        "Alerts are about the same, with scaled counts, and annotated"
+        action = MagicMock()
+        proc = AnalyticsProcessor(action, maxMemory=500 * 500)
+        HTTPLogParser(proc, "tests/sample_csv.txt").parse()
+
+        messages = [c[0][0].message for c in action.notify.call_args_list]
+        # Unsampled: /api (59 requests), source: 10.0.0.5 (22 requests)
+        self.assertEqual(
+            "Most common section: /api (65 requests), source: 10.0.0.1 (35 requests) "
+            "(sampled at 50.00%)",
+            messages[0],
+        )
+        # Not sampled anymore after the spike
+        self.assertTrue(messages[-1].endswith("(33 requests)"))
+
+        # Deterministic sampling
+        again = MagicMock()
+        proc = AnalyticsProcessor(again, maxMemory=500 * 500)
+        HTTPLogParser(proc, "tests/sample_csv.txt").parse()
+        self.assertEqual(action.notify.call_args_list, again.notify.call_args_list)
@@ -0,0 +1,100 @@
+import random
+import unittest
+from collections import Counter
+from unittest.mock import MagicMock
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.analyze.sectionTreeCalculator import SectionTrie
+
+
+class TestSectionTrie(unittest.TestCase):
+    "Test counts per path prefix, and children order"
+
+    def testSegments(self):
+        trie = SectionTrie(depth=2)
+        self.assertEqual(
+            ["api", "user"], trie.segments("GET /api/user/profile HTTP/1.0")
+        )
+        self.assertEqual(["api"], trie.segments("GET /api/ HTTP/1.0"))
+        self.assertEqual([""], trie.segments("GET / HTTP/1.0"))
+        self.assertIsNone(trie.segments("-"))
+        self.assertIsNone(trie.segments(None))
+
+    def testCountsAndOrder(self):
+        "Counts and top children match a Counter's, as paths come and go"
+        rng = random.Random(0)
+        paths = [[a, b, c] for a in "abc" for b in "defg" for c in "hi"]
+        trie = SectionTrie(depth=3)
+        counts: Counter = Counter()
+        window: list = []
+        for _ in range(3000):
+            if window and rng.random() < 0.45:
+                path, n = window.pop(rng.randrange(len(window)))
+                trie.add(path, -n)
+                n = -n
+            else:
+                path, n = rng.choice(paths), rng.randint(1, 3)
+                trie.add(path, n)
+                window.append((path, n))
+            for depth in range(1, 4):
+                counts["/" + "/".join(path[:depth])] += n
+
+            for prefix in ["", "/a", "/b/e", "/c/g"]:
+                children = Counter(
+                    {
+                        p: n
+                        for p, n in counts.items()
+                        if n > 0 and p.rsplit("/", 1)[0] == prefix
+                    }
+                )
+                top = trie.top(prefix, k=len(children) + 1)
+                self.assertEqual(children, Counter(dict(top)))
+                self.assertEqual(
+                    sorted(children.values(), reverse=True), [n for _, n in top]
+                )
+                node = trie.find(prefix) if prefix else trie.root
+                if node is not None:
+                    self.assertEqual(
+                        list(range(len(node.order))), [c.index for c in node.order]
+                    )
+                    self.assertEqual([-c.count for c in node.order], node.negatedCounts)
+        self.assertEqual(sum(n for _, n in window), trie.root.count)
+
+
+class TestSectionTreeCalculator(unittest.TestCase):
+    "Test section tree stats of a log"
+
+    def testStats(self):
+        action = MagicMock()
+        proc = AnalyticsProcessor(
+            action,
+            mostCommonStatsInterval=-1,
+            highTrafficInterval=-1,
+            sectionTreeInterval=60,
+        )
+        self.assertEqual(frozenset({"request"}), proc.requiredFields())
+        HTTPLogParser(
+            proc, "tests/sample_csv.txt", fields=proc.requiredFields()
+        ).parse()
+
+        messages = [c[0][0].message for c in action.notify.call_args_list]
+        self.assertEqual(
+            "Top sections: /api (905: /api/user (604), /api/help (301)), /report (183)",
+            messages[1],
+        )
+
+    def testDepthOne(self):
+        "Sections at depth 1 are the same as other calculators'"
+        parser = MagicMock()
+        HTTPLogParser(parser, "tests/sample_csv.txt").parse()
+        events = [c[0][0] for c in parser.consume.call_args_list if c[0][0]]
+
+        trie = SectionTrie(depth=1)
+        for e in events:
+            trie.add(trie.segments(e.request), 1)
+        self.assertEqual(
+            Counter(e.section for e in events).most_common(), trie.top(k=10)
+        )
+
+        with self.assertRaises(ValueError):
+            AnalyticsProcessor(MagicMock(), summarize=True, sectionTreeInterval=10)
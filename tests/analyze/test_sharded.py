@@ -0,0 +1,111 @@
+import random
+import unittest
+from .utils import buildEvent
+from unittest.mock import MagicMock
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor
+
+
+class TestShardedMostCommon(unittest.TestCase):
+    "Test most common stats counted across shard processes"
+
+    def testSameAsSingleProcess(self):
+        expected = MagicMock()
+        HTTPLogParser(AnalyticsProcessor(expected), "tests/sample_csv.txt").parse()
+
+        action = MagicMock()
+        proc = AnalyticsProcessor(action, mostCommonShards=3)
+        try:
+            HTTPLogParser(proc, "tests/sample_csv.txt").parse()
+        finally:
+            proc.close()
+        self.assertEqual(expected.notify.call_args_list, action.notify.call_args_list)
+
+    def testTies(self):
+        "Equal counts are broken by first-seen order since in window, across shards"
+        for shards in (1, 2, 3, 5):
+            action = MagicMock()
+            proc = AnalyticsProcessor(
+                action,
+                mostCommonStatsInterval=2,
+                highTrafficInterval=-1,
+                bufferTime=0,
+                mostCommonShards=shards,
+            )
+            try:
+                for t, section in enumerate(["/d", "/c", "/b", "/a", "/c", "/b"]):
+                    e = buildEvent(time=t)
+                    e.section = section
+                    proc.consume(e)
+            finally:
+                proc.close()
+            messages = [c[0][0].message for c in action.notify.call_args_list]
+            self.assertEqual(
+                [
+                    "Most common section: /d (1 requests), source: GCHQ (3 requests)",
+                    "Most common section: /b (1 requests), source: GCHQ (3 requests)",
+                ],
+                messages,
+                f"{shards} shards",
+            )
+
+    def testMergedTopAndTotal(self):
+        "Top sections and sources, and the number of requests, merged across shards"
+        events = []
+        rng = random.Random(0)
+        for t in range(30):
+            for _ in range(200):
+                e = buildEvent(time=t)
+                e.section = f"/{rng.randrange(40)}"
+                e.source = f"10.0.0.{rng.randrange(300)}"
+                events.append(e)
+
+        snapshots = []
+        for shards in (1, 4):
+            proc = AnalyticsProcessor(
+                MagicMock(), highTrafficInterval=10, mostCommonShards=shards
+            )
+            try:
+                for e in events:
+                    proc.consume(e)
+                snapshots.append(proc._statsCalculators[0].snapshot(29)["top"])
+                if shards > 1:
+                    self.assertEqual(
+                        proc._statsCalculators[1]._totalCount,
+                        proc._statsCalculators[0].requestsCount,
+                    )
+            finally:
+                proc.close()
+        self.assertEqual(10, len(snapshots[0]["sources"]))
+        self.assertEqual(snapshots[0], snapshots[1])
+
+    def testManyKeys(self):
+        "Same stats and number of requests with many distinct keys split across shards"
+        events = []
+        rng = random.Random(0)
+        for t in range(60000):
+            e = buildEvent(time=t // 1000)
+            e.section = f"/{rng.randrange(1000)}"
+            e.source = f"10.0.{rng.randrange(256)}.{rng.randrange(256)}"
+            events.append(e)
+
+        messages = []
+        snapshots = []
+        for shards in (1, 4):
+            action = MagicMock()
+            proc = AnalyticsProcessor(
+                action, highTrafficInterval=-1, mostCommonShards=shards
+            )
+            try:
+                for e in events:
+                    proc.consume(e)
+                proc.consume(None)
+                snapshots.append(proc._statsCalculators[0].snapshot(60))
+            finally:
+                proc.close()
+            messages.append(action.notify.call_args_list)
+        self.assertEqual(5, len(messages[0]))
+        self.assertEqual(messages[0], messages[1])
+        self.assertEqual(snapshots[0]["top"], snapshots[1]["top"])
+        # Seconds 49 to 59 in window, of 1000 requests each
+        self.assertEqual(11000, snapshots[1]["requests"])
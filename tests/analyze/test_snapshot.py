@@ -0,0 +1,59 @@
+import json
+import unittest
+import urllib.error
+import urllib.request
+from .utils import buildEvent
+from unittest.mock import MagicMock
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor
+
+
+class TestSnapshotServer(unittest.TestCase):
+    "Test live stats served over HTTP"
+
+    def setUp(self):
+        self.processor = AnalyticsProcessor(
+            MagicMock(), httpPort=0, errorRateInterval=30, rateHorizons={10: 5}
+        )
+        self.url = f"http://127.0.0.1:{self.processor._snapshotServer.port}"
+
+    def tearDown(self):
+        self.processor.close()
+
+    def get(self, path="/"):
+        with urllib.request.urlopen(self.url + path, timeout=5) as response:
+            return json.load(response)
+
+    def testSnapshot(self):
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.get()
+        self.assertEqual(503, e.exception.code)
+
+        HTTPLogParser(self.processor, "tests/sample_csv.txt").parse()
+        snapshot = self.get()
+        self.assertEqual(1549574340, snapshot["time"])
+        self.assertEqual(0, snapshot["bufferDepth"])
+        self.assertEqual(
+            [["/api", 10], ["/report", 10]], snapshot["top"]["sections"][:2]
+        )
+        self.assertEqual(["10.0.0.1", 10], snapshot["top"]["sources"][0])
+        self.assertEqual(
+            {"rate": 2.05, "threshold": 10, "isAlert": False}, snapshot["highTraffic"]
+        )
+        self.assertEqual({"10"}, set(snapshot["rateHorizons"]))
+        self.assertEqual({"5xx", "4xx"}, set(snapshot["errorRates"]))
+        self.assertEqual(snapshot, self.get("/stats"))
+
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            self.get("/other")
+        self.assertEqual(404, e.exception.code)
+
+    def testBufferDepth(self):
+        "Snapshots are published as seconds are flushed out of the buffer"
+        for t in range(10):
+            e = buildEvent(t)
+            e.status = "200"
+            self.processor.consume(e)
+        snapshot = self.get()
+        self.assertEqual(6, snapshot["time"])
+        self.assertEqual(3, snapshot["bufferDepth"])
@@ -10,7 +10,7 @@ def buildEvent(time: int) -> WebLogEvent:
         rfc931=None,
         authuser=None,
         status=None,
-        size=None,
+        size=0,
         section="/api",
         source="GCHQ",
         request=None,
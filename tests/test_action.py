@@ -1,8 +1,19 @@
+import io
+import os
+import tempfile
+from collections import Counter
 from datetime import datetime
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from LogsMonitor2000.event import Event
-from LogsMonitor2000.action import TerminalNotifier, Action
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.action import (
+    TerminalNotifier,
+    DashboardNotifier,
+    LateEventsWriter,
+    Action,
+)
 
 
 class TestActionTerminalNotifier(TestCase):
@@ -34,3 +45,77 @@ class TestActionTerminalNotifier(TestCase):
         # Just for slightly better code coverage
         with self.assertRaises(NotImplementedError):
             Action().notify(event)
+
+
+class TestActionDashboardNotifier(TestCase):
+    """ Render to a string stream to test what's redrawn """
+
+    def testCoalesced(self):
+        "Many notifications in a frame interval are drawn as one frame"
+        stream = io.StringIO()
+        n = DashboardNotifier(fps=0.5, stream=stream)
+        for i in range(1000):
+            n.notify(
+                Event(priority=Event.Priority.MEDIUM, message=f"Stats: {i}", time=i)
+            )
+        n.close()
+        self.assertLessEqual(n.framesCount, 3)
+        self.assertIn("\x1b[5;1HStats: 999", stream.getvalue())
+
+    def testRedrawChanges(self):
+        "Only lines changed since the previous frame are redrawn, from their first change"
+        stream = io.StringIO()
+        n = DashboardNotifier(stream=stream)
+        stats = Event(
+            priority=Event.Priority.MEDIUM, message="Bandwidth: 120 bytes/s", time=1
+        )
+        n.notify(stats)
+        n.close()
+        self.assertTrue(stream.getvalue().startswith("\x1b[2J"))
+
+        stream.truncate(0)
+        stream.seek(0)
+        stats.message = "Bandwidth: 150 bytes/s"
+        n.notify(stats)
+        n.notify(Event(priority=Event.Priority.HIGH, message="Alert", time=1))
+        n.close()
+        self.assertEqual(
+            "\x1b[5;13H50 bytes/s\x1b[0m\x1b[K"
+            f"\x1b[8;1H\x1b[91m{datetime.fromtimestamp(1)} - Alert\x1b[0m\x1b[K"
+            "\x1b[9;1H\x1b[?25h",
+            stream.getvalue(),
+        )
+
+
+class TestActionLateEventsWriter(TestCase):
+    """ Write late events to a temporary file, to parse them back """
+
+    def testRoundTrip(self):
+        "Late events are written with all their fields, so they parse back the same"
+
+        def events(path):
+            parser = MagicMock()
+            HTTPLogParser(parser, path).parse()
+            return [
+                (e.time, e.source, e.section, e.status, e.size, e.request)
+                for e in (c.args[0] for c in parser.consume.call_args_list)
+                if e is not None
+            ]
+
+        with tempfile.TemporaryDirectory() as tmpDir:
+            path = os.path.join(tmpDir, "late.csv")
+            writer = LateEventsWriter(path)
+            proc = AnalyticsProcessor(MagicMock(), bufferTime=0, lateAction=writer)
+            self.assertLessEqual(writer.requiredFields, proc.requiredFields())
+            HTTPLogParser(
+                proc, "tests/sample_csv.txt", fields=proc.requiredFields()
+            ).parse()
+            proc.close()
+            writer.close()
+
+            with open(path) as fd:
+                rows = len(fd.readlines())
+            late = events(path)
+        self.assertGreater(rows, 0)
+        self.assertEqual(rows, len(late))
+        self.assertFalse(Counter(late) - Counter(events("tests/sample_csv.txt")))
@@ -0,0 +1,86 @@
+import io
+import os
+import tempfile
+from contextlib import redirect_stderr
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+from LogsMonitor2000.event import WebLogSummary
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.aggregate import aggregateFiles, main
+
+
+class TestAggregate(TestCase):
+    """ State of several monitors merges into the same stats as a single monitor's """
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def testMergeSummaries(self):
+        "Merging is associative, and survives serialization"
+        parser = MagicMock()
+        HTTPLogParser(parser, "tests/sample_csv.txt").parse()
+        group = [c[0][0] for c in parser.consume.call_args_list[:30]]
+        for e in group:
+            e.time = 0
+
+        whole = WebLogSummary.fromEvents(group)
+        parts = [WebLogSummary.fromEvents(group[i : i + 10]) for i in (0, 10, 20)]
+        merged = WebLogSummary.fromEvents(
+            [WebLogSummary.fromState(p.toState()) for p in parts]
+        )
+        for attr in (
+            "count",
+            "sections",
+            "sources",
+            "statuses",
+            "bytes",
+            "sectionBytes",
+        ):
+            self.assertEqual(getattr(whole, attr), getattr(merged, attr), attr)
+        self.assertEqual(whole.sizes.toState(), merged.sizes.toState())
+
+    def testAggregateFiles(self):
+        with open("tests/sample_csv.txt") as fd:
+            header, *rows = fd.readlines()
+
+        # Two web nodes, each serving every other request
+        options = dict(
+            bandwidthStatsInterval=10, errorRateInterval=30, errorRateMinRequests=10
+        )
+        statePaths = []
+        for node in range(2):
+            logPath = os.path.join(self.tmpDir.name, f"access{node}.log")
+            with open(logPath, mode="w") as fd:
+                fd.writelines([header] + rows[node::2])
+            statePaths.append(os.path.join(self.tmpDir.name, f"state{node}.json"))
+            monitor = AnalyticsProcessor(
+                MagicMock(), stateSink=open(statePaths[-1], mode="w"), **options
+            )
+            HTTPLogParser(monitor, logPath).parse()
+            monitor.close()
+
+        expected = MagicMock()
+        HTTPLogParser(
+            AnalyticsProcessor(expected, summarize=True, **options),
+            "tests/sample_csv.txt",
+        ).parse()
+
+        action = MagicMock()
+        aggregateFiles(
+            AnalyticsProcessor(action, summarize=True, **options), statePaths
+        )
+
+        self.assertGreater(action.notify.call_count, 50)
+        self.assertEqual(expected.notify.call_args_list, action.notify.call_args_list)
+
+    def testNoLateEventsFile(self):
+        "Late summaries can't be written back as log lines, so aren't offered to be"
+        argv = ["aggregate", "state.json", "--late_events_file", "late.csv"]
+        with patch("sys.argv", argv), redirect_stderr(io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit):
+                main()
+        self.assertIn("unrecognized arguments: --late_events_file", stderr.getvalue())
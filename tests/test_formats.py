@@ -0,0 +1,111 @@
+import csv
+import json
+import tempfile
+from datetime import datetime, timezone
+from unittest import TestCase
+from unittest.mock import MagicMock
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.formats import Rejected, compileFormat
+
+
+class TestLogFormats(TestCase):
+    """ Each log format produces the same events from the same traffic """
+
+    def setUp(self):
+        with open("tests/sample_csv.txt") as fd:
+            self.rows = list(csv.reader(fd))[1:]
+
+    def _parse(self, logFormat: str, lines: list[str]) -> MagicMock:
+        processor = MagicMock()
+        with tempfile.NamedTemporaryFile(mode="w") as fd:
+            fd.writelines(lines)
+            fd.flush()
+            HTTPLogParser(processor, fd.name, logFormat=logFormat).parse()
+        return processor
+
+    def testSameEvents(self):
+        expected = MagicMock()
+        HTTPLogParser(expected, "tests/sample_csv.txt").parse()
+
+        combined = [
+            f"{r[0]} - {r[2]} "
+            f"[{datetime.fromtimestamp(int(r[3]), timezone.utc):%d/%b/%Y:%H:%M:%S} +0000] "
+            f'"{r[4]}" {r[5]} {r[6]} "-" "curl/7.68.0"\n'
+            for r in self.rows
+        ]
+        jsonLines = [
+            json.dumps(
+                {
+                    "time": int(r[3]),
+                    "remote_addr": r[0],
+                    "request": r[4],
+                    "status": r[5],
+                    "body_bytes_sent": r[6],
+                }
+            )
+            + "\n"
+            for r in self.rows
+        ]
+        for logFormat, lines in (("combined", combined), ("json", jsonLines)):
+            self.assertEqual(
+                expected.consume.call_args_list,
+                self._parse(logFormat, lines).consume.call_args_list,
+                logFormat,
+            )
+
+    def testRequiredFieldsOnly(self):
+        "Fields no calculator needs are not extracted"
+        line = '10.0.0.1 [1549573860.123] "GET /api/user HTTP/1.0" 500 12\n'
+        spec = '$remote_addr [$msec] "$request" $status $body_bytes_sent'
+
+        self.assertEqual(
+            [(1549573860, "10.0.0.1", "/api", "500", 12, "GET /api/user HTTP/1.0")],
+            list(compileFormat(spec)([line])),
+        )
+        self.assertEqual(
+            [(1549573860, None, None, "500", 0, None)],
+            list(compileFormat(spec, {"status"})([line])),
+        )
+        self.assertEqual(
+            [(1549573860, None, "/api", None, 0, None)],
+            list(compileFormat(spec, {"section"})([line])),
+        )
+
+        with self.assertRaises(ValueError):
+            compileFormat('$remote_addr "$request"', {"source"})
+        with self.assertRaises(ValueError):
+            compileFormat("[$time_local] $status", {"size"})
+
+    def testRejected(self):
+        extract = compileFormat("clf")
+        lines = [
+            '10.0.0.1 - - [07/Feb/2019:21:11:00 +0000] "GET /api HTTP/1.0" 200 12\n',
+            '10.0.0.1 - - [07/Foo/2019:21:11:00 +0000] "GET /api HTTP/1.0" 200 12\n',
+            '10.0.0.1 - - [07/Feb/2019:21:11:00 +0000] "GET api HTTP/1.0" 200 12\n',
+            "garbage\n",
+            "\n",
+        ]
+        self.assertEqual(
+            [
+                (1549573860, "10.0.0.1", "/api", "200", 12, "GET /api HTTP/1.0"),
+                Rejected("date", lines[1]),
+                Rejected("format", lines[2]),
+                Rejected("format", lines[3]),
+            ],
+            list(extract(lines)),
+        )
+
+    def testFractionalTimes(self):
+        "Epoch and ISO 8601 times with fractional seconds, invalid ones rejected"
+        extract = compileFormat("$remote_addr [$time_iso8601] $status", {"status"})
+        lines = ["10.0.0.1 [2019-02-07T21:11:00.123+00:00] 200\n"]
+        self.assertEqual(
+            [(1549573860, None, None, "200", 0, None)], list(extract(lines))
+        )
+
+        extract = compileFormat("$remote_addr [$msec] $status", {"status"})
+        lines = ["10.0.0.1 [1549573860.123] 200\n", "10.0.0.1 [1.2.3] 200\n"]
+        self.assertEqual(
+            [(1549573860, None, None, "200", 0, None), Rejected("date", lines[1])],
+            list(extract(lines)),
+        )
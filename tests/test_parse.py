@@ -1,6 +1,8 @@
+import tempfile
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 from LogsMonitor2000.parse import HTTPLogParser, Parser
+from LogsMonitor2000.reader import LogFollower
 
 
 class TestHTTPLogParser(TestCase):
@@ -43,6 +45,58 @@ class TestHTTPLogParser(TestCase):
             "Malformed CSV row: ['-', 'missing-column', '1549573860', 'GET /api/user HTTP/1.0', '200', '1234']",
         )
 
+    @patch("logging.warning")
+    def testRejectionsCounted(self, mockWarning):
+        "Only the first few malformed rows of each reason are logged, then aggregated"
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv") as fd:
+            for i in range(10):
+                fd.write(
+                    f'"10.0.0.2","-","apache",1549573860,"GET /api HTTP/1.0",200,{i}\n'
+                    '"10.0.0.2","-","apache",99999999999999,"GET /api HTTP/1.0",200,1\n'
+                    '"10.0.0.2","-","apache",1549573860,"GET /api HTTP/1.0",200,big\n'
+                )
+            fd.flush()
+            processor = MagicMock()
+            parser = HTTPLogParser(processor, fd.name)
+            parser.parse()
+
+        self.assertEqual(11, processor.consume.call_count, "Events plus buffer flush")
+        self.assertEqual({"date": 10, "size": 10}, parser.rejections)
+        self.assertEqual(11, mockWarning.call_count)
+        mockWarning.assert_called_with(
+            "Skipped 20 malformed rows so far (date: 10, size: 10)"
+        )
+
+    def testFollowPartialLines(self):
+        "Lines being written when polled are parsed once complete"
+        row = '"10.0.0.2","-","apache",1549573860,"GET /api/user HTTP/1.0",200,1234\n'
+        processor = MagicMock()
+        with tempfile.NamedTemporaryFile(mode="w") as fd:
+            parser = HTTPLogParser(processor, fd.name, isFollowMode=True)
+            follower = LogFollower(fd.name)
+
+            fd.write(row + row[:30])
+            fd.flush()
+            parser._pollFile(follower)
+            self.assertEqual(2, processor.consume.call_count, "One event and flush")
+
+            fd.write(row[30:] + row)
+            fd.flush()
+            parser._pollFile(follower)
+            self.assertEqual(
+                5, processor.consume.call_count, "Two more events and flush"
+            )
+            self.assertEqual({}, parser.rejections)
+
+            # Truncated log is read from the start
+            fd.seek(0)
+            fd.truncate()
+            fd.write(row)
+            fd.flush()
+            parser._pollFile(follower)
+            self.assertEqual(7, processor.consume.call_count)
+            follower.close()
+
     def testInvalidParser(self):
         "Invalid object instantiation throws errors"
         with self.assertRaises(NotImplementedError):
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import types
+import signal
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from LogsMonitor2000.event import Event
+from LogsMonitor2000.action import Action
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.analyze import AnalyticsProcessor
+from LogsMonitor2000.profiler import StageProfiler
+
+
+class MessagesRecorder(Action):
+    def __init__(self):
+        self.messages: list[str] = []
+
+    def notify(self, e: Event) -> None:
+        self.messages.append(e.message)
+
+
+class TestStageProfiler(TestCase):
+    "Test per-stage reports of a profiled pipeline"
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpDir.name, "profile.txt")
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def monitor(self, action, profiler=None):
+        processor = AnalyticsProcessor(action)
+        parser = HTTPLogParser(processor, "tests/sample_csv.txt")
+        if profiler is not None:
+            profiler.profilePipeline(parser, processor, action)
+        parser.parse()
+        processor.close()
+
+    def testReport(self):
+        "Same alerts as unprofiled, with calls and times reported per stage"
+        expected = MessagesRecorder()
+        self.monitor(expected)
+
+        action = MessagesRecorder()
+        profiler = StageProfiler(self.path, samplingInterval=0.001, memory=True)
+        # Stages are wrapped once however many logs are monitored in turn
+        self.monitor(action, profiler)
+        self.monitor(action, profiler)
+        profiler.close()
+        self.assertEqual(expected.messages * 2, action.messages)
+
+        with open(self.path) as fd:
+            report = fd.read()
+        self.assertEqual(1, report.count("Profile at"))
+        self.assertIn("Top functions of parse: ", report)
+        self.assertIn("allocations", report)
+        rows = {
+            line.split()[0]: line.split()[1:]
+            for line in report.splitlines()
+            if len(line.split()) == 5 and not line.startswith("stage")
+        }
+        self.assertEqual(
+            {
+                "parse",
+                "flush",
+                "removeOldEvents",
+                "MostCommonCalculator",
+                "HighTrafficCalculator",
+                "notify",
+            },
+            set(rows) - {"other"},
+        )
+        self.assertEqual(str(len(action.messages)), rows["notify"][0])
+        self.assertEqual("2", rows["parse"][0])
+        for calls, total, selfTime, samples in rows.values():
+            self.assertLessEqual(float(selfTime), float(total))
+        # Parsing includes every other stage
+        self.assertGreater(float(rows["parse"][1]), float(rows["flush"][1]))
+
+    def testIdleReports(self):
+        "Stats are reported on processor ticks while idle, with too few samples"
+        action = MessagesRecorder()
+        processor = AnalyticsProcessor(action)
+        parser = HTTPLogParser(processor, "tests/sample_csv.txt")
+        profiler = StageProfiler(self.path, interval=0.05, samplingInterval=10)
+        try:
+            profiler.profilePipeline(parser, processor, action)
+            parser.parse()
+            for _ in range(2):
+                time.sleep(0.05)
+                processor.tick()
+        finally:
+            profiler.close()
+        with open(self.path) as fd:
+            reports = fd.read().split("Profile at")[1:]
+        # One per tick, then the final one on close
+        self.assertEqual(3, len(reports))
+        self.assertIn("\nparse ", reports[0])
+
+    def testReportsOutsideHandler(self):
+        "Samples only flag reports due, written once the stage running returns"
+        profiler = StageProfiler(self.path, interval=0, samplingInterval=10)
+        try:
+            action = MessagesRecorder()
+            profiler.wrap(action, ["notify"], "notify")
+            profiler._sample(signal.SIGPROF, sys._getframe())
+            self.assertFalse(os.path.exists(self.path))
+            action.notify(Event(0, "alert", Event.Priority.LOW))
+            with open(self.path) as fd:
+                report = fd.read()
+            self.assertEqual(1, report.count("Profile at"))
+            self.assertIn("\nnotify ", report)
+        finally:
+            profiler.close()
+
+    def testUnsupported(self):
+        "Platforms without SIGPROF, e.g. Windows, are told profiling isn't available"
+        with patch("LogsMonitor2000.profiler.signal", types.SimpleNamespace()):
+            with self.assertRaisesRegex(ValueError, "SIGPROF"):
+                StageProfiler(self.path)
@@ -0,0 +1,150 @@
+import io
+import os
+import bz2
+import gzip
+import lzma
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+from LogsMonitor2000.parse import HTTPLogParser
+from LogsMonitor2000.reader import (
+    compression,
+    openLog,
+    iterGzipLines,
+    iterStreamLines,
+    _iterMemberAt,
+)
+
+
+class TestCompressedLogs(TestCase):
+    """ Compressed logs are decompressed transparently """
+
+    def setUp(self):
+        with open("tests/sample_csv.txt", mode="rb") as fd:
+            self.content = fd.read()
+        self.tmpDir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def _write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.tmpDir.name, name)
+        with open(path, mode="wb") as fd:
+            fd.write(data)
+        return path
+
+    def testFormats(self):
+        "Each supported format is detected and read back identically"
+        compressors = {
+            "gzip": gzip.compress,
+            "bz2": bz2.compress,
+            "xz": lzma.compress,
+        }
+        for fmt, compress in compressors.items():
+            path = self._write(f"access.log.1.{fmt}", compress(self.content))
+            self.assertEqual(fmt, compression(path))
+            with openLog(path) as fd:
+                self.assertEqual(self.content.decode(), fd.read())
+
+        path = self._write("access.log", self.content)
+        self.assertIsNone(compression(path))
+
+    def testParseGzip(self):
+        "Parsing a compressed log generates the same events as the plain one"
+        plain = MagicMock()
+        HTTPLogParser(plain, "tests/sample_csv.txt").parse()
+
+        compressed = MagicMock()
+        path = self._write("access.log.1.gz", gzip.compress(self.content))
+        HTTPLogParser(compressed, path).parse()
+
+        self.assertEqual(
+            plain.consume.call_args_list, compressed.consume.call_args_list
+        )
+
+    def testParallelMembers(self):
+        "Multi-member gzip is decompressed in parallel, lines split across members kept"
+        members = [self.content[:1000], self.content[1000:50000], self.content[50000:]]
+        path = self._write(
+            "access.log.2.gz", b"".join(gzip.compress(m) for m in members)
+        )
+
+        lines = list(iterGzipLines(path, workers=2))
+        self.assertEqual(self.content.decode().splitlines(keepends=True), lines)
+
+        plain = MagicMock()
+        HTTPLogParser(plain, "tests/sample_csv.txt").parse()
+        parallel = MagicMock()
+        HTTPLogParser(parallel, path, workers=2).parse()
+        self.assertEqual(plain.consume.call_args_list, parallel.consume.call_args_list)
+
+    def testLargeMembers(self):
+        "Members too large for workers are decompressed in bounded chunks instead"
+        members = [self.content[:1000], self.content[1000:]]
+        path = self._write(
+            "access.log.3.gz", b"".join(gzip.compress(m) for m in members)
+        )
+        with patch("LogsMonitor2000.reader._MAX_MEMBER_CONTENT", 2000):
+            lines = list(iterGzipLines(path, workers=2))
+        self.assertEqual(self.content.decode().splitlines(keepends=True), lines)
+
+        chunks = _iterMemberAt(path, len(gzip.compress(members[0])))
+        content = []
+        with patch("LogsMonitor2000.reader._READ_BUFFER_SIZE", 4096):
+            with self.assertRaises(StopIteration) as end:
+                while True:
+                    content.append(next(chunks))
+        self.assertEqual(os.path.getsize(path), end.exception.value)
+        self.assertEqual(members[1], b"".join(content))
+        self.assertLessEqual(max(map(len, content)), 4096)
+
+
+class TestStreamedLogs(TestCase):
+    """ Logs piped to standard input are read in chunks """
+
+    def testPartialLines(self):
+        "Lines split across chunks are only returned once complete"
+        stream = io.BytesIO(b"first line\nsecond\nthird line\nno newline")
+        batches = list(iterStreamLines(stream, chunkSize=8))
+        self.assertEqual(
+            ["first line\n", "second\n", "third line\n", "no newline"],
+            [line for batch in batches for line in batch],
+        )
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
+
+    def testLineBoundaries(self):
+        "Lines only end with a newline, as in a file, not other line boundaries"
+        data = "a\x0bb\x0cc\x1cd\x85e\u2028f\rg\r\nsecond\n"
+        batches = list(iterStreamLines(io.BytesIO(data.encode()), chunkSize=8))
+        self.assertEqual(
+            ["a\x0bb\x0cc\x1cd\x85e\u2028f\rg\r\n", "second\n"],
+            [line for batch in batches for line in batch],
+        )
+
+    def testIdleTimeout(self):
+        "Empty batches are returned while no data arrives in time, buffered or not"
+        for buffering in (0, -1):
+            readFd, writeFd = os.pipe()
+            with open(readFd, mode="rb", buffering=buffering) as stream:
+                batches = iterStreamLines(stream, idleTimeout=0.01)
+                self.assertEqual([], next(batches))
+                os.write(writeFd, b"a line\nsecond line\n")
+                self.assertEqual(["a line\n", "second line\n"], next(batches))
+                self.assertEqual([], next(batches))
+                os.write(writeFd, b"partial")
+                os.close(writeFd)
+                self.assertEqual(["partial"], next(batches))
+                self.assertEqual([], list(batches))
+
+    def testParseStdin(self):
+        "Streamed logs generate the same events, with the buffer flushed at the end"
+        plain = MagicMock()
+        HTTPLogParser(plain, "tests/sample_csv.txt").parse()
+
+        streamed = MagicMock()
+        with open("tests/sample_csv.txt", mode="rb") as fd:
+            stdin = io.TextIOWrapper(io.BufferedReader(io.BytesIO(fd.read())))
+        with patch("sys.stdin", stdin):
+            HTTPLogParser(streamed, "-").parse()
+
+        self.assertEqual(plain.consume.call_args_list, streamed.consume.call_args_list)
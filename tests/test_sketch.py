@@ -0,0 +1,40 @@
+import random
+from unittest import TestCase
+from LogsMonitor2000.sketch import QuantileSketch
+
+
+class TestQuantileSketch(TestCase):
+    """ Quantiles are estimated within relative accuracy """
+
+    def testQuantiles(self):
+        values = [random.randint(1, 100000) for _ in range(10000)] + [0] * 100
+        sketch = QuantileSketch(relativeAccuracy=0.01)
+        for v in values:
+            sketch.add(v)
+
+        values.sort()
+        for q in (0.01, 0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(exact, sketch.quantile(q), delta=exact * 0.01)
+        self.assertEqual(0, sketch.quantile(0))
+
+    def testMergeAndRemove(self):
+        "Merging sketches equals sketching all values, removing them undoes it"
+        a, b, both = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for v in range(1, 1000):
+            a.add(v)
+            both.add(v)
+        for v in range(5000, 6000):
+            b.add(v)
+            both.add(v)
+
+        a.merge(b)
+        self.assertEqual(both.count, a.count)
+        self.assertEqual(both.quantile(0.75), a.quantile(0.75))
+
+        a.merge(b, sign=-1)
+        for v in range(1, 1000):
+            a.remove(v)
+        self.assertEqual(0, a.count)
+        self.assertEqual({}, a._buckets)
+        self.assertEqual(0, a.quantile(0.5))
@@ -0,0 +1,47 @@
+import sys
+import subprocess
+from unittest import TestCase
+
+# Modules only needed by optional features, too slow to import on every run
+_OPTIONAL_MODULES = [
+    "bz2",
+    "lzma",
+    "json",
+    "socket",
+    "multiprocessing",
+    "concurrent.futures",
+    "tracemalloc",
+    "LogsMonitor2000.analyze.bandwidthCalculator",
+    "LogsMonitor2000.analyze.replayProcessor",
+]
+
+
+def run(*args: str) -> str:
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True
+    ).stdout
+
+
+class TestStartup(TestCase):
+    """ Short runs, e.g. from cron on small logs, start quickly """
+
+    def testLazyImports(self):
+        "Optional features' modules aren't imported by default"
+        imported = run(
+            "-c",
+            "import sys, LogsMonitor2000.__main__; print(' '.join(sys.modules))",
+        ).split()
+        for module in _OPTIONAL_MODULES:
+            self.assertNotIn(module, imported)
+
+    def testBatch(self):
+        "Each log of a batch is monitored separately, as by separate runs"
+        single = run("-m", "LogsMonitor2000", "tests/sample_csv.txt")
+        batch = run(
+            "-m", "LogsMonitor2000", "tests/sample_csv.txt", "tests/sample_csv.txt"
+        )
+        # Header printed once, above the alerts
+        lines = single.splitlines()
+        header, alerts = lines[:3], lines[3:]
+        self.assertGreater(len(alerts), 0)
+        self.assertEqual(header + alerts + alerts, batch.splitlines())